@@ -0,0 +1,36 @@
+"""
+Project-wide pytest fixtures. These live at the root so app test modules
+(rentals/tests.py etc.) share the same test database and media setup as tests/.
+"""
+import pytest
+from django.test import override_settings
+
+from tests.dbtemplate import setup_worker_databases, teardown_worker_databases
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(request, django_test_environment, django_db_blocker, django_db_createdb):
+    """Clone a cached template database (migrated, no test data) for this (xdist) worker"""
+    worker_id = getattr(request.config, 'workerinput', {}).get('workerid', 'main')
+    with django_db_blocker.unblock():
+        state = setup_worker_databases(worker_id, rebuild=django_db_createdb)
+    yield
+    with django_db_blocker.unblock():
+        teardown_worker_databases(state)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_media(tmp_path_factory):
+    """
+    Keep every worker's uploads out of the project's media/ directory, and
+    use a fast password hasher since fixtures create users constantly
+    """
+    media_root = tmp_path_factory.mktemp('media')
+    with override_settings(
+        DEFAULT_FILE_STORAGE='music_rental.storage_backends.CachedFileSystemStorage',
+        MEDIA_ROOT=str(media_root),
+        MEDIA_URL='/media/',
+        PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    ):
+        yield media_root
+
@@ -3,9 +3,13 @@ import io
 from django import forms
 from django.http import HttpResponse
 from django.contrib import admin
+from django.template.defaultfilters import filesizeformat
 from django.utils.html import format_html
-from .models import Category, Equipment, MaintenanceRecord, EquipmentAttachment, SearchLog
+from .models import Category, Equipment, MaintenanceRecord, EquipmentAttachment, SearchLog, UploadSession
+from .images import derivative_url
+from .bulk import bulk_set_equipment_status, release_equipment
 from simple_history.admin import SimpleHistoryAdmin
+from music_rental.storage_backends import file_metadata
 from django.urls import path
 from django.template.response import TemplateResponse
 from rentals.models import Rental
@@ -16,6 +20,22 @@ class EquipmentAttachmentInline(admin.TabularInline):
     extra = 1
     verbose_name = "Attachment"
     verbose_name_plural = "Equipment Attachments"
+    readonly_fields = ('file_size',)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        if obj is not None:
+            # Look every attachment up in one batch; the rows then read from the cache
+            file_metadata([attachment.file for attachment in obj.attachments.all()])
+        return super().get_formset(request, obj, **kwargs)
+
+    def file_size(self, obj):
+        if not obj.pk or not obj.file:
+            return '-'
+        meta = file_metadata([obj.file]).get(obj.file.name)
+        if not meta['exists']:
+            return format_html('<span style="color: #dc3545;">Missing</span>')
+        return filesizeformat(meta['size'])
+    file_size.short_description = 'Size'
 
 class MaintenanceRecordInline(admin.TabularInline):
     model = MaintenanceRecord
@@ -76,6 +96,32 @@ def import_from_csv(modeladmin, request, queryset):
     form = CSVImportForm()
     return render(request, 'admin/csv_form.html', {'form': form})
 
+def _status_action(status, description):
+    @admin.action(description=description)
+    def action(modeladmin, request, queryset):
+        changed = bulk_set_equipment_status(queryset, status, user=request.user,
+                                            reason=f"Bulk action: {description.lower()}")
+        modeladmin.message_user(request, f"Updated {len(changed)} equipment item(s).", level='SUCCESS')
+    action.__name__ = f"mark_{status}"
+    return action
+
+
+@admin.action(description='Mark selected equipment as available')
+def mark_available(modeladmin, request, queryset):
+    """Like the other status actions, but equipment still out on an open rental is left alone."""
+    selected = list(queryset.exclude(status='available').values_list('pk', flat=True))
+    statuses = [status for status, _ in Equipment.STATUS_CHOICES if status != 'available']
+    changed = release_equipment(selected, user=request.user, from_statuses=statuses,
+                                reason="Bulk action: mark selected equipment as available")
+    modeladmin.message_user(request, f"Updated {len(changed)} equipment item(s).", level='SUCCESS')
+    if len(changed) < len(selected):
+        modeladmin.message_user(request, f"Skipped {len(selected) - len(changed)} item(s) still out on an open rental.",
+                                level='WARNING')
+
+mark_maintenance = _status_action('maintenance', 'Send selected equipment to maintenance')
+mark_damaged = _status_action('damaged', 'Mark selected equipment as damaged')
+mark_retired = _status_action('retired', 'Retire selected equipment')
+
 @admin.register(Equipment)
 class EquipmentAdmin(SimpleHistoryAdmin):
     list_display = ('image_thumbnail', 'name', 'brand', 'category', 'status_tag', 'rental_price_daily', 'serial_number', 'has_manual')
@@ -84,7 +130,7 @@ class EquipmentAdmin(SimpleHistoryAdmin):
     readonly_fields = ('qr_code_preview', 'qr_uuid', 'created_at', 'updated_at', 'manual_preview', 'manual_last_checked')
     list_per_page = 20
     save_on_top = True
-    actions = [export_to_csv, 'fetch_manuals']
+    actions = [export_to_csv, 'fetch_manuals', mark_available, mark_maintenance, mark_damaged, mark_retired]
     
     fieldsets = (
         ('Basic Information', {
@@ -117,7 +163,7 @@ class EquipmentAdmin(SimpleHistoryAdmin):
     
     def image_thumbnail(self, obj):
         if obj.main_image:
-            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover; border-radius: 5px;" />', obj.main_image.url)
+            return format_html('<img src="{}" width="50" height="50" style="object-fit: cover; border-radius: 5px;" />', derivative_url(obj, 'thumbnail'))
         else:
             return format_html('<div style="width: 50px; height: 50px; background-color: #3A3A3A; border-radius: 5px; display: flex; align-items: center; justify-content: center; color: white;">No<br>Image</div>')
     image_thumbnail.short_description = ""
@@ -212,6 +258,22 @@ class SearchLogAdmin(admin.ModelAdmin):
         # Disable manual creation of search logs
         return False
 
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'equipment', 'status', 'progress', 'total_size', 'created_by', 'created_at', 'expires_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('filename', 'equipment__name')
+    readonly_fields = ('id', 'equipment', 'created_by', 'filename', 'content_type', 'description', 'total_size',
+                       'chunk_size', 'received_chunks', 'status', 'attachment', 'created_at', 'updated_at', 'expires_at')
+    
+    def has_add_permission(self, request):
+        # Sessions are only created through the upload API
+        return False
+    
+    def progress(self, obj):
+        return f"{len(obj.received_chunks)}/{obj.total_chunks} chunks"
+    progress.short_description = "Progress"
+
 # Register custom admin site name and branding
 admin.site.site_header = "ROKNSOUND Management Portal"
 admin.site.site_title = "ROKNSOUND Admin"
@@ -0,0 +1,43 @@
+"""Bulk equipment changes; status transitions use music_rental/bulk_status.py."""
+from music_rental.bulk_status import bulk_set_status
+
+from .models import Equipment
+
+
+def bulk_set_equipment_status(queryset, status, user=None, reason=''):
+    """Set status on every item in queryset. Returns the ids that changed."""
+    if status not in dict(Equipment.STATUS_CHOICES):
+        raise ValueError(f"Unknown equipment status: {status}")
+    return bulk_set_status(queryset, status, user=user, reason=reason)
+
+
+def release_equipment(equipment_ids, user=None, reason='', now=None, from_statuses=('rented',)):
+    """
+    Mark equipment in from_statuses (by default rented) as available again
+    unless it is still out on an open rental. Returns the ids that changed.
+    """
+    from rentals.models import Rental, RentalItem
+
+    still_out = RentalItem.objects.filter(
+        rental__status__in=Rental.OPEN_STATUSES, returned=False,
+    ).values('equipment_id')
+    queryset = Equipment.objects.filter(pk__in=equipment_ids, status__in=from_statuses).exclude(pk__in=still_out)
+    return bulk_set_status(queryset, 'available', user=user, reason=reason, now=now)
+
+
+def generate_qr_codes(equipment_list, batch_size=500):
+    """
+    QR codes for equipment created with bulk_create, which skips
+    Equipment.save(). Returns the items that got one.
+    """
+    with_qr = []
+    for equipment in equipment_list:
+        if equipment.qr_code:
+            continue
+        try:
+            equipment.generate_qr_code()
+            with_qr.append(equipment)
+        except Exception:
+            continue
+    Equipment.objects.bulk_update(with_qr, ['qr_code'], batch_size=batch_size)
+    return with_qr
@@ -0,0 +1,181 @@
+"""
+The equipment catalog for offline scanning.
+
+The mobile scan page keeps a copy of the catalog on the device and resolves
+scans against it, so scanning keeps working when the warehouse Wi-Fi drops:
+
+- catalog_snapshot: every item as (id, qr_uuid, name, status, brand), plus
+  a cursor. It carries an ETag, so an unchanged catalog answers 304.
+- catalog_changes?since=<cursor>: items whose updated_at moved since the
+  cursor and the ids deleted since then (from Equipment history). Deltas
+  overlap the cursor by OVERLAP, since clients upsert rows; a cursor
+  older than MAX_CURSOR_AGE gets 410 and the client starts from a snapshot.
+- catalog_sync: status changes queued on the device, sent in one batch
+  with the cursor the device's copy was at. A change to an item the server
+  changed after that cursor is a conflict: the server wins and its row is
+  returned. The rest are applied with bulk_set_status, one UPDATE per status
+  plus history. Changes to available go through release_equipment(), so an
+  item still out on an open rental stays as it is and comes back as a
+  conflict too. Clients fetch a delta afterwards; the response has no cursor.
+
+Cursors are server timestamps, so device clocks don't matter. Payloads are
+columnar ({"fields": [...], "rows": [[...], ...]}). They are MessagePack
+when the client accepts application/msgpack and the msgpack package is
+installed, JSON otherwise, and gzipped when the client accepts it.
+"""
+import datetime
+import gzip
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import bulk_set_equipment_status, release_equipment
+from .models import Equipment
+
+FIELDS = ('id', 'qr_uuid', 'name', 'status', 'brand')
+OVERLAP = datetime.timedelta(minutes=5)
+MAX_CURSOR_AGE = datetime.timedelta(days=30)
+SYNC_REASON = 'Mobile sync'
+MSGPACK = 'application/msgpack'
+# Below this size gzip isn't worth the CPU on either end
+GZIP_MIN_LENGTH = 1024
+
+
+class StaleCursor(Exception):
+    """The cursor is too old for a delta; the client needs a new snapshot."""
+
+
+def encode_cursor(moment):
+    return moment.isoformat()
+
+
+def parse_cursor(value):
+    try:
+        moment = parse_datetime(value or '')
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, datetime.timezone.utc)
+    return moment
+
+
+def _rows(queryset):
+    return [[pk, str(qr_uuid), name, status, brand]
+            for pk, qr_uuid, name, status, brand in queryset.values_list(*FIELDS).iterator(chunk_size=2000)]
+
+
+def snapshot_etag():
+    """Changes whenever an item is added, changed or deleted."""
+    stats = Equipment.objects.aggregate(count=Count('pk'), latest=Max('updated_at'))
+    return hashlib.sha256(f"{stats['count']}:{stats['latest']}".encode()).hexdigest()[:32]
+
+
+def snapshot(now=None):
+    now = now or timezone.now()
+    return {'cursor': encode_cursor(now), 'fields': list(FIELDS), 'rows': _rows(Equipment.objects.order_by('pk'))}
+
+
+def changes(since, now=None):
+    """Rows changed and ids deleted since the cursor since (a datetime)."""
+    now = now or timezone.now()
+    if since < now - MAX_CURSOR_AGE:
+        raise StaleCursor
+    start = since - OVERLAP
+    rows = _rows(Equipment.objects.filter(updated_at__gt=start).order_by('pk'))
+    present = {row[0] for row in rows}
+    deleted = sorted(set(Equipment.history.filter(history_type='-', history_date__gt=start)
+                         .values_list('id', flat=True)) - present)
+    return {'cursor': encode_cursor(now), 'fields': list(FIELDS), 'rows': rows, 'deleted': deleted}
+
+
+def apply_status_changes(cursor, changes, user=None):
+    """
+    Apply status changes queued on a device whose copy of the catalog was at
+    cursor. changes is a list of {"id", "status"}, oldest first; the last
+    change per item wins. Returns {"applied": ids, "conflicts": rows,
+    "invalid": ids}.
+    """
+    statuses = dict(Equipment.STATUS_CHOICES)
+    wanted, invalid = {}, []
+    for change in changes:
+        try:
+            pk = int(change.get('id'))
+        except (AttributeError, TypeError, ValueError):
+            invalid.append(change.get('id') if isinstance(change, dict) else change)
+            continue
+        if change.get('status') not in statuses:
+            invalid.append(pk)
+            continue
+        wanted[pk] = change['status']
+
+    current = dict(Equipment.objects.filter(pk__in=wanted).values_list('pk', 'updated_at'))
+    invalid += [pk for pk in wanted if pk not in current]
+    conflicts = sorted(pk for pk, updated_at in current.items() if updated_at > cursor)
+
+    by_status = {}
+    for pk, status in wanted.items():
+        if pk in current and pk not in conflicts:
+            by_status.setdefault(status, []).append(pk)
+    applied = []
+    for status, pks in by_status.items():
+        if status == 'available':
+            released = release_equipment(pks, user=user, reason=SYNC_REASON,
+                                         from_statuses=[value for value in statuses if value != 'available'])
+            applied += released
+            # Whatever wasn't released and isn't available already is still out on a rental
+            conflicts += Equipment.objects.filter(pk__in=pks).exclude(pk__in=released).exclude(
+                status='available').values_list('pk', flat=True)
+        else:
+            applied += bulk_set_equipment_status(Equipment.objects.filter(pk__in=pks), status,
+                                                 user=user, reason=SYNC_REASON)
+    return {
+        'applied': sorted(applied),
+        'conflicts': _rows(Equipment.objects.filter(pk__in=conflicts).order_by('pk')),
+        'invalid': invalid,
+    }
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def wants_msgpack(request):
+    return MSGPACK in request.headers.get('Accept', '') and _msgpack() is not None
+
+
+def payload_response(request, data, status=200, etag=None):
+    """data encoded for what the client accepts (see the module docstring); etag is sent as is."""
+    if wants_msgpack(request):
+        body, content_type = _msgpack().packb(data, use_bin_type=True), MSGPACK
+    else:
+        body, content_type = json.dumps(data, separators=(',', ':')).encode(), 'application/json'
+    response = HttpResponse(status=status, content_type=content_type)
+    if len(body) >= GZIP_MIN_LENGTH and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        body = gzip.compress(body, compresslevel=6)
+        response['Content-Encoding'] = 'gzip'
+    response.content = body
+    response['Vary'] = 'Accept, Accept-Encoding'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def read_payload(request):
+    """The request body as data, from MessagePack or JSON (optionally gzipped)."""
+    body = request.body
+    if request.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    if request.content_type == MSGPACK:
+        msgpack = _msgpack()
+        if msgpack is None:
+            raise ValueError("MessagePack is not available on this server")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body or b'{}')
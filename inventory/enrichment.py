@@ -0,0 +1,348 @@
+"""
+Batch pricing enrichment for create_inventory_with_openai --batch.
+
+Items are priced in multi-item prompts (chunk_size items per completion) sent
+concurrently from a small thread pool, instead of one completion per item.
+Every answer is cached on disk under a hash of the item's inputs, so re-running
+a batch only asks OpenAI about items it has not seen before, and dry runs replay
+entirely from the cache without touching the API or the database.
+
+Results are written with bulk_create (plus history rows); QR codes are built
+afterwards and manuals are left to `manage.py fetch_manuals`.
+
+RecordedPricingClient stands in for OpenAI when working offline or in tests.
+"""
+import datetime
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from simple_history.utils import bulk_create_with_history
+
+from .bulk import generate_qr_codes
+from .models import Category, Equipment
+
+# Bump when the prompt changes so old cached answers are not reused
+PROMPT_VERSION = 1
+PRICING_KEYS = ('daily_price', 'weekly_price', 'monthly_price', 'deposit_amount')
+DEFAULT_MODEL = 'gpt-3.5-turbo'
+DEFAULT_CHUNK_SIZE = 20
+DEFAULT_WORKERS = 4
+
+SYSTEM_PROMPT = "You are a musical equipment pricing specialist."
+
+
+def default_pricing(purchase_price=None):
+    """Fallback pricing when OpenAI gives no usable answer."""
+    default_daily = float(purchase_price) * 0.03 if purchase_price else 50.0
+    return {
+        'daily_price': default_daily,
+        'weekly_price': default_daily * 4 * 0.8,  # 20% discount
+        'monthly_price': default_daily * 4 * 4 * 0.6,  # 40% discount
+        'deposit_amount': float(purchase_price) * 0.3 if purchase_price else 200.0,
+    }
+
+
+def normalize_item(item):
+    """Batch file entry -> the option names create_equipment_item() uses."""
+    return {
+        'name': item.get('name'),
+        'description': item.get('description'),
+        'brand': item.get('brand'),
+        'model': item.get('model', ''),
+        'serial': item.get('serial', ''),
+        'purchase_date': item.get('purchase_date'),
+        'purchase_price': item.get('purchase_price'),
+        'category': item.get('category'),
+        'condition': item.get('condition', ''),
+        'notes': item.get('notes', ''),
+    }
+
+
+def item_key(item, model=DEFAULT_MODEL):
+    """Hash of everything that goes into an item's prompt."""
+    payload = {
+        'version': PROMPT_VERSION,
+        'model': model,
+        'name': item.get('name'),
+        'description': item.get('description'),
+        'brand': item.get('brand'),
+        'category': item.get('category'),
+        'purchase_price': str(item.get('purchase_price') or ''),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def clean_pricing(data):
+    """A pricing dict with all four keys as floats, or None."""
+    if not isinstance(data, dict):
+        return None
+    try:
+        return {key: float(data[key]) for key in PRICING_KEYS}
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def build_prompt(items):
+    lines = [
+        "You are a musical equipment rental specialist. Suggest rental pricing and a deposit "
+        "amount for each of the following items:",
+        "",
+    ]
+    for index, item in enumerate(items):
+        lines.append(f"Item {index}:")
+        lines.append(f"- Name: {item.get('name')}")
+        lines.append(f"- Description: {item.get('description')}")
+        lines.append(f"- Brand: {item.get('brand')}")
+        lines.append(f"- Category: {item.get('category')}")
+        if item.get('purchase_price'):
+            lines.append(f"- Purchase Price: ${item.get('purchase_price')}")
+        lines.append("")
+    lines += [
+        "For every item provide numbers only (no dollar signs or text):",
+        "1. daily_price",
+        "2. weekly_price (should be ~4x daily but with a discount)",
+        "3. monthly_price (should be ~4x weekly but with a discount)",
+        "4. deposit_amount (typically 20-40% of the equipment's value)",
+        "",
+        'Return a JSON object of the form {"items": [{"index": 0, "daily_price": ..., '
+        '"weekly_price": ..., "monthly_price": ..., "deposit_amount": ...}, ...]} '
+        "with one entry per item.",
+    ]
+    return "\n".join(lines)
+
+
+def parse_response(content, count):
+    """Completion text -> list of pricing dicts (None where an item is missing or malformed)."""
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError):
+        match = re.search(r'\{.*\}', content or '', re.DOTALL)
+        try:
+            data = json.loads(match.group(0)) if match else {}
+        except json.JSONDecodeError:
+            data = {}
+
+    entries = data.get('items', []) if isinstance(data, dict) else data
+    results = [None] * count
+    if not isinstance(entries, list):
+        return results
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get('index', position)
+        if isinstance(index, int) and 0 <= index < count:
+            results[index] = clean_pricing(entry)
+    return results
+
+
+class PricingCache:
+    """One JSON file per item key under directory (None disables caching)."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory) if directory else None
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+    def get(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as fh:
+                return clean_pricing(json.load(fh))
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, pricing):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(pricing, fh)
+        tmp.replace(path)
+
+
+class OpenAIPricingClient:
+    """Prices a chunk of items with a single chat completion."""
+
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        import httpx
+        from openai import OpenAI
+
+        self.model = model
+        # One client (and connection pool) shared by every worker thread
+        self.client = OpenAI(api_key=api_key, http_client=httpx.Client())
+
+    def price(self, items):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": build_prompt(items)},
+            ],
+            temperature=0.3,
+            max_tokens=120 * len(items) + 100,
+        )
+        return parse_response(response.choices[0].message.content, len(items))
+
+
+class RecordedPricingClient:
+    """
+    Offline stand-in for OpenAIPricingClient answering from recorded responses:
+    a dict (or JSON file) mapping item_key() to pricing. Unknown items get no
+    answer and fall back to default_pricing().
+    """
+
+    def __init__(self, recordings, model=DEFAULT_MODEL):
+        if isinstance(recordings, (str, Path)):
+            with open(recordings) as fh:
+                recordings = json.load(fh)
+        self.recordings = recordings
+        self.model = model
+        self.requests = 0
+
+    def price(self, items):
+        self.requests += 1
+        return [clean_pricing(self.recordings.get(item_key(item, self.model))) for item in items]
+
+
+@dataclass
+class EnrichedItem:
+    item: dict
+    pricing: dict
+    # 'cache', 'api' or 'default'
+    source: str
+
+
+class BatchEnricher:
+    def __init__(self, client=None, cache=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                 model=DEFAULT_MODEL):
+        self.client = client
+        self.cache = cache or PricingCache(None)
+        self.chunk_size = max(1, chunk_size)
+        self.workers = max(1, workers)
+        self.model = getattr(client, 'model', model)
+        self.errors = []
+
+    def _price_chunk(self, chunk):
+        try:
+            return self.client.price(chunk)
+        except Exception as e:
+            self.errors.append(str(e))
+            return [None] * len(chunk)
+
+    def enrich(self, items):
+        """
+        Pricing for every item, from the cache where possible. Without a
+        client (dry runs) cache misses get default pricing and nothing is
+        requested.
+        """
+        keys = [item_key(item, self.model) for item in items]
+        results = [None] * len(items)
+        missing = []
+        for index, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[index] = EnrichedItem(items[index], cached, 'cache')
+            else:
+                missing.append(index)
+
+        if missing and self.client is not None:
+            chunks = [missing[i:i + self.chunk_size] for i in range(0, len(missing), self.chunk_size)]
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+                answers = pool.map(self._price_chunk, [[items[i] for i in chunk] for chunk in chunks])
+                for chunk, pricings in zip(chunks, answers):
+                    for index, pricing in zip(chunk, pricings):
+                        if pricing is not None:
+                            self.cache.set(keys[index], pricing)
+                            results[index] = EnrichedItem(items[index], pricing, 'api')
+
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = EnrichedItem(
+                    items[index], default_pricing(items[index].get('purchase_price')), 'default')
+        return results
+
+
+def _decimal(value):
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def build_equipment(enriched, categories):
+    item, pricing = enriched.item, enriched.pricing
+    purchase_date = None
+    if item.get('purchase_date'):
+        purchase_date = datetime.datetime.strptime(item['purchase_date'], '%Y-%m-%d').date()
+    return Equipment(
+        name=item.get('name'),
+        description=item.get('description'),
+        category=categories[item.get('category')],
+        brand=item.get('brand'),
+        model_number=item.get('model') or '',
+        serial_number=item.get('serial') or '',
+        purchase_date=purchase_date,
+        purchase_price=_decimal(item['purchase_price']) if item.get('purchase_price') else None,
+        rental_price_daily=_decimal(pricing['daily_price']),
+        rental_price_weekly=_decimal(pricing['weekly_price']),
+        rental_price_monthly=_decimal(pricing['monthly_price']),
+        deposit_amount=_decimal(pricing['deposit_amount']),
+        status='available',
+        condition=item.get('condition') or '',
+        notes=item.get('notes') or '',
+    )
+
+
+def create_equipment(enriched_items, user=None, batch_size=500):
+    """
+    Bulk insert equipment for enriched items. Returns (created, skipped)
+    where skipped lists (item, reason) for entries that could not be created.
+    """
+    skipped = []
+    valid = []
+    for enriched in enriched_items:
+        item = enriched.item
+        if not all(item.get(field) for field in ('name', 'description', 'brand', 'category')):
+            skipped.append((item, 'missing name, description, brand or category'))
+        else:
+            valid.append(enriched)
+
+    # serial_number is unique, so drop repeats within the batch and serials already in stock
+    serials = {enriched.item.get('serial') or '' for enriched in valid}
+    taken = set(Equipment.objects.filter(serial_number__in=serials).values_list('serial_number', flat=True))
+    to_create = []
+    for enriched in valid:
+        serial = enriched.item.get('serial') or ''
+        if serial in taken:
+            skipped.append((enriched.item, f'serial number "{serial}" already exists'))
+            continue
+        taken.add(serial)
+        to_create.append(enriched)
+
+    if not to_create:
+        return [], skipped
+
+    with transaction.atomic():
+        categories = {}
+        for name in {enriched.item['category'] for enriched in to_create}:
+            categories[name], _ = Category.objects.get_or_create(name=name)
+        equipment = [build_equipment(enriched, categories) for enriched in to_create]
+        created = bulk_create_with_history(
+            equipment, Equipment, batch_size=batch_size, default_user=user,
+            default_change_reason='Created from OpenAI batch',
+        )
+
+    generate_qr_codes(created, batch_size=batch_size)
+    return created, skipped
+
+
+def cache_dir():
+    return getattr(settings, 'OPENAI_PRICING_CACHE_DIR', None)
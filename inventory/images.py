@@ -0,0 +1,168 @@
+"""
+Resized derivatives of Equipment.main_image.
+
+Catalog pages used to download the full-size upload and scale it down in CSS.
+Instead we render a few fixed widths in WebP and JPEG, store them next to the
+original, and record their names on Equipment.image_derivatives so templates
+can build a srcset without touching storage.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils.html import format_html
+from PIL import Image, ImageOps
+
+from music_rental.background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+# Target widths in pixels, smallest first
+DERIVATIVE_SIZES = {
+    'thumbnail': 100,
+    'card': 480,
+    'detail': 1200,
+}
+
+# (extension, Pillow format, MIME type, save options)
+DERIVATIVE_FORMATS = (
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+# Default `sizes` attribute for each derivative when rendered in a template
+DEFAULT_SIZES_ATTR = {
+    'thumbnail': '100px',
+    'card': '(max-width: 576px) 100vw, 480px',
+    'detail': '(max-width: 1200px) 100vw, 1200px',
+}
+
+
+def derivative_name(source_name, size, ext):
+    """Storage name for one derivative, kept alongside the original upload."""
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'derivatives', f"{stem}-{size}.{ext}")
+
+
+def _flatten(image):
+    """Return an RGB copy of image, compositing any transparency onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def build_derivatives(field_file):
+    """
+    Render every derivative of field_file and save it to the field's storage.
+    Returns the mapping stored on Equipment.image_derivatives.
+    """
+    storage = field_file.storage
+    field_file.open('rb')
+    try:
+        source = Image.open(field_file)
+        source = ImageOps.exif_transpose(source)
+        source = _flatten(source)
+    finally:
+        field_file.close()
+
+    derivatives = {}
+    for size, width in DERIVATIVE_SIZES.items():
+        resized = source
+        if source.width > width:
+            height = max(1, round(source.height * width / source.width))
+            resized = source.resize((width, height), Image.LANCZOS)
+
+        entry = {'width': resized.width, 'height': resized.height}
+        for ext, pil_format, _, options in DERIVATIVE_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, format=pil_format, **options)
+            name = derivative_name(field_file.name, size, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            entry[ext] = storage.save(name, ContentFile(buffer.getvalue()))
+        derivatives[size] = entry
+
+    return {'source': field_file.name, 'sizes': derivatives}
+
+
+def generate_image_derivatives(equipment):
+    """Build derivatives for one equipment item and record them without a full save."""
+    from .models import Equipment
+
+    if not equipment.main_image:
+        return None
+
+    source_name = equipment.main_image.name
+    data = build_derivatives(equipment.main_image)
+
+    # Only record the result if the image wasn't replaced while we worked.
+    # update() also keeps this out of Equipment.save() and the history table.
+    Equipment.objects.filter(pk=equipment.pk, main_image=source_name).update(image_derivatives=data)
+    equipment.image_derivatives = data
+    return data
+
+
+def _generate_for_pk(pk):
+    from .models import Equipment
+
+    equipment = Equipment.objects.filter(pk=pk).first()
+    if equipment is not None:
+        generate_image_derivatives(equipment)
+
+
+def schedule_image_derivatives(equipment):
+    """Queue derivative generation for equipment once the current transaction commits."""
+    run_in_background(_generate_for_pk, equipment.pk)
+
+
+def derivatives_are_current(equipment):
+    return bool(equipment.main_image) and \
+        (equipment.image_derivatives or {}).get('source') == equipment.main_image.name
+
+
+def derivative_url(equipment, size, ext='jpg'):
+    """URL of one derivative, falling back to the original image until it has been built."""
+    if not equipment.main_image:
+        return ''
+    if derivatives_are_current(equipment):
+        entry = equipment.image_derivatives['sizes'].get(size)
+        if entry and entry.get(ext):
+            return equipment.main_image.storage.url(entry[ext])
+    return equipment.main_image.url
+
+
+def srcset(equipment, ext='jpg'):
+    """`srcset` value listing every derivative of equipment in one format."""
+    if not derivatives_are_current(equipment):
+        return ''
+    storage = equipment.main_image.storage
+    candidates = []
+    for entry in sorted(equipment.image_derivatives['sizes'].values(), key=lambda e: e['width']):
+        if entry.get(ext):
+            candidates.append(f"{storage.url(entry[ext])} {entry['width']}w")
+    return ', '.join(candidates)
+
+
+def render_picture(equipment, size='card', css_class='', alt=None, sizes=None):
+    """<picture> element that lets the browser pick the right derivative."""
+    alt = equipment.name if alt is None else alt
+    if not derivatives_are_current(equipment):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">',
+                           equipment.main_image.url, css_class, alt)
+
+    sizes = sizes or DEFAULT_SIZES_ATTR.get(size, '100vw')
+    entry = equipment.image_derivatives['sizes'].get(size) or {}
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" alt="{}" loading="lazy">'
+        '</picture>',
+        srcset(equipment, 'webp'), sizes,
+        derivative_url(equipment, size, 'jpg'), srcset(equipment, 'jpg'), sizes,
+        entry.get('width', ''), entry.get('height', ''), css_class, alt,
+    )
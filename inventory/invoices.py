@@ -0,0 +1,339 @@
+"""
+Purchase data from supplier invoice PDFs (past_equipment_invoices/).
+
+Parsing runs in a process pool and never touches the database: each PDF is
+read with pypdf and line items are pulled from its text layer. The Sweetwater
+invoices we have are printed from the browser as page images with no text, so
+when a PDF has no parseable line items its page images are sent to an OpenAI
+vision model instead. Either way the result is cached on disk under the file's
+SHA-256, so re-runs only parse new or changed files (and only pay for them).
+
+ingest() then matches line items to existing equipment by serial number, then
+by model number, filling in purchase_price/purchase_date, and bulk creates
+equipment for the rest.
+"""
+import base64
+import datetime
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from .bulk import generate_qr_codes
+from .enrichment import default_pricing
+from .models import Category, Equipment
+
+# Bump when parsing changes so cached results are re-parsed
+PARSER_VERSION = 1
+VISION_MODEL = 'gpt-4o'
+DEFAULT_CATEGORY = 'Uncategorized'
+
+ORDER_NUMBER_RE = re.compile(r'Order Number\s*:?\s*(\d+)')
+ORDER_DATE_RE = re.compile(r'Order Date\s*:?\s*(\d{1,2}/\d{1,2}/\d{4})')
+LINE_ITEM_RE = re.compile(r'^\s*(\d+)\s+(\S+)\s+(.+?)\s+\$\s?(-?[\d,]+\.\d{2})\s*$')
+SERIAL_RE = re.compile(r'^\s*(?:Serial(?:\s+Number)?|S/N)\s*[:#]?\s*([A-Za-z0-9-]+)', re.IGNORECASE)
+ACTIVATION_RE = re.compile(r'^\s*Activation\s*:', re.IGNORECASE)
+
+VISION_PROMPT = """
+This is a page of a musical equipment supplier invoice. Extract the order and its line items.
+Return a JSON object of the form:
+{"order_number": "...", "order_date": "YYYY-MM-DD", "items": [{"quantity": 1, "sku": "...",
+"brand": "...", "description": "...", "serial": "... or null", "software": true/false,
+"price": 123.45}]}
+"sku" is the item code column, "price" the line total in dollars, "serial" the serial number if one
+is printed under the item, and "software" is true for downloads/licenses (e.g. an Activation code).
+"""
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_date(value):
+    for fmt in ('%m/%d/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, fmt).date().isoformat()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def parse_invoice_text(text):
+    """Order number, date and line items from an invoice's text layer."""
+    order_number = ORDER_NUMBER_RE.search(text)
+    order_date = ORDER_DATE_RE.search(text)
+    items = []
+    for line in text.splitlines():
+        match = LINE_ITEM_RE.match(line)
+        if match:
+            quantity, sku, description, price = match.groups()
+            items.append({
+                'quantity': int(quantity),
+                'sku': sku,
+                'brand': '',
+                'description': description.strip(),
+                'serial': None,
+                'software': False,
+                'price': float(price.replace(',', '')),
+            })
+        elif items and SERIAL_RE.match(line):
+            items[-1]['serial'] = SERIAL_RE.match(line).group(1)
+        elif items and ACTIVATION_RE.match(line):
+            items[-1]['software'] = True
+    return {
+        'order_number': order_number.group(1) if order_number else '',
+        'order_date': _parse_date(order_date.group(1)) if order_date else None,
+        'items': items,
+    }
+
+
+def _page_images(reader):
+    for page in reader.pages:
+        for image in page.images:
+            extension = os.path.splitext(image.name)[1].lower().lstrip('.') or 'png'
+            mime = 'image/jpeg' if extension in ('jpg', 'jpeg') else f'image/{extension}'
+            yield mime, image.data
+
+
+def parse_images_with_openai(images, api_key):
+    """Line items read off page images by an OpenAI vision model."""
+    import httpx
+    from openai import OpenAI
+
+    client = OpenAI(api_key=api_key, http_client=httpx.Client())
+    result = {'order_number': '', 'order_date': None, 'items': []}
+    for mime, data in images:
+        response = client.chat.completions.create(
+            model=VISION_MODEL,
+            response_format={'type': 'json_object'},
+            messages=[{'role': 'user', 'content': [
+                {'type': 'text', 'text': VISION_PROMPT},
+                {'type': 'image_url', 'image_url': {'url': f'data:{mime};base64,{base64.b64encode(data).decode()}'}},
+            ]}],
+            temperature=0,
+        )
+        page = json.loads(response.choices[0].message.content or '{}')
+        result['order_number'] = result['order_number'] or str(page.get('order_number') or '')
+        result['order_date'] = result['order_date'] or _parse_date(page.get('order_date'))
+        for item in page.get('items') or []:
+            try:
+                result['items'].append({
+                    'quantity': int(item.get('quantity') or 1),
+                    'sku': str(item.get('sku') or ''),
+                    'brand': str(item.get('brand') or ''),
+                    'description': str(item.get('description') or ''),
+                    'serial': item.get('serial') or None,
+                    'software': bool(item.get('software')),
+                    'price': float(item.get('price')),
+                })
+            except (TypeError, ValueError):
+                continue
+    return result
+
+
+def parse_invoice(path, api_key=None):
+    """
+    Parse one PDF. Runs in a worker process, so it only takes plain arguments
+    and returns a JSON-serialisable dict.
+    """
+    from pypdf import PdfReader
+
+    result = {'file': os.path.basename(path), 'hash': file_hash(path), 'version': PARSER_VERSION}
+    try:
+        reader = PdfReader(path)
+        text = '\n'.join(page.extract_text() or '' for page in reader.pages)
+        parsed = parse_invoice_text(text)
+        method = 'text'
+        if not parsed['items']:
+            images = list(_page_images(reader))
+            if not images:
+                method = 'empty'
+            elif not api_key:
+                method = 'needs_ocr'
+            else:
+                parsed = parse_images_with_openai(images, api_key)
+                method = 'openai'
+        result.update(parsed, method=method, error='')
+    except Exception as e:
+        result.update(order_number='', order_date=None, items=[], method='error', error=str(e))
+    return result
+
+
+class ParseCache:
+    """Parsed invoices stored as <hash>.json under directory (None disables it)."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory) if directory else None
+
+    def get(self, digest):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.directory / f'{digest}.json') as fh:
+                parsed = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return parsed if parsed.get('version') == PARSER_VERSION else None
+
+    def set(self, parsed):
+        # Failures and image-only files without OCR are retried next run
+        if self.directory is None or parsed['method'] in ('error', 'needs_ocr'):
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{parsed['hash']}.json"
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(parsed, fh)
+        tmp.replace(path)
+
+
+def invoice_files(directory):
+    return sorted(str(path) for path in Path(directory).glob('*.pdf'))
+
+
+def parse_invoices(paths, cache, api_key=None, workers=None):
+    """Parsed results for every path, parsing uncached files in a process pool."""
+    results = {}
+    pending = []
+    for path in paths:
+        cached = cache.get(file_hash(path))
+        if cached is not None:
+            results[path] = dict(cached, file=os.path.basename(path), cached=True)
+        else:
+            pending.append(path)
+
+    if pending:
+        if workers == 1 or len(pending) == 1:
+            parsed_list = [parse_invoice(path, api_key) for path in pending]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed_list = list(pool.map(parse_invoice, pending, [api_key] * len(pending)))
+        for path, parsed in zip(pending, parsed_list):
+            cache.set(parsed)
+            results[path] = dict(parsed, cached=False)
+    return [results[path] for path in paths]
+
+
+@dataclass
+class IngestResult:
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    # (invoice file, line item, reason)
+    skipped: list = field(default_factory=list)
+
+
+def _brand_for(item, known_brands):
+    if item.get('brand'):
+        return item['brand']
+    description = item.get('description', '')
+    lowered = description.lower()
+    # Longest known brand the description starts with, else its first word
+    for brand in sorted(known_brands, key=len, reverse=True):
+        if brand and lowered.startswith(brand.lower()):
+            return brand
+    return description.split(' ', 1)[0] if description else ''
+
+
+def ingest(parsed_invoices, category_name=DEFAULT_CATEGORY, include_software=False, user=None, dry_run=False):
+    """
+    Match line items to equipment and record purchase data. Serial numbers
+    are matched first, then model numbers of equipment without a purchase
+    price. Unmatched items are created; items without a printed serial get a
+    stable placeholder serial (INV-<order>-<line>) so re-runs match them.
+    """
+    result = IngestResult()
+    lines = []
+    for invoice in parsed_invoices:
+        for number, item in enumerate(invoice['items'], start=1):
+            if item.get('software') and not include_software:
+                result.skipped.append((invoice['file'], item, 'software license'))
+            elif item.get('price') is None or item['price'] <= 0:
+                result.skipped.append((invoice['file'], item, 'no price'))
+            else:
+                serial = item.get('serial') or f"INV-{invoice.get('order_number') or invoice['hash'][:10]}-{number}"
+                lines.append((invoice, item, serial))
+    if not lines:
+        return result
+
+    by_serial = Equipment.objects.in_bulk([serial for _, _, serial in lines], field_name='serial_number')
+    by_model = {}
+    for equipment in Equipment.objects.filter(
+            model_number__in={item['sku'] for _, item, _ in lines if item.get('sku')},
+            purchase_price__isnull=True).order_by('id'):
+        by_model.setdefault(equipment.model_number, []).append(equipment)
+    known_brands = set(Equipment.objects.values_list('brand', flat=True).distinct())
+
+    to_update = {}
+    to_create = []
+    for invoice, item, serial in lines:
+        price = (Decimal(str(item['price'])) / max(item.get('quantity') or 1, 1)).quantize(Decimal('0.01'))
+        purchase_date = datetime.date.fromisoformat(invoice['order_date']) if invoice.get('order_date') else None
+        equipment = by_serial.get(serial)
+        if equipment is None and by_model.get(item.get('sku')):
+            equipment = by_model[item['sku']].pop(0)
+        if equipment is not None:
+            if equipment.purchase_price == price and equipment.purchase_date == purchase_date:
+                result.skipped.append((invoice['file'], item, f'already recorded on {equipment}'))
+                continue
+            equipment.purchase_price = price
+            equipment.purchase_date = purchase_date or equipment.purchase_date
+            equipment.updated_at = timezone.now()
+            to_update[equipment.pk] = equipment
+            continue
+
+        pricing = default_pricing(price)
+        brand = _brand_for(item, known_brands)
+        new = Equipment(
+            name=item['description'][:200] or item.get('sku', ''),
+            description=item['description'],
+            brand=brand[:100],
+            model_number=(item.get('sku') or '')[:100],
+            serial_number=serial[:100],
+            purchase_date=purchase_date,
+            purchase_price=price,
+            rental_price_daily=Decimal(str(pricing['daily_price'])).quantize(Decimal('0.01')),
+            rental_price_weekly=Decimal(str(pricing['weekly_price'])).quantize(Decimal('0.01')),
+            rental_price_monthly=Decimal(str(pricing['monthly_price'])).quantize(Decimal('0.01')),
+            deposit_amount=Decimal(str(pricing['deposit_amount'])).quantize(Decimal('0.01')),
+            quantity=item.get('quantity') or 1,
+            status='available',
+            notes=f"Imported from invoice {invoice.get('order_number') or invoice['file']}",
+        )
+        by_serial[serial] = new
+        to_create.append(new)
+
+    result.updated = list(to_update.values())
+    result.created = to_create
+    if dry_run:
+        return result
+
+    with transaction.atomic():
+        if to_create:
+            category, _ = Category.objects.get_or_create(name=category_name)
+            for equipment in to_create:
+                equipment.category = category
+            result.created = bulk_create_with_history(
+                to_create, Equipment, default_user=user, default_change_reason='Imported from invoice')
+        if result.updated:
+            bulk_update_with_history(
+                result.updated, Equipment, ['purchase_price', 'purchase_date', 'updated_at'],
+                default_user=user, default_change_reason='Purchase data from invoice')
+    generate_qr_codes(result.created)
+    return result
+
+
+def cache_dir():
+    return getattr(settings, 'INVOICE_PARSE_CACHE_DIR', None)
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from inventory.uploads import cleanup_expired_sessions
+
+class Command(BaseCommand):
+    help = 'Delete expired chunked upload sessions and their stored chunks'
+
+    def handle(self, *args, **options):
+        count = cleanup_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Removed {count} expired upload sessions'))
@@ -5,6 +5,7 @@ from decimal import Decimal
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from inventory.models import Equipment, Category
+from inventory import enrichment
 from django.core.serializers import serialize
 import openai
 
@@ -25,8 +26,23 @@ class Command(BaseCommand):
         parser.add_argument('--api-key', type=str, help='OpenAI API key (if not set in environment)')
         parser.add_argument('--save-fixture', action='store_true', help='Save result as a fixture')
         parser.add_argument('--batch', type=str, help='Path to JSON file with multiple items to process')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Batch only: price items from the response cache without calling OpenAI or saving')
+        parser.add_argument('--responses', type=str,
+                            help='Batch only: answer from a recorded responses JSON file instead of OpenAI (offline)')
+        parser.add_argument('--chunk-size', type=int, default=enrichment.DEFAULT_CHUNK_SIZE,
+                            help='Batch only: items priced per OpenAI request')
+        parser.add_argument('--workers', type=int, default=enrichment.DEFAULT_WORKERS,
+                            help='Batch only: concurrent OpenAI requests')
+        parser.add_argument('--cache-dir', type=str, default=None,
+                            help='Batch only: response cache directory (default: OPENAI_PRICING_CACHE_DIR)')
+        parser.add_argument('--no-cache', action='store_true', help='Batch only: do not read or write the response cache')
 
     def handle(self, *args, **options):
+        # Process batch file if specified
+        if options.get('batch'):
+            return self.process_batch(options.get('batch'), options.get('save_fixture', False), options)
+
         # Check for OpenAI API key
         api_key = options.get('api_key') or os.environ.get('OPENAI_API_KEY')
         if not api_key:
@@ -37,10 +53,6 @@ class Command(BaseCommand):
 
         openai.api_key = api_key
 
-        # Process batch file if specified
-        if options.get('batch'):
-            return self.process_batch(options.get('batch'), options.get('save_fixture', False))
-
         # Process single item
         if not all([options.get('name'), options.get('description'), options.get('brand'), options.get('category')]):
             self.stderr.write(
@@ -50,43 +62,60 @@ class Command(BaseCommand):
 
         self.create_equipment_item(options, options.get('save_fixture', False))
 
-    def process_batch(self, batch_file, save_fixture):
-        """Process multiple items from a JSON file"""
+    def process_batch(self, batch_file, save_fixture, options):
+        """Price and create multiple items from a JSON file (see inventory/enrichment.py)"""
         try:
             with open(batch_file, 'r') as f:
-                items = json.load(f)
-            
-            created_items = []
-            for item in items:
-                # Convert to command options format
-                options = {
-                    'name': item.get('name'),
-                    'description': item.get('description'),
-                    'brand': item.get('brand'),
-                    'model': item.get('model', ''),
-                    'serial': item.get('serial', ''),
-                    'purchase_date': item.get('purchase_date'),
-                    'purchase_price': item.get('purchase_price'),
-                    'category': item.get('category'),
-                    'condition': item.get('condition', ''),
-                    'notes': item.get('notes', ''),
-                }
-                
-                created_item = self.create_equipment_item(options, False)
-                if created_item:
-                    created_items.append(created_item)
-            
-            if save_fixture and created_items:
-                self.save_as_fixture(created_items)
-                
-            self.stdout.write(
-                self.style.SUCCESS(f'Successfully processed {len(created_items)} items')
-            )
-            
-        except Exception as e:
-            self.stderr.write(
-                self.style.ERROR(f'Error processing batch file: {str(e)}')
-            )
+                items = [enrichment.normalize_item(item) for item in json.load(f)]
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Error reading batch file: {e}')
+
+        dry_run = options.get('dry_run', False)
+        if dry_run:
+            client = None
+        elif options.get('responses'):
+            client = enrichment.RecordedPricingClient(options['responses'])
+        else:
+            api_key = options.get('api_key') or os.environ.get('OPENAI_API_KEY')
+            if not api_key:
+                raise CommandError('OpenAI API key is required. Set it with --api-key or OPENAI_API_KEY '
+                                   'environment variable, or use --responses/--dry-run.')
+            client = enrichment.OpenAIPricingClient(api_key)
+
+        cache_dir = None if options.get('no_cache') else (options.get('cache_dir') or enrichment.cache_dir())
+        enricher = enrichment.BatchEnricher(
+            client=client,
+            cache=enrichment.PricingCache(cache_dir),
+            chunk_size=options.get('chunk_size') or enrichment.DEFAULT_CHUNK_SIZE,
+            workers=options.get('workers') or enrichment.DEFAULT_WORKERS,
+        )
+        enriched = enricher.enrich(items)
+        for error in enricher.errors:
+            self.stderr.write(self.style.WARNING(f'OpenAI API error: {error}'))
+
+        sources = {source: sum(1 for e in enriched if e.source == source) for source in ('cache', 'api', 'default')}
+        self.stdout.write(f"Priced {len(enriched)} items: {sources['cache']} from cache, "
+                          f"{sources['api']} from OpenAI, {sources['default']} with default pricing")
+
+        if dry_run:
+            for e in enriched:
+                self.stdout.write(f"{e.item.get('name')}: daily ${e.pricing['daily_price']:.2f}, "
+                                  f"deposit ${e.pricing['deposit_amount']:.2f} ({e.source})")
+            self.stdout.write(self.style.SUCCESS('Dry run, nothing saved'))
+            return
+
+        created_items, skipped = enrichment.create_equipment(enriched)
+        for item, reason in skipped:
+            self.stderr.write(self.style.WARNING(f"Skipped {item.get('name') or 'item'}: {reason}"))
+
+        if save_fixture and created_items:
+            self.save_as_fixture(created_items)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully processed {len(created_items)} items')
+        )
+        if created_items:
+            self.stdout.write('Run "manage.py fetch_manuals --all" to look up manuals for the new items')
 
     def create_equipment_item(self, options, save_fixture):
         """Create a single equipment item with OpenAI pricing suggestions"""
@@ -212,34 +241,14 @@ Return your response in a structured JSON format with these keys:
                 except Exception:
                     # Fallback to defaults if parsing fails
                     self.stderr.write(self.style.WARNING('Failed to parse OpenAI response, using default values'))
-                    if purchase_price:
-                        default_daily = float(purchase_price) * 0.03
-                    else:
-                        default_daily = 50.0
-                    
-                    return {
-                        'daily_price': default_daily,
-                        'weekly_price': default_daily * 4 * 0.8,  # 20% discount
-                        'monthly_price': default_daily * 4 * 4 * 0.6,  # 40% discount
-                        'deposit_amount': (purchase_price * 0.3) if purchase_price else 200.0
-                    }
+                    return enrichment.default_pricing(purchase_price)
             
             return pricing_data
             
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'OpenAI API error: {str(e)}'))
             # Return default values based on purchase price
-            if purchase_price:
-                default_daily = float(purchase_price) * 0.03
-            else:
-                default_daily = 50.0
-                
-            return {
-                'daily_price': default_daily,
-                'weekly_price': default_daily * 4 * 0.8,  # 20% discount
-                'monthly_price': default_daily * 4 * 4 * 0.6,  # 40% discount
-                'deposit_amount': (purchase_price * 0.3) if purchase_price else 200.0
-            }
+            return enrichment.default_pricing(purchase_price)
 
     def save_as_fixture(self, equipment_items):
         """Save equipment items as a fixture file"""
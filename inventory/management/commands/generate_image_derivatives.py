@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from inventory.images import derivatives_are_current, generate_image_derivatives
+from inventory.models import Equipment
+
+class Command(BaseCommand):
+    help = 'Build thumbnail, card and detail derivatives for equipment images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--id', type=int, help='Equipment ID to process')
+        parser.add_argument('--force', action='store_true', help='Rebuild derivatives that are already up to date')
+
+    def handle(self, *args, **options):
+        equipment_list = Equipment.objects.exclude(main_image='').exclude(main_image__isnull=True)
+        if options['id']:
+            equipment_list = equipment_list.filter(id=options['id'])
+
+        built = 0
+        skipped = 0
+        for equipment in equipment_list.iterator():
+            if derivatives_are_current(equipment) and not options['force']:
+                skipped += 1
+                continue
+            try:
+                generate_image_derivatives(equipment)
+                built += 1
+                self.stdout.write(f"Built derivatives for {equipment.name} (ID: {equipment.id})")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Failed for {equipment.name} (ID: {equipment.id}): {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} items, {skipped} already up to date"))
@@ -0,0 +1,63 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from inventory import invoices
+
+
+class Command(BaseCommand):
+    help = 'Read purchase prices and dates from supplier invoice PDFs into equipment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', type=str, default=os.path.join(settings.BASE_DIR, 'past_equipment_invoices'),
+                            help='Directory of invoice PDFs')
+        parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: CPU count)')
+        parser.add_argument('--category', type=str, default=invoices.DEFAULT_CATEGORY,
+                            help='Category for equipment created from invoices')
+        parser.add_argument('--include-software', action='store_true',
+                            help='Also import software licenses and downloads')
+        parser.add_argument('--api-key', type=str,
+                            help='OpenAI API key for image-only invoices (default: OPENAI_API_KEY)')
+        parser.add_argument('--no-cache', action='store_true', help='Re-parse every file')
+        parser.add_argument('--dry-run', action='store_true', help='Show what would change without saving')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(options['path']):
+            raise CommandError(f"No such directory: {options['path']}")
+        paths = invoices.invoice_files(options['path'])
+        if not paths:
+            self.stdout.write(self.style.WARNING(f"No PDF files in {options['path']}"))
+            return
+
+        cache = invoices.ParseCache(None if options['no_cache'] else invoices.cache_dir())
+        api_key = options.get('api_key') or settings.OPENAI_API_KEY
+        parsed = invoices.parse_invoices(paths, cache, api_key=api_key, workers=options['workers'])
+
+        for invoice in parsed:
+            if invoice['method'] == 'error':
+                self.stdout.write(self.style.ERROR(f"{invoice['file']}: {invoice['error']}"))
+            elif invoice['method'] == 'needs_ocr':
+                self.stdout.write(self.style.WARNING(
+                    f"{invoice['file']}: image-only PDF, set OPENAI_API_KEY to read it"))
+        cached = sum(1 for invoice in parsed if invoice['cached'])
+        items = sum(len(invoice['items']) for invoice in parsed)
+        self.stdout.write(f"Parsed {len(parsed)} invoices ({cached} from cache), {items} line items")
+
+        result = invoices.ingest(parsed, category_name=options['category'],
+                                 include_software=options['include_software'], dry_run=options['dry_run'])
+        for equipment in result.updated:
+            self.stdout.write(f"Updated {equipment.name} (serial {equipment.serial_number}): "
+                              f"${equipment.purchase_price} on {equipment.purchase_date}")
+        for equipment in result.created:
+            self.stdout.write(f"Created {equipment.name} (serial {equipment.serial_number}): "
+                              f"${equipment.purchase_price} on {equipment.purchase_date}")
+        if options['verbosity'] > 1:
+            for file, item, reason in result.skipped:
+                self.stdout.write(f"Skipped {item.get('description') or item.get('sku')} in {file}: {reason}")
+
+        summary = (f"{len(result.created)} created, {len(result.updated)} updated, "
+                   f"{len(result.skipped)} skipped")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Dry run: {summary}, nothing saved"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Invoices ingested: {summary}"))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_equipment_replacement_value_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='historicalequipment',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
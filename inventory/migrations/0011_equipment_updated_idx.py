@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-19 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['updated_at'], name='equipment_updated_idx'),
+        ),
+    ]
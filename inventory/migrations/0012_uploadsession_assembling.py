@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_equipment_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('assembling', 'Assembling'), ('complete', 'Complete'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User, AbstractUser
 from django.urls import reverse
 from django.utils import timezone
@@ -12,6 +13,7 @@ from django.core.files import File
 from PIL import Image, ImageDraw
 from django.core.validators import RegexValidator
 from phonenumber_field.modelfields import PhoneNumberField
+from music_rental.model_mixins import DirtyFieldsMixin
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -24,7 +26,7 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
-class Equipment(models.Model):
+class Equipment(DirtyFieldsMixin, models.Model):
     STATUS_CHOICES = (
         ('available', 'Available'),
         ('rented', 'Rented'),
@@ -62,6 +64,8 @@ class Equipment(models.Model):
     
     # Media related fields
     main_image = models.ImageField(upload_to='equipment_images/', blank=True, null=True)
+    # Resized copies of main_image, see inventory/images.py
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     # Track history of changes
     history = HistoricalRecords()
@@ -69,8 +73,16 @@ class Equipment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Changes to only these fields are saved with update_fields and skip the
+    # QR code, manual and image hooks (see save())
+    FAST_SAVE_FIELDS = {'status'}
+    
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Catalog deltas for offline scanning (inventory/catalog.py)
+            models.Index(fields=['updated_at'], name='equipment_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.brand})"
@@ -82,6 +94,14 @@ class Equipment(models.Model):
         # Extract and pop our custom parameter before passing to super() method
         skip_qr = kwargs.pop('skip_qr', False)
         skip_manual = kwargs.pop('skip_manual', False)
+        update_fields = kwargs.get('update_fields')
+        
+        # A status flip on a saved item is a single UPDATE (plus its history row)
+        if update_fields is None and not args and not kwargs.get('force_insert'):
+            dirty = self.get_dirty_fields()
+            if dirty and dirty.keys() <= self.FAST_SAVE_FIELDS:
+                super().save(update_fields=[*dirty, 'updated_at'], **kwargs)
+                return
         
         # Save first to get an ID
         super().save(*args, **kwargs)
@@ -109,6 +129,17 @@ class Equipment(models.Model):
                 super().save(update_fields=['manual_last_checked'])
             except Exception as e:
                 print(f"Error fetching manual: {e}")
+
+        # Build thumbnails for a new or replaced image off the request thread
+        from .images import derivatives_are_current, schedule_image_derivatives
+        if update_fields is None or 'main_image' in update_fields:
+            if self.main_image and not derivatives_are_current(self):
+                if getattr(self, '_derivatives_scheduled_for', None) != self.main_image.name:
+                    self._derivatives_scheduled_for = self.main_image.name
+                    schedule_image_derivatives(self)
+            elif not self.main_image and self.image_derivatives:
+                self.image_derivatives = {}
+                Equipment.objects.filter(pk=self.pk).update(image_derivatives={})
     
     def generate_qr_code(self):
         qr = qrcode.QRCode(
@@ -153,6 +184,57 @@ class EquipmentAttachment(models.Model):
     def __str__(self):
         return f"Attachment for {self.equipment.name}"
 
+class UploadSession(models.Model):
+    """A resumable, chunked upload that becomes an EquipmentAttachment when complete."""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('assembling', 'Assembling'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='upload_sessions')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    description = models.CharField(max_length=255, blank=True)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    received_chunks = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attachment = models.OneToOneField(EquipmentAttachment, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='upload_session')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Upload of {self.filename} for {self.equipment.name} ({self.get_status_display()})"
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    @property
+    def missing_chunks(self):
+        received = set(self.received_chunks)
+        return [index for index in range(self.total_chunks) if index not in received]
+
+    def expected_chunk_length(self, index):
+        if index == self.total_chunks - 1:
+            return self.total_size - self.chunk_size * index
+        return self.chunk_size
+
+    def chunk_name(self, index):
+        return f"upload_chunks/{self.id}/{index:06d}.part"
+
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
 class MaintenanceRecord(models.Model):
     equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='maintenance_records')
     date = models.DateField()
@@ -0,0 +1,28 @@
+from django import template
+
+from inventory.images import derivative_url, render_picture, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def equipment_picture(equipment, size='card', css_class='', alt=None, sizes=None):
+    """
+    Render equipment.main_image as a responsive <picture>.
+
+    Usage: {% equipment_picture item 'card' css_class='card-img-top' %}
+    """
+    if not equipment.main_image:
+        return ''
+    return render_picture(equipment, size=size, css_class=css_class, alt=alt, sizes=sizes)
+
+
+@register.simple_tag
+def equipment_image_url(equipment, size='card', ext='jpg'):
+    """URL of a single derivative, e.g. for CSS backgrounds or Open Graph tags."""
+    return derivative_url(equipment, size, ext)
+
+
+@register.simple_tag
+def equipment_srcset(equipment, ext='jpg'):
+    return srcset(equipment, ext)
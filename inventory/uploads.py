@@ -0,0 +1,251 @@
+"""
+Resumable, chunked uploads for equipment attachments.
+
+Large manuals and photo batches used to pass through a single request into
+memory or a temp file before being pushed to storage. Instead the client opens
+an UploadSession, sends the file in fixed-size chunks (in any order, retrying
+any that fail), and asks the server to assemble them. Chunks are written
+straight to the default storage backend and assembly streams them back in
+order, so no request ever holds more than one chunk.
+"""
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import EquipmentAttachment, UploadSession
+
+logger = logging.getLogger(__name__)
+
+# Sent once an upload has been assembled into an EquipmentAttachment.
+# Receivers get `session` and `attachment` keyword arguments.
+upload_completed = Signal()
+
+TOKEN_SALT = 'inventory.uploads'
+
+
+class UploadError(Exception):
+    """Raised when an upload request can't be accepted."""
+
+
+def chunk_size():
+    return getattr(settings, 'UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+
+
+def max_upload_size():
+    return getattr(settings, 'UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+
+def session_ttl():
+    return getattr(settings, 'UPLOAD_SESSION_TTL', timedelta(hours=24))
+
+
+def allowed_content_types():
+    return getattr(settings, 'UPLOAD_ALLOWED_CONTENT_TYPES',
+                   ['application/pdf', 'image/jpeg', 'image/png', 'image/gif', 'image/webp'])
+
+
+def make_token(session):
+    """Signed token that authorises chunk uploads for one session."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(session.id))
+
+
+def check_token(session, token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token or '', max_age=session_ttl().total_seconds())
+    except signing.BadSignature:
+        return False
+    return value == str(session.id)
+
+
+def create_session(equipment, filename, total_size, content_type, user=None, description=''):
+    """Open a new upload session and return it with its signed token."""
+    if content_type not in allowed_content_types():
+        raise UploadError(f"File type not allowed: {content_type}")
+    if total_size <= 0:
+        raise UploadError("File is empty")
+    if total_size > max_upload_size():
+        raise UploadError(f"File is larger than {max_upload_size() // (1024 * 1024)}MB")
+
+    session = UploadSession.objects.create(
+        equipment=equipment,
+        created_by=user if user and user.is_authenticated else None,
+        filename=get_valid_filename(os.path.basename(filename)) or 'upload',
+        content_type=content_type,
+        description=description or '',
+        total_size=total_size,
+        chunk_size=chunk_size(),
+        expires_at=timezone.now() + session_ttl(),
+    )
+    return session, make_token(session)
+
+
+def store_chunk(session, index, data):
+    """Write one chunk to storage. Re-sending a chunk simply replaces it."""
+    if not 0 <= index < session.total_chunks:
+        raise UploadError(f"Chunk {index} out of range")
+    expected = session.expected_chunk_length(index)
+    if len(data) != expected:
+        raise UploadError(f"Chunk {index} should be {expected} bytes, got {len(data)}")
+
+    # Chunks may arrive concurrently, and complete_session() claims the row
+    # before reading them back, so check and write under the row lock
+    with transaction.atomic():
+        locked = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if locked.status != 'pending':
+            raise UploadError("Upload session is no longer accepting chunks")
+        if locked.is_expired():
+            raise UploadError("Upload session has expired")
+
+        name = session.chunk_name(index)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(data))
+
+        if index not in locked.received_chunks:
+            locked.received_chunks = sorted(locked.received_chunks + [index])
+            locked.save(update_fields=['received_chunks', 'updated_at'])
+    session.received_chunks = locked.received_chunks
+    return session
+
+
+class ChunkSequenceFile(io.RawIOBase):
+    """Read-only file object that streams a session's chunks back in order."""
+
+    def __init__(self, session, storage=None):
+        self.session = session
+        self.storage = storage or default_storage
+        self.size = session.total_size
+        self.name = session.filename
+        self._index = 0
+        self._current = None
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # Storage backends only ever rewind before uploading
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("ChunkSequenceFile can only rewind to the start")
+        self._close_current()
+        self._index = 0
+        self._position = 0
+        return 0
+
+    def readinto(self, buffer):
+        while self._index < self.session.total_chunks:
+            if self._current is None:
+                self._current = self.storage.open(self.session.chunk_name(self._index), 'rb')
+            data = self._current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                self._position += len(data)
+                return len(data)
+            self._close_current()
+            self._index += 1
+        return 0
+
+    def _close_current(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        self._close_current()
+        super().close()
+
+
+def delete_chunks(session):
+    for index in range(session.total_chunks):
+        name = session.chunk_name(index)
+        try:
+            if default_storage.exists(name):
+                default_storage.delete(name)
+        except Exception:
+            logger.warning("Could not delete upload chunk %s", name, exc_info=True)
+
+
+def _set_status(session, status):
+    session.status = status
+    UploadSession.objects.filter(pk=session.pk).update(status=status, updated_at=timezone.now())
+
+
+def complete_session(session):
+    """
+    Assemble all chunks into an EquipmentAttachment and fire upload_completed.
+    The session is claimed first (pending -> assembling in one UPDATE), so
+    a retried or concurrent completion never assembles the file twice.
+    """
+    claimed = UploadSession.objects.filter(pk=session.pk, status='pending') \
+        .update(status='assembling', updated_at=timezone.now())
+    session.refresh_from_db()
+    if not claimed:
+        if session.status == 'complete':
+            return session.attachment
+        if session.status == 'assembling':
+            raise UploadError("Upload is already being assembled")
+        raise UploadError("Upload session has failed")
+
+    missing = session.missing_chunks
+    if missing:
+        _set_status(session, 'pending')
+        raise UploadError(f"Missing {len(missing)} chunk(s), starting at {missing[0]}")
+
+    upload_to = EquipmentAttachment._meta.get_field('file').upload_to
+    stream = ChunkSequenceFile(session)
+    try:
+        stored_name = default_storage.save(os.path.join(upload_to, session.filename), File(stream, name=session.filename))
+    except Exception:
+        # Let the client retry the completion
+        _set_status(session, 'pending')
+        raise
+    finally:
+        stream.close()
+
+    stored_size = default_storage.size(stored_name)
+    if stored_size != session.total_size:
+        default_storage.delete(stored_name)
+        _set_status(session, 'failed')
+        raise UploadError(f"Assembled file is {stored_size} bytes, expected {session.total_size}")
+
+    with transaction.atomic():
+        attachment = EquipmentAttachment(equipment=session.equipment, description=session.description)
+        attachment.file.name = stored_name
+        attachment.save()
+        session.attachment = attachment
+        session.status = 'complete'
+        session.save(update_fields=['attachment', 'status', 'updated_at'])
+
+    delete_chunks(session)
+    upload_completed.send(sender=UploadSession, session=session, attachment=attachment)
+    return attachment
+
+
+def cleanup_expired_sessions(now=None):
+    """Delete chunks and records for sessions that expired before completing."""
+    now = now or timezone.now()
+    expired = UploadSession.objects.filter(expires_at__lte=now).exclude(status='complete')
+    count = 0
+    for session in expired.iterator():
+        delete_chunks(session)
+        count += 1
+    expired.delete()
+    return count
@@ -15,7 +15,16 @@ urlpatterns = [
     path('<int:pk>/add-maintenance/', views.add_maintenance_record, name='add_maintenance'),
     path('<int:pk>/add-attachment/', views.add_attachment, name='add_attachment'),
     
+    # Chunked attachment uploads
+    path('<int:pk>/uploads/', views.upload_session_create, name='upload_session_create'),
+    path('uploads/<uuid:session_id>/', views.upload_session_status, name='upload_session_status'),
+    path('uploads/<uuid:session_id>/chunks/<int:index>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:session_id>/complete/', views.upload_session_complete, name='upload_session_complete'),
+    
     # Mobile optimized routes
     path('mobile/scan/', views.scan_equipment, name='mobile_scan'),
+    path('mobile/catalog/', views.catalog_snapshot, name='catalog_snapshot'),
+    path('mobile/catalog/changes/', views.catalog_changes, name='catalog_changes'),
+    path('mobile/catalog/sync/', views.catalog_sync, name='catalog_sync'),
     path('<int:pk>/status-update/', views.quick_status_update, name='quick_status_update'),
 ]
\ No newline at end of file
@@ -4,9 +4,13 @@ from django.contrib import messages
 from django.http import HttpResponse, JsonResponse, HttpResponseRedirect
 from django.urls import reverse
 from django.core.paginator import Paginator
-from .models import Equipment, Category, EquipmentAttachment, MaintenanceRecord
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.utils.http import parse_etags, quote_etag
+from .models import Equipment, Category, EquipmentAttachment, MaintenanceRecord, UploadSession
 from .forms import EquipmentForm, AttachmentForm, MaintenanceRecordForm
 from .utils import log_search_query
+from . import catalog, uploads
+from music_rental.storage_backends import file_metadata
 import qrcode
 from io import BytesIO
 import base64
@@ -127,7 +131,11 @@ def equipment_list(request):
 def equipment_detail(request, pk):
     """Display detailed information about a specific equipment item."""
     equipment = get_object_or_404(Equipment, pk=pk)
-    attachments = equipment.attachments.all()
+    attachments = list(equipment.attachments.all())
+    # One storage lookup for the whole list rather than one per attachment
+    metadata = file_metadata([attachment.file for attachment in attachments])
+    for attachment in attachments:
+        attachment.file_meta = metadata.get(attachment.file.name)
     maintenance_records = equipment.maintenance_records.all().order_by('-date')
     
     context = {
@@ -176,9 +184,7 @@ def equipment_edit(request, pk):
     
     if request.method == 'POST':
         form = EquipmentForm(request.POST, request.FILES, instance=equipment)
-        print(f"Form data: {request.POST}")  # Debug
         if form.is_valid():
-            print("Form is valid")  # Debug
             equipment = form.save()
             
             # Handle attachments
@@ -189,7 +195,6 @@ def equipment_edit(request, pk):
             messages.success(request, f'Equipment "{equipment.name}" has been updated successfully.')
             return HttpResponseRedirect(reverse('inventory:equipment_detail', args=[equipment.pk]))
         else:
-            print(f"Form errors: {form.errors}")  # Debug
             messages.error(request, 'Please correct the errors below.')
     else:
         form = EquipmentForm(instance=equipment)
@@ -231,6 +236,49 @@ def scan_equipment(request):
     }
     return render(request, 'inventory/mobile/scan_interface.html', context)
 
+# Catalog snapshot, deltas and batched status sync for offline scanning (see inventory/catalog.py)
+@login_required
+@require_GET
+def catalog_snapshot(request):
+    """The whole catalog in compact form, or 304 if the client's copy is current."""
+    etag = quote_etag(catalog.snapshot_etag())
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+    return catalog.payload_response(request, catalog.snapshot(), etag=etag)
+
+@login_required
+@require_GET
+def catalog_changes(request):
+    """Items changed and deleted since the cursor in ?since."""
+    since = catalog.parse_cursor(request.GET.get('since'))
+    if since is None:
+        return JsonResponse({'status': 'error', 'message': 'A valid since cursor is required'}, status=400)
+    try:
+        data = catalog.changes(since)
+    except catalog.StaleCursor:
+        return JsonResponse({'status': 'error', 'message': 'Cursor too old, fetch a new snapshot',
+                             'snapshot_url': reverse('inventory:catalog_snapshot')}, status=410)
+    return catalog.payload_response(request, data)
+
+@login_required
+@require_POST
+def catalog_sync(request):
+    """Apply a batch of status changes made offline."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'status': 'error', 'message': 'Staff only'}, status=403)
+    try:
+        data = catalog.read_payload(request)
+        cursor = catalog.parse_cursor(data.get('cursor'))
+        changes = data.get('changes')
+    except (ValueError, AttributeError, OSError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid payload'}, status=400)
+    if cursor is None or not isinstance(changes, list):
+        return JsonResponse({'status': 'error', 'message': 'cursor and a list of changes are required'}, status=400)
+    result = catalog.apply_status_changes(cursor, changes, user=request.user)
+    return catalog.payload_response(request, dict(result, status='success', fields=list(catalog.FIELDS)))
+
 @login_required
 def equipment_delete(request, pk):
     """Delete an equipment item."""
@@ -352,3 +400,104 @@ def add_attachment(request, pk):
     
     template = 'inventory/mobile/add_attachment.html' if is_mobile_device(request) else 'inventory/add_attachment.html'
     return render(request, template, context)
+
+# Chunked, resumable attachment uploads (see inventory/uploads.py)
+def _upload_session_payload(session, token=None):
+    payload = {
+        'session_id': str(session.id),
+        'status': session.status,
+        'filename': session.filename,
+        'total_size': session.total_size,
+        'chunk_size': session.chunk_size,
+        'total_chunks': session.total_chunks,
+        'received_chunks': session.received_chunks,
+        'missing_chunks': session.missing_chunks,
+        'status_url': reverse('inventory:upload_session_status', args=[session.id]),
+        'complete_url': reverse('inventory:upload_session_complete', args=[session.id]),
+        'chunk_url_template': reverse('inventory:upload_chunk', args=[session.id, 0]).replace('/0/', '/{index}/'),
+    }
+    if token:
+        payload['token'] = token
+    return payload
+
+def _get_upload_session(request, session_id):
+    session = get_object_or_404(UploadSession.objects.select_related('equipment'), pk=session_id)
+    if not uploads.check_token(session, request.headers.get('X-Upload-Token')):
+        return session, JsonResponse({'status': 'error', 'message': 'Invalid or expired upload token'}, status=403)
+    return session, None
+
+@login_required
+@require_POST
+def upload_session_create(request, pk):
+    """Open a chunked upload session for a new attachment."""
+    equipment = get_object_or_404(Equipment, pk=pk)
+    try:
+        data = json.loads(request.body or '{}') if request.content_type == 'application/json' else request.POST
+        session, token = uploads.create_session(
+            equipment,
+            filename=data.get('filename', ''),
+            total_size=int(data.get('size') or 0),
+            content_type=data.get('content_type', ''),
+            user=request.user,
+            description=data.get('description', ''),
+        )
+    except (ValueError, uploads.UploadError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse(_upload_session_payload(session, token), status=201)
+
+@login_required
+def upload_session_status(request, session_id):
+    """Report which chunks have arrived so an interrupted upload can resume."""
+    session, error = _get_upload_session(request, session_id)
+    if error:
+        return error
+    return JsonResponse(_upload_session_payload(session))
+
+@login_required
+@require_http_methods(['PUT', 'POST'])
+def upload_chunk(request, session_id, index):
+    """Receive one chunk of an upload as the raw request body."""
+    session, error = _get_upload_session(request, session_id)
+    if error:
+        return error
+
+    # Read at most one chunk's worth so an oversized body can't exhaust memory
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > session.chunk_size:
+        return JsonResponse({'status': 'error', 'message': 'Chunk too large'}, status=413)
+    data = request.read(session.chunk_size + 1)
+
+    try:
+        uploads.store_chunk(session, index, data)
+    except uploads.UploadError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'received_chunks': session.received_chunks,
+        'missing_chunks': session.missing_chunks,
+    })
+
+@login_required
+@require_POST
+def upload_session_complete(request, session_id):
+    """Assemble the uploaded chunks into an equipment attachment."""
+    session, error = _get_upload_session(request, session_id)
+    if error:
+        return error
+
+    try:
+        attachment = uploads.complete_session(session)
+    except uploads.UploadError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    return JsonResponse({
+        'status': 'success',
+        'attachment_id': attachment.id,
+        'url': attachment.file.url,
+        'redirect_url': reverse('inventory:equipment_detail', args=[session.equipment_id]),
+    })
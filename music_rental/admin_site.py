@@ -1,13 +1,19 @@
 from django.contrib.admin import AdminSite
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.db.models import Count, Sum
 from rentals.models import Customer, Rental, Contract
 from rentals.admin import CustomerAdmin, RentalAdmin, ContractAdmin
-from inventory.models import Category, Equipment, MaintenanceRecord, EquipmentAttachment, SearchLog
-from inventory.admin import CategoryAdmin, EquipmentAdmin, MaintenanceRecordAdmin, SearchLogAdmin
+from inventory.models import Category, Equipment, MaintenanceRecord, EquipmentAttachment, SearchLog, UploadSession
+from inventory.admin import CategoryAdmin, EquipmentAdmin, MaintenanceRecordAdmin, SearchLogAdmin, UploadSessionAdmin
 from payments.models import Payment, PayPalTransaction, StripeTransaction, VenmoTransaction
 from payments.admin import PaymentAdmin, PayPalTransactionAdmin, StripeTransactionAdmin, VenmoTransactionAdmin
+from reports.models import ReportWatermark
+from reports.admin import ReportWatermarkAdmin
 
 class ROKNSOUNDAdminSite(AdminSite):
     site_header = "ROKNSOUND Management Portal"
@@ -65,6 +71,95 @@ class ROKNSOUNDAdminSite(AdminSite):
         
         return super().index(request, extra_context)
 
+    def get_urls(self):
+        return [
+            path('performance/', self.admin_view(self.performance_view), name='performance'),
+            path('reports/summary/', self.admin_view(self.summary_view), name='summary_report'),
+            path('reports/utilization/', self.admin_view(self.utilization_view), name='utilization_report'),
+        ] + super().get_urls()
+    
+    def performance_view(self, request):
+        """Per-view timings and the most recent requests recorded by MetricsMiddleware"""
+        from . import metrics
+        
+        if request.method == 'POST' and request.user.is_superuser:
+            metrics.registry.reset()
+            return redirect(f'{self.name}:performance')
+        
+        context = {
+            **self.each_context(request),
+            'title': 'Request Performance',
+            'metrics_enabled': metrics.enabled(),
+            'slow_ms': metrics.slow_request_threshold(),
+            **metrics.registry.snapshot(),
+        }
+        return TemplateResponse(request, 'admin/performance.html', context)
+
+    def summary_view(self, request):
+        """Revenue, rentals by status and outstanding balances, read from the summary tables only"""
+        from reports.models import (CustomerBalanceSummary, DailyRevenueSummary, ReportWatermark,
+                                    RentalStatusSummary)
+
+        try:
+            days = max(1, min(int(request.GET.get('days', 30)), 366))
+        except ValueError:
+            days = 30
+        since = timezone.now().date() - timedelta(days=days - 1)
+        revenue = DailyRevenueSummary.objects.filter(date__gte=since)
+
+        context = {
+            **self.each_context(request),
+            'title': 'Reporting Summary',
+            'days': days,
+            'revenue': revenue,
+            'revenue_totals': revenue.aggregate(collected=Sum('collected'), refunds=Sum('refunds'), net=Sum('net')),
+            'statuses': RentalStatusSummary.objects.all(),
+            'balances': CustomerBalanceSummary.objects.filter(balance__gt=0).select_related('customer')[:50],
+            'outstanding': CustomerBalanceSummary.objects.filter(balance__gt=0).aggregate(total=Sum('balance')),
+            'watermarks': ReportWatermark.objects.order_by('name'),
+        }
+        return TemplateResponse(request, 'admin/reports/summary.html', context)
+
+    def utilization_view(self, request):
+        """Utilization and revenue by equipment or category; ?format=csv|json exports the table"""
+        from reports import utilization
+        from reports.forms import UtilizationReportForm
+        from reports.models import ReportWatermark
+
+        form = UtilizationReportForm(request.GET or None, initial=UtilizationReportForm.default_window())
+        if form.is_bound and form.is_valid():
+            params = form.cleaned_data
+        else:
+            params = {**UtilizationReportForm.default_window(), 'category': None}
+
+        if params['group'] == 'category':
+            rows = utilization.category_report(params['start'], params['end'])
+        else:
+            rows = utilization.equipment_report(params['start'], params['end'], category=params['category'])
+
+        export = request.GET.get('format')
+        filename = f"utilization-{params['group']}-{params['start']}-{params['end']}"
+        if export == 'csv':
+            response = HttpResponse(utilization.to_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+            return response
+        if export == 'json':
+            return HttpResponse(utilization.to_json(rows, start=params['start'], end=params['end'],
+                                                    group=params['group']),
+                                content_type='application/json')
+
+        context = {
+            **self.each_context(request),
+            'title': 'Utilization & Revenue',
+            'form': form,
+            'params': params,
+            'rows': rows,
+            'total_revenue': sum(row['revenue'] for row in rows),
+            'watermark': ReportWatermark.objects.filter(name='equipment_daily_facts').first(),
+            'query': request.GET.urlencode(),
+        }
+        return TemplateResponse(request, 'admin/reports/utilization.html', context)
+
 # Create the admin site instance
 roknsound_admin_site = ROKNSOUNDAdminSite(name='roknsound_admin')
 
@@ -78,9 +173,13 @@ roknsound_admin_site.register(Category, CategoryAdmin)
 roknsound_admin_site.register(Equipment, EquipmentAdmin)
 roknsound_admin_site.register(MaintenanceRecord, MaintenanceRecordAdmin)
 roknsound_admin_site.register(SearchLog, SearchLogAdmin)
+roknsound_admin_site.register(UploadSession, UploadSessionAdmin)
 
 # Register payment models with the custom admin site
 roknsound_admin_site.register(Payment, PaymentAdmin)
 roknsound_admin_site.register(PayPalTransaction, PayPalTransactionAdmin)
 roknsound_admin_site.register(StripeTransaction, StripeTransactionAdmin)
-roknsound_admin_site.register(VenmoTransaction, VenmoTransactionAdmin)
\ No newline at end of file
+roknsound_admin_site.register(VenmoTransaction, VenmoTransactionAdmin)
+
+# Register report models with the custom admin site
+roknsound_admin_site.register(ReportWatermark, ReportWatermarkAdmin)
@@ -0,0 +1,53 @@
+"""
+Minimal background execution for slow, non-critical work.
+
+Work is queued after the surrounding transaction commits and runs on a small
+process-wide thread pool, so requests don't wait on image processing or PDF
+rendering. Set BACKGROUND_TASKS_INLINE to run the work synchronously instead
+(handy for management commands and tests).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BACKGROUND_TASK_WORKERS', 2),
+                    thread_name_prefix='background-task',
+                )
+    return _executor
+
+
+def _run(func, args, kwargs, close_connections):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        # Worker threads get their own DB connections; don't leak them.
+        if close_connections:
+            connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run func(*args, **kwargs) once the current transaction commits."""
+    def submit():
+        if getattr(settings, 'BACKGROUND_TASKS_INLINE', False):
+            _run(func, args, kwargs, close_connections=False)
+        else:
+            _get_executor().submit(_run, func, args, kwargs, True)
+
+    transaction.on_commit(submit)
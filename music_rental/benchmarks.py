@@ -0,0 +1,251 @@
+"""
+Benchmarks for the views and workflows staff use all day.
+
+Each benchmark drives a view through the Django test client against a seeded
+dataset (music_rental/seeding.py) and records wall time and query counts per
+iteration. Results are plain dicts so they can be saved as JSON and compared
+between commits:
+
+    python manage.py run_benchmarks --scale small --output before.json
+    python manage.py run_benchmarks --scale small --compare before.json
+
+The same benchmarks run under pytest from tests/benchmarks/.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .seeding import SCALES, seed_dataset
+
+# A benchmark is slower than its baseline if its median grew by this fraction
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+BENCHMARK_USERNAME = 'benchmark-admin'
+
+
+@dataclass
+class Benchmark:
+    name: str
+    description: str
+    # prepare(client) -> state passed to run() for one iteration (not timed)
+    prepare: callable
+    # run(client, state) -> response
+    run: callable
+
+
+def _get(url_name, *args, query=''):
+    def run(client, state):
+        return client.get(reverse(url_name, args=args) + query)
+    return run
+
+
+def _no_state(client):
+    return None
+
+
+def _fresh_rental(status, with_item):
+    """A new rental (optionally holding one available item) so every iteration does the same work."""
+    from inventory.models import Equipment
+    from rentals.models import Customer, Rental, RentalItem
+
+    today = timezone.now().date()
+    rental = Rental.objects.create(
+        customer=Customer.objects.order_by('?').first(), start_date=today,
+        end_date=today + timezone.timedelta(days=7), status=status,
+        total_price=100, deposit_total=100,
+    )
+    if with_item:
+        equipment = Equipment.objects.filter(status='available').order_by('?').first()
+        RentalItem.objects.create(rental=rental, equipment=equipment, quantity=1, price=25)
+    return rental
+
+
+def _prepare_add_rental_item(client):
+    from inventory.models import Equipment
+
+    rental = _fresh_rental('pending', with_item=False)
+    equipment = Equipment.objects.filter(status='available').order_by('?').first()
+    return {'rental': rental.pk, 'equipment': equipment.pk}
+
+
+def _add_rental_item(client, state):
+    return client.post(reverse('rentals:add_rental_item', args=[state['rental']]), {
+        'equipment': state['equipment'], 'quantity': 1, 'price': '25.00',
+    })
+
+
+def _prepare_rental_return(client):
+    return _fresh_rental('active', with_item=True).pk
+
+
+def _rental_return(client, rental_pk):
+    return client.post(reverse('rentals:rental_return', args=[rental_pk]))
+
+
+def _prepare_remove_rental_item(client):
+    from rentals.models import RentalItem
+
+    rental = _fresh_rental('pending', with_item=True)
+    return {'rental': rental.pk, 'item': RentalItem.objects.filter(rental=rental).values_list('pk', flat=True).first()}
+
+
+def _remove_rental_item(client, state):
+    return client.post(reverse('rentals:remove_rental_item', args=[state['rental'], state['item']]))
+
+
+def _prepare_rental_cancel(client):
+    return _fresh_rental('pending', with_item=False).pk
+
+
+def _rental_cancel(client, rental_pk):
+    return client.post(reverse('rentals:rental_cancel', args=[rental_pk]))
+
+
+BENCHMARKS = [
+    Benchmark('equipment_list_search', 'Catalog search for a common brand',
+              _no_state, _get('inventory:equipment_list', query='?search=Fender')),
+    Benchmark('equipment_list', 'First page of the catalog', _no_state, _get('inventory:equipment_list')),
+    Benchmark('rental_list', 'First page of rentals', _no_state, _get('rentals:rental_list')),
+    Benchmark('payment_list', 'First page of payments with totals', _no_state, _get('payments:list')),
+    Benchmark('payment_list_filtered', 'Completed card payments',
+              _no_state, _get('payments:list', query='?status=completed&method=stripe')),
+    Benchmark('add_rental_item', 'Add one item to a pending rental', _prepare_add_rental_item, _add_rental_item),
+    Benchmark('rental_return', 'Return an active rental with one item', _prepare_rental_return, _rental_return),
+    Benchmark('remove_rental_item', 'Remove the only item from a pending rental',
+              _prepare_remove_rental_item, _remove_rental_item),
+    Benchmark('rental_cancel', 'Cancel a pending rental', _prepare_rental_cancel, _rental_cancel),
+    Benchmark('admin_equipment_changelist', 'Admin equipment change list',
+              _no_state, _get('admin:inventory_equipment_changelist')),
+    Benchmark('admin_rental_changelist', 'Admin rental change list',
+              _no_state, _get('admin:rentals_rental_changelist')),
+    Benchmark('admin_customer_changelist', 'Admin customer change list',
+              _no_state, _get('admin:rentals_customer_changelist')),
+    Benchmark('admin_payment_changelist', 'Admin payment change list',
+              _no_state, _get('admin:payments_payment_changelist')),
+    Benchmark('admin_dashboard', 'Admin index dashboard', _no_state, _get('admin:index')),
+    Benchmark('staff_dashboard', 'Staff dashboard', _no_state, _get('users:staff_dashboard')),
+]
+
+
+def get_benchmarks(names=None):
+    if not names:
+        return list(BENCHMARKS)
+    by_name = {benchmark.name: benchmark for benchmark in BENCHMARKS}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown benchmark(s): {', '.join(unknown)}")
+    return [by_name[name] for name in names]
+
+
+def seed(scale='small', seed=0, stdout=None):
+    return seed_dataset(seed=seed, stdout=stdout, **SCALES[scale])
+
+
+def benchmark_client():
+    """A test client logged in as a superuser with a staff profile."""
+    User = get_user_model()
+    user = User.objects.filter(username=BENCHMARK_USERNAME).first()
+    if user is None:
+        user = User.objects.create_superuser(BENCHMARK_USERNAME, 'benchmark@example.com', 'benchmark')
+        user.profile.user_type = 'admin'
+        user.profile.save()
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+def run_benchmark(benchmark, client, iterations=5, warmup=1):
+    timings = []
+    queries = []
+    status = None
+    for i in range(warmup + iterations):
+        state = benchmark.prepare(client)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = benchmark.run(client, state)
+            elapsed = time.perf_counter() - start
+        status = response.status_code
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured.captured_queries))
+
+    ordered = sorted(timings)
+    return {
+        'name': benchmark.name,
+        'description': benchmark.description,
+        'iterations': iterations,
+        'status': status,
+        'min_ms': round(ordered[0], 2),
+        'median_ms': round(statistics.median(ordered), 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'queries': int(statistics.median(queries)),
+    }
+
+
+def run_benchmarks(names=None, iterations=5, warmup=1, stdout=None):
+    client = benchmark_client()
+    results = []
+    for benchmark in get_benchmarks(names):
+        result = run_benchmark(benchmark, client, iterations=iterations, warmup=warmup)
+        results.append(result)
+        if stdout is not None:
+            stdout.write(f"{result['name']:<30} median {result['median_ms']:>9.2f}ms  "
+                         f"p95 {result['p95_ms']:>9.2f}ms  {result['queries']:>5} queries")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def build_report(results, scale, counts=None):
+    return {
+        'created_at': timezone.now().isoformat(),
+        'commit': _git_commit(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'scale': scale,
+        'rows': counts or {},
+        'results': results,
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2)
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Benchmarks in current whose median or query count grew past baseline."""
+    previous = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in current['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        slower = before['median_ms'] and result['median_ms'] > before['median_ms'] * (1 + threshold)
+        more_queries = result['queries'] > before['queries']
+        if slower or more_queries:
+            regressions.append({
+                'name': result['name'],
+                'median_ms': (before['median_ms'], result['median_ms']),
+                'queries': (before['queries'], result['queries']),
+            })
+    return regressions
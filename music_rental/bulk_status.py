@@ -0,0 +1,45 @@
+"""
+Bulk status changes for models tracked by simple_history.
+
+Calling .save() on every row of a mass return or maintenance sweep runs the
+model's save() logic and writes one history row per save, one query at a
+time. Instead we move the rows with a single QuerySet.update() per batch and
+write the matching historical rows with bulk_history_create(), so the audit
+trail looks exactly as if each object had been saved.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def bulk_set_status(queryset, status, allowed_from=None, user=None, reason='',
+                    batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Move every object in queryset to status and record history for each.
+
+    Rows already in status are left alone, as are rows whose current status is
+    not in allowed_from (when given). Returns the primary keys that changed.
+    """
+    model = queryset.model
+    now = now or timezone.now()
+
+    candidates = queryset.exclude(status=status)
+    if allowed_from is not None:
+        candidates = candidates.filter(status__in=list(allowed_from))
+
+    changed = []
+    with transaction.atomic():
+        pks = list(candidates.select_for_update().order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            model.objects.filter(pk__in=batch).update(status=status, updated_at=now)
+            model.history.bulk_history_create(
+                model.objects.filter(pk__in=batch),
+                update=True,
+                default_user=user,
+                default_change_reason=reason,
+                default_date=now,
+            )
+            changed.extend(batch)
+    return changed
@@ -0,0 +1,155 @@
+"""
+Retention for simple_history tables.
+
+Every save of an Equipment, Rental, Customer or Payment adds a historical row
+and nothing ever removes them, so the history tables (and the admin history
+pages that read them) only grow. Retention runs in two stages, configured per
+model by settings.HISTORY_RETENTION (models with no policy are left alone):
+
+* compaction: once rows are older than compact_after_days, only the first and
+  last version of each object per day are kept (plus creations/deletions);
+* archival: once rows are older than archive_after_days they are removed,
+  keeping only each object's latest version as a baseline.
+
+Rental and Payment history is the audit trail for money and contracts, so a
+'default' policy never applies to them; they are only pruned when
+HISTORY_RETENTION names them.
+
+Rows are always written to a gzipped JSONL file in the default storage before
+they are deleted, and deletes happen in batches to keep transactions short.
+"""
+import gzip
+import json
+import logging
+import tempfile
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ROOT = 'history_archive'
+DEFAULT_BATCH_SIZE = 1000
+# Models whose history is kept unless HISTORY_RETENTION has an entry for them
+NAMED_ONLY = {'payments.Payment', 'rentals.Rental'}
+
+
+@dataclass
+class RetentionResult:
+    model: str
+    compacted: int = 0
+    archived: int = 0
+    archive_name: str = ''
+
+
+def tracked_models():
+    """Every installed model with a simple_history manager."""
+    return [model for model in apps.get_models()
+            if getattr(model._meta, 'simple_history_manager_attribute', None)]
+
+
+def history_model_for(model):
+    return getattr(model, model._meta.simple_history_manager_attribute).model
+
+
+def retention_policy(model):
+    """The retention settings for model, or None if its history is kept forever."""
+    config = getattr(settings, 'HISTORY_RETENTION', {})
+    label = model._meta.label
+    if label in config:
+        return config[label]
+    if label in NAMED_ONLY:
+        return None
+    return config.get('default')
+
+
+def _compaction_candidates(history, cutoff):
+    """Ids of rows older than cutoff that aren't the first/last of their object's day."""
+    old = history.objects.filter(history_date__lt=cutoff)
+    keep = set()
+    boundaries = (old.annotate(day=TruncDate('history_date'))
+                  .values('id', 'day')
+                  .annotate(first=Min('history_id'), last=Max('history_id'))
+                  .values_list('first', 'last'))
+    for first, last in boundaries.iterator():
+        keep.add(first)
+        keep.add(last)
+    candidates = old.exclude(history_type__in=['+', '-']).values_list('history_id', flat=True)
+    return [pk for pk in candidates.iterator() if pk not in keep]
+
+
+def _archive_candidates(history, cutoff):
+    """Ids of rows older than cutoff, except each object's latest version."""
+    old = history.objects.filter(history_date__lt=cutoff)
+    latest = set(old.values('id').annotate(last=Max('history_id')).values_list('last', flat=True))
+    return [pk for pk in old.values_list('history_id', flat=True).iterator() if pk not in latest]
+
+
+def _serialize(history, pks, batch_size):
+    fields = [field.attname for field in history._meta.concrete_fields]
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        for row in history.objects.filter(history_id__in=batch).order_by('history_id').values(*fields):
+            yield json.dumps(row, cls=DjangoJSONEncoder)
+
+
+def export_rows(model, pks, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Write the historical rows to a gzipped JSONL file in storage; returns its name."""
+    history = history_model_for(model)
+    now = now or timezone.now()
+    name = f"{ARCHIVE_ROOT}/{model._meta.label_lower.replace('.', '_')}/{now:%Y%m%dT%H%M%S}.jsonl.gz"
+    with tempfile.TemporaryFile() as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as archive:
+            for line in _serialize(history, pks, batch_size):
+                archive.write(line.encode('utf-8') + b'\n')
+        buffer.seek(0)
+        return default_storage.save(name, File(buffer, name=name))
+
+
+def delete_rows(model, pks, batch_size=DEFAULT_BATCH_SIZE):
+    history = history_model_for(model)
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic():
+            history.objects.filter(history_id__in=pks[start:start + batch_size]).delete()
+
+
+def apply_retention(model, dry_run=False, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """Compact and archive model's history according to its policy."""
+    result = RetentionResult(model=model._meta.label)
+    policy = retention_policy(model)
+    if not policy:
+        return result
+
+    history = history_model_for(model)
+    now = now or timezone.now()
+
+    archive_pks = []
+    if policy.get('archive_after_days') is not None:
+        archive_pks = _archive_candidates(history, now - timedelta(days=policy['archive_after_days']))
+    compact_pks = []
+    if policy.get('compact_after_days') is not None:
+        already = set(archive_pks)
+        compact_pks = [pk for pk in _compaction_candidates(history, now - timedelta(days=policy['compact_after_days']))
+                       if pk not in already]
+
+    result.archived = len(archive_pks)
+    result.compacted = len(compact_pks)
+    pks = archive_pks + compact_pks
+    if dry_run or not pks:
+        return result
+
+    pks.sort()
+    result.archive_name = export_rows(model, pks, batch_size=batch_size, now=now)
+    delete_rows(model, pks, batch_size=batch_size)
+    logger.info("Retention for %s: compacted %d, archived %d rows to %s",
+                result.model, result.compacted, result.archived, result.archive_name)
+    return result
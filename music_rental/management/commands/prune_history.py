@@ -0,0 +1,36 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from music_rental.history_retention import DEFAULT_BATCH_SIZE, apply_retention, tracked_models
+
+class Command(BaseCommand):
+    help = 'Compact and archive old simple_history rows according to HISTORY_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models', metavar='APP_LABEL.MODEL',
+                            help='Only process this model (may be repeated)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be removed without changing anything')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows exported/deleted per batch')
+
+    def handle(self, *args, **options):
+        models = tracked_models()
+        if options['models']:
+            try:
+                selected = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            untracked = [model._meta.label for model in selected if model not in models]
+            if untracked:
+                raise CommandError(f"No history tracked for: {', '.join(untracked)}")
+            models = selected
+
+        total = 0
+        for model in models:
+            result = apply_retention(model, dry_run=options['dry_run'], batch_size=options['batch_size'])
+            total += result.compacted + result.archived
+            line = f"{result.model}: {result.compacted} compacted, {result.archived} archived"
+            if result.archive_name:
+                line += f" -> {result.archive_name}"
+            self.stdout.write(line)
+
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} historical rows"))
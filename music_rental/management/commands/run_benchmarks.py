@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from music_rental import benchmarks
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway test database and benchmark core views, saving the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(benchmarks.SCALES), default='small', help='Size of the seeded dataset')
+        parser.add_argument('--only', action='append', dest='names', metavar='NAME', help='Run only this benchmark (may be repeated)')
+        parser.add_argument('--iterations', type=int, default=5, help='Timed iterations per benchmark')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed iterations per benchmark')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset')
+        parser.add_argument('--output', help='Write results to this JSON file (default benchmarks/<commit>-<scale>.json)')
+        parser.add_argument('--compare', help='Report regressions against an earlier results file')
+        parser.add_argument('--threshold', type=float, default=benchmarks.DEFAULT_REGRESSION_THRESHOLD,
+                            help='Fractional slowdown of the median that counts as a regression')
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the seeded test database between runs')
+        parser.add_argument('--list', action='store_true', help='List available benchmarks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for benchmark in benchmarks.BENCHMARKS:
+                self.stdout.write(f'{benchmark.name:<30} {benchmark.description}')
+            return
+        try:
+            selected = benchmarks.get_benchmarks(options['names'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Never benchmark against the real database or media storage
+        setup_test_environment()
+        media_root = tempfile.TemporaryDirectory(prefix='benchmark-media-')
+        isolated = override_settings(
+            DEFAULT_FILE_STORAGE='music_rental.storage_backends.CachedFileSystemStorage',
+            MEDIA_ROOT=media_root.name,
+            BACKGROUND_TASKS_INLINE=True,
+        )
+        isolated.enable()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            from inventory.models import Equipment
+            counts = None
+            if not Equipment.objects.exists():
+                self.stdout.write(f"Seeding '{options['scale']}' dataset...")
+                counts = benchmarks.seed(options['scale'], seed=options['seed'], stdout=self.stdout)
+            results = benchmarks.run_benchmarks([b.name for b in selected], iterations=options['iterations'],
+                                                warmup=options['warmup'], stdout=self.stdout)
+            report = benchmarks.build_report(results, options['scale'], counts)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            isolated.disable()
+            media_root.cleanup()
+            teardown_test_environment()
+
+        output = options['output'] or os.path.join('benchmarks', f"{report['commit'] or 'results'}-{options['scale']}.json")
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        benchmarks.write_report(report, output)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} results to {output}'))
+
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)
+            regressions = benchmarks.compare_reports(baseline, report, options['threshold'])
+            for regression in regressions:
+                before, after = regression['median_ms']
+                q_before, q_after = regression['queries']
+                self.stdout.write(self.style.WARNING(
+                    f"{regression['name']}: median {before}ms -> {after}ms, queries {q_before} -> {q_after}"))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
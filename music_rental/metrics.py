@@ -0,0 +1,222 @@
+"""
+In-process request metrics.
+
+MetricsMiddleware (music_rental/middleware.py) wraps every request, counting
+queries and DB time through connection.execute_wrapper() and timing the view.
+Totals are aggregated per view name and the most recent requests are kept in a
+ring buffer for the admin performance page. Everything lives in memory in the
+current process, so each worker exposes its own numbers on the metrics
+endpoint and Prometheus sums them.
+
+Other code can report cache lookups for the current request with
+record_cache_lookup().
+"""
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+_lock = threading.Lock()
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def slow_request_threshold():
+    return getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500)
+
+
+class RequestMetrics:
+    """Counters for the request being handled on this thread/task."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.cache_hits = Counter()
+        self.cache_misses = Counter()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            # Same SQL with different params is the classic N+1 pattern
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def most_duplicated(self):
+        if not self.statements:
+            return '', 0
+        sql, count = self.statements.most_common(1)[0]
+        return (sql, count) if count > 1 else ('', 0)
+
+
+class ViewStats:
+    __slots__ = ('requests', 'errors', 'wall_time', 'db_time', 'queries', 'duplicates',
+                 'max_wall_time', 'buckets')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.wall_time = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.duplicates = 0
+        self.max_wall_time = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def add(self, wall_time, current, status):
+        self.requests += 1
+        if status >= 500:
+            self.errors += 1
+        self.wall_time += wall_time
+        self.max_wall_time = max(self.max_wall_time, wall_time)
+        self.db_time += current.db_time
+        self.queries += current.queries
+        self.duplicates += current.duplicates
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if wall_time <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Registry:
+    def __init__(self, ring_size=None):
+        self.views = {}
+        self.cache = Counter()
+        self.recent = deque(maxlen=ring_size or getattr(settings, 'METRICS_RING_SIZE', 200))
+
+    def record_request(self, view, method, path, status, wall_time, current):
+        sql, repeats = current.most_duplicated()
+        entry = {
+            'time': time.time(),
+            'method': method,
+            'path': path,
+            'view': view,
+            'status': status,
+            'wall_ms': round(wall_time * 1000, 1),
+            'db_ms': round(current.db_time * 1000, 1),
+            'queries': current.queries,
+            'duplicates': current.duplicates,
+            'top_duplicate': sql[:300],
+            'top_duplicate_count': repeats,
+            'cache_hits': sum(current.cache_hits.values()),
+            'cache_misses': sum(current.cache_misses.values()),
+        }
+        with _lock:
+            self.views.setdefault(view, ViewStats()).add(wall_time, current, status)
+            self.recent.append(entry)
+
+    def record_cache(self, kind, hit):
+        with _lock:
+            self.cache[(kind, 'hit' if hit else 'miss')] += 1
+
+    def snapshot(self):
+        """Per-view summaries (slowest average first) and recent requests (newest first)."""
+        with _lock:
+            views = [
+                {
+                    'view': view,
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                    'avg_ms': round(stats.wall_time / stats.requests * 1000, 1),
+                    'max_ms': round(stats.max_wall_time * 1000, 1),
+                    'avg_db_ms': round(stats.db_time / stats.requests * 1000, 1),
+                    'avg_queries': round(stats.queries / stats.requests, 1),
+                    'duplicates': stats.duplicates,
+                }
+                for view, stats in self.views.items()
+            ]
+            recent = list(reversed(self.recent))
+            cache = dict(self.cache)
+        views.sort(key=lambda row: row['avg_ms'], reverse=True)
+        return {'views': views, 'recent': recent, 'cache': cache}
+
+    def reset(self):
+        with _lock:
+            self.views.clear()
+            self.cache.clear()
+            self.recent.clear()
+
+
+registry = Registry()
+
+
+def start_request():
+    current = RequestMetrics()
+    return current, _current.set(current)
+
+
+def finish_request(current, token, view, method, path, status, wall_time):
+    _current.reset(token)
+    registry.record_request(view, method, path, status, wall_time, current)
+
+
+def record_cache_lookup(kind, hit):
+    """Count a cache hit or miss against the current request and the process totals."""
+    current = _current.get()
+    if current is not None:
+        (current.cache_hits if hit else current.cache_misses)[kind] += 1
+    registry.record_cache(kind, hit)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        views = {view: (stats.requests, stats.errors, stats.wall_time, stats.db_time,
+                        stats.queries, stats.duplicates, list(stats.buckets))
+                 for view, stats in registry.views.items()}
+        cache = dict(registry.cache)
+
+    lines = []
+
+    def metric(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    metric('django_view_requests_total', 'counter', 'Requests handled, by view.')
+    for view, values in views.items():
+        lines.append(f'django_view_requests_total{{view="{_escape(view)}"}} {values[0]}')
+    metric('django_view_errors_total', 'counter', 'Requests that returned a 5xx status, by view.')
+    for view, values in views.items():
+        lines.append(f'django_view_errors_total{{view="{_escape(view)}"}} {values[1]}')
+    metric('django_view_duration_seconds', 'histogram', 'Wall time spent handling requests, by view.')
+    for view, (requests, _, wall_time, _, _, _, buckets) in views.items():
+        label = _escape(view)
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'django_view_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'django_view_duration_seconds_bucket{{view="{label}",le="+Inf"}} {requests}')
+        lines.append(f'django_view_duration_seconds_sum{{view="{label}"}} {wall_time:.6f}')
+        lines.append(f'django_view_duration_seconds_count{{view="{label}"}} {requests}')
+    metric('django_view_db_seconds_total', 'counter', 'Time spent in database queries, by view.')
+    for view, values in views.items():
+        lines.append(f'django_view_db_seconds_total{{view="{_escape(view)}"}} {values[3]:.6f}')
+    metric('django_view_queries_total', 'counter', 'Database queries executed, by view.')
+    for view, values in views.items():
+        lines.append(f'django_view_queries_total{{view="{_escape(view)}"}} {values[4]}')
+    metric('django_view_duplicate_queries_total', 'counter', 'Queries repeating SQL already run in the same request, by view.')
+    for view, values in views.items():
+        lines.append(f'django_view_duplicate_queries_total{{view="{_escape(view)}"}} {values[5]}')
+    metric('app_cache_lookups_total', 'counter', 'Application cache lookups, by cache and result.')
+    for (kind, result), count in sorted(cache.items()):
+        lines.append(f'app_cache_lookups_total{{cache="{_escape(kind)}",result="{result}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,53 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics, user_context
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, DB time, query count, duplicate queries and cache hits
+    for every request, see music_rental/metrics.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.enabled():
+            return self.get_response(request)
+
+        current, token = metrics.start_request()
+        status = 500
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(current.execute_wrapper))
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            match = getattr(request, 'resolver_match', None)
+            view = (match.view_name or match._func_path) if match else '<unresolved>'
+            metrics.finish_request(current, token, view, request.method, request.path, status,
+                                   time.perf_counter() - start)
+
+
+class UserContextMiddleware:
+    """
+    Load request.user with its profile and customer in one query and expose
+    request.user_context, see music_rental/user_context.py. Goes right after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user = SimpleLazyObject(lambda: user_context.get_user(request))
+        request.user_context = SimpleLazyObject(lambda: user_context.get_user_context(request))
+        return self.get_response(request)
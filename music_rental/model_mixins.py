@@ -0,0 +1,64 @@
+"""
+Shared model behaviour.
+
+DirtyFieldsMixin remembers the value of every concrete field as loaded from
+(or last saved to) the database, so save() can tell what actually changed
+and take a cheaper path, e.g. Equipment.save() writing only status with
+update_fields and skipping its QR code and manual hooks.
+"""
+import copy
+
+from django.db.models.fields.files import FieldFile
+
+
+def _snapshot_value(value):
+    if isinstance(value, FieldFile):
+        return value.name
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+class DirtyFieldsMixin:
+    """Track which concrete fields differ from the database since load or the last save."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_state = {}
+        self._mark_clean()
+
+    def _mark_clean(self, fields=None):
+        """Record the current values of fields (attnames; default: every loaded field) as saved."""
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__ or (fields is not None and field.attname not in fields):
+                continue
+            self._saved_state[field.attname] = _snapshot_value(self.__dict__[field.attname])
+
+    def get_dirty_fields(self):
+        """Field name -> saved value for every loaded field changed since load or the last save."""
+        if self._state.adding:
+            return {}
+        dirty = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__ or field.attname not in self._saved_state:
+                continue
+            saved = self._saved_state[field.attname]
+            if _snapshot_value(self.__dict__[field.attname]) != saved:
+                dirty[field.name] = saved
+        return dirty
+
+    def is_dirty(self):
+        return bool(self.get_dirty_fields())
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._mark_clean()
+        else:
+            self._mark_clean({self._meta.get_field(name).attname for name in update_fields})
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Also covers deferred fields, which Django loads through refresh_from_db()
+        self._mark_clean(None if fields is None else {self._meta.get_field(name).attname for name in fields})
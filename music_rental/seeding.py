@@ -0,0 +1,306 @@
+"""
+Synthetic data for benchmarks and load testing.
+
+Rows are built in memory and inserted with bulk_create() in chunks, which
+skips Equipment.save() (QR codes, manual lookups), the User/Profile/Customer
+signals and simple_history, so a million rows load in minutes rather than
+hours. The same seed always produces the same data. Never point this at a
+database holding real data.
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import Category, Equipment, MaintenanceRecord
+from payments.models import Payment
+from rentals.models import Customer, Rental, RentalItem
+from users.models import CustomerProfile, UserProfile
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Dataset sizes used by `seed_scale --scale` and the benchmarks
+SCALES = {
+    'tiny': {'equipment': 50, 'customers': 20, 'rentals': 100, 'payments': 200},
+    'small': {'equipment': 1000, 'customers': 500, 'rentals': 5000, 'payments': 20000},
+    'full': {'equipment': 10000, 'customers': 5000, 'rentals': 100000, 'payments': 500000},
+    # Roughly a million rows once rental items and profiles are counted
+    'xl': {'equipment': 20000, 'customers': 20000, 'rentals': 250000, 'payments': 300000},
+}
+
+CATEGORY_NAMES = [
+    'Guitars', 'Bass Guitars', 'Amplifiers', 'Drums', 'Keyboards', 'Microphones',
+    'Mixers', 'PA Speakers', 'Stands', 'Cables', 'Effects Pedals', 'Lighting',
+]
+BRANDS = ['Fender', 'Gibson', 'Yamaha', 'Roland', 'Shure', 'Marshall', 'Pearl', 'Korg', 'Ibanez', 'Mackie']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Casey', 'Riley', 'Morgan', 'Jamie', 'Avery', 'Quinn',
+               'Drew', 'Parker', 'Reese', 'Rowan', 'Skyler', 'Emerson']
+LAST_NAMES = ['Smith', 'Garcia', 'Nguyen', 'Patel', 'Johnson', 'Brown', 'Lee', 'Martin', 'Clark', 'Lopez',
+              'Walker', 'Young', 'King', 'Wright', 'Hill', 'Scott']
+CITIES = [('Springfield', 'IL', '62701'), ('Austin', 'TX', '78701'), ('Portland', 'OR', '97201'),
+          ('Nashville', 'TN', '37201'), ('Denver', 'CO', '80202'), ('Seattle', 'WA', '98101')]
+CONDITIONS = ['Excellent', 'Good', 'Fair', 'Minor cosmetic wear']
+
+# (weight, daily price choices, replacement value range) from cables to PA systems
+PRICE_TIERS = [
+    (50, [5, 8, 10, 12], (20, 150)),
+    (30, [15, 20, 25, 30], (200, 900)),
+    (15, [40, 50, 60, 75], (1000, 3000)),
+    (5, [90, 120, 150, 200], (3000, 12000)),
+]
+DURATIONS = [('daily', 1, 'rental_price_daily'), ('daily', 3, 'rental_price_daily'),
+             ('weekly', 7, 'rental_price_weekly'), ('weekly', 14, 'rental_price_weekly'),
+             ('monthly', 30, 'rental_price_monthly')]
+
+
+def chunked_create(model, objs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """bulk_create an iterable of unsaved objects chunk by chunk; returns the saved objects."""
+    created = []
+    for batch in chunked(objs, chunk_size):
+        created.extend(model.objects.bulk_create(batch))
+    return created
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """Let bulk_create keep the dates we set on auto_now/auto_now_add fields."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    def __init__(self, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, years=3, stdout=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.years = years
+        self.stdout = stdout
+        self.now = timezone.now()
+        self.today = self.now.date()
+        self.counts = {}
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def _count(self, key, number):
+        self.counts[key] = self.counts.get(key, 0) + number
+        self.log(f'Created {number} {key.replace("_", " ")}')
+
+    def _past_date(self):
+        return self.today - timedelta(days=self.rng.randint(0, self.years * 365))
+
+    def _aware(self, day):
+        return timezone.make_aware(datetime(day.year, day.month, day.day, self.rng.randint(9, 18)))
+
+    def categories(self):
+        self.category_objs = chunked_create(Category, (
+            Category(name=name, description=f'{name} for rent') for name in CATEGORY_NAMES))
+        self._count('categories', len(self.category_objs))
+
+    def equipment(self, count):
+        rng = self.rng
+        weights = [tier[0] for tier in PRICE_TIERS]
+
+        def make(i):
+            _, prices, (low, high) = rng.choices(PRICE_TIERS, weights)[0]
+            daily = Decimal(rng.choice(prices))
+            category = rng.choice(self.category_objs)
+            brand = rng.choice(BRANDS)
+            purchase_price = Decimal(rng.randint(low, high))
+            return Equipment(
+                name=f'{brand} {category.name.rstrip("s")} {i}',
+                description=f'{brand} {category.name.lower()} in rental stock',
+                category=category,
+                brand=brand,
+                model_number=f'{brand[:3].upper()}-{i:06d}',
+                serial_number=f'SEED-{self.seed}-{i:07d}',
+                purchase_date=self._past_date() - timedelta(days=365),
+                purchase_price=purchase_price,
+                replacement_value=purchase_price * Decimal('1.2'),
+                rental_price_daily=daily,
+                rental_price_weekly=daily * 5,
+                rental_price_monthly=daily * 15,
+                deposit_amount=(purchase_price / 4).quantize(Decimal('1')),
+                condition=rng.choice(CONDITIONS),
+                status=rng.choices(['available', 'maintenance', 'damaged', 'retired'], [94, 3, 2, 1])[0],
+            )
+        objs = chunked_create(Equipment, (make(i) for i in range(count)), self.chunk_size)
+        self.equipment_prices = [(e.pk, e.status, {key: getattr(e, key) for _, _, key in DURATIONS})
+                                 for e in objs]
+        self._count('equipment', len(objs))
+
+    def customers(self, count, with_users=True):
+        rng = self.rng
+        password = make_password('seeded-password')
+        self.customer_ids = []
+        for start in range(0, count, self.chunk_size):
+            people = []
+            for i in range(start, min(count, start + self.chunk_size)):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                city, state, zip_code = rng.choice(CITIES)
+                people.append((i, first, last, city, state, zip_code, f'+1555{rng.randint(1000000, 9999999)}'))
+
+            users = [None] * len(people)
+            if with_users:
+                users = User.objects.bulk_create([
+                    User(username=f'seed{self.seed}-{i}', first_name=first, last_name=last,
+                         email=f'{first.lower()}.{last.lower()}.{i}@example.com', password=password,
+                         date_joined=self._aware(self._past_date()))
+                    for i, first, last, *_ in people
+                ])
+                profiles = UserProfile.objects.bulk_create([
+                    UserProfile(user=user, phone_number=phone, address=f'{i} Main St', city=city,
+                                state=state, zip_code=zip_code, user_type='customer')
+                    for user, (i, _, _, city, state, zip_code, phone) in zip(users, people)
+                ])
+                CustomerProfile.objects.bulk_create([
+                    CustomerProfile(user_profile=profile, preferred_payment_method=rng.choice(['stripe', 'paypal', 'cash']))
+                    for profile in profiles
+                ])
+
+            customers = [
+                Customer(user=user, first_name=first, last_name=last,
+                         email=f'{first.lower()}.{last.lower()}.{i}@example.com', phone=phone,
+                         address=f'{i} Main St', city=city, state=state, zip_code=zip_code,
+                         id_type='drivers_license', id_number=f'SEED{self.seed}-{i:07d}')
+                for user, (i, first, last, city, state, zip_code, phone) in zip(users, people)
+            ]
+            for customer in customers:
+                customer.update_search_fields()
+            customers = Customer.objects.bulk_create(customers)
+            self.customer_ids.extend(c.pk for c in customers)
+        if with_users:
+            self._count('users', len(self.customer_ids))
+        self._count('customers', len(self.customer_ids))
+
+    def rentals(self, count):
+        rng = self.rng
+        rentable = [entry for entry in self.equipment_prices if entry[1] == 'available'] or self.equipment_prices
+        self.rental_totals = []
+        items_created = 0
+
+        def plan(_):
+            start = self._past_date()
+            duration_type, days, price_key = rng.choice(DURATIONS)
+            end = start + timedelta(days=days)
+            if end < self.today:
+                status = rng.choices(['completed', 'cancelled', 'overdue'], [90, 7, 3])[0]
+            elif start > self.today - timedelta(days=2):
+                status = rng.choice(['pending', 'active'])
+            else:
+                status = 'active'
+            chosen = rng.sample(rentable, min(len(rentable), rng.choice([1, 1, 1, 2, 2, 3, 4])))
+            items = [(equipment_id, prices[price_key]) for equipment_id, _, prices in chosen]
+            total = sum(price for _, price in items)
+            rental = Rental(
+                customer_id=rng.choice(self.customer_ids), start_date=start, end_date=end,
+                duration_type=duration_type, status=status, total_price=total,
+                deposit_total=total * 2, deposit_paid=status != 'pending',
+                contract_signed=status != 'pending',
+                created_at=self._aware(start - timedelta(days=rng.randint(0, 14))),
+                updated_at=self._aware(min(end, self.today)),
+            )
+            return rental, items
+
+        with explicit_timestamps(Rental, 'created_at', 'updated_at'):
+            for batch in chunked((plan(i) for i in range(count)), self.chunk_size):
+                rentals = Rental.objects.bulk_create([rental for rental, _ in batch])
+                returned = []
+                for rental, (_, items) in zip(rentals, batch):
+                    is_returned = rental.status == 'completed'
+                    for equipment_id, price in items:
+                        returned.append(RentalItem(
+                            rental_id=rental.pk, equipment_id=equipment_id, quantity=1, price=price,
+                            returned=is_returned,
+                            returned_date=self._aware(rental.end_date) if is_returned else None,
+                        ))
+                    self.rental_totals.append((rental.pk, rental.total_price, rental.end_date, rental.status))
+                items_created += len(RentalItem.objects.bulk_create(returned))
+        self._count('rentals', len(self.rental_totals))
+        self._count('rental_items', items_created)
+
+        # Equipment on open rentals is out
+        open_items = RentalItem.objects.filter(rental__status__in=Rental.OPEN_STATUSES, returned=False)
+        Equipment.objects.filter(pk__in=open_items.values('equipment_id')).update(status='rented')
+
+    def payments(self, count):
+        rng = self.rng
+        payable = [r for r in self.rental_totals if r[3] != 'cancelled'] or self.rental_totals
+        if not payable:
+            return
+
+        def make(_):
+            rental_id, total, end_date, status = rng.choice(payable)
+            payment_type = rng.choices(['rental', 'deposit', 'late_fee', 'damage_fee'], [60, 32, 6, 2])[0]
+            amount = total if payment_type == 'rental' else \
+                total * 2 if payment_type == 'deposit' else Decimal(rng.randint(10, 200))
+            paid_on = min(end_date, self.today)
+            state = rng.choices(['completed', 'refunded', 'failed', 'pending'], [90, 4, 4, 2])[0]
+            return Payment(
+                rental_id=rental_id, amount=amount, payment_type=payment_type,
+                payment_method=rng.choices(['stripe', 'paypal', 'venmo', 'cash', 'check'], [50, 20, 10, 15, 5])[0],
+                payment_date=self._aware(paid_on), status=state,
+                transaction_id=f'seed-{self.seed}-{rng.getrandbits(48):012x}',
+                refund_amount=amount if state == 'refunded' else None,
+                refund_date=self._aware(paid_on) if state == 'refunded' else None,
+            )
+
+        with explicit_timestamps(Payment, 'payment_date'):
+            created = len(chunked_create(Payment, (make(i) for i in range(count)), self.chunk_size))
+        self._count('payments', created)
+
+    def maintenance(self, count):
+        rng = self.rng
+        equipment_ids = [entry[0] for entry in self.equipment_prices]
+        if not equipment_ids:
+            return
+
+        def make(_):
+            day = self._past_date() + timedelta(days=rng.randint(0, 60))
+            return MaintenanceRecord(
+                equipment_id=rng.choice(equipment_ids), date=day,
+                description=rng.choice(['Restring and setup', 'Replace tubes', 'Clean pots and jacks',
+                                        'Replace drum heads', 'Firmware update', 'Cable repair']),
+                cost=Decimal(rng.randint(0, 250)), performed_by=rng.choice(['In-house', 'Vendor']),
+                scheduled_date=day, is_completed=day <= self.today,
+            )
+        created = len(chunked_create(MaintenanceRecord, (make(i) for i in range(count)), self.chunk_size))
+        self._count('maintenance_records', created)
+
+
+def seed_dataset(equipment=1000, customers=500, rentals=5000, payments=10000, maintenance=None,
+                 years=3, with_users=True, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, stdout=None):
+    """Insert a synthetic catalog with customers, rental and payment history; returns row counts."""
+    seeder = Seeder(seed=seed, chunk_size=chunk_size, years=years, stdout=stdout)
+    with transaction.atomic():
+        seeder.categories()
+        seeder.equipment(equipment)
+        seeder.customers(customers, with_users=with_users)
+        seeder.rentals(rentals if seeder.customer_ids else 0)
+        seeder.payments(payments)
+        seeder.maintenance(equipment // 2 if maintenance is None else maintenance)
+    return seeder.counts
@@ -74,19 +74,23 @@ INSTALLED_APPS = [
     "storages",
     
     # Local apps
+    "music_rental",
     "inventory.apps.InventoryConfig",
     "rentals.apps.RentalsConfig",
     "payments.apps.PaymentsConfig",
     "users.apps.UsersConfig",
+    "reports.apps.ReportsConfig",
 ]
 
 MIDDLEWARE = [
+    "music_rental.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Add WhiteNoise middleware
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "music_rental.middleware.UserContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "simple_history.middleware.HistoryRequestMiddleware",
@@ -187,8 +191,9 @@ GS_PROJECT_ID = os.environ.get('GS_PROJECT_ID', '')
 STATIC_LOCATION = 'static'
 MEDIA_LOCATION = 'media'
 
-# Configure Google Cloud Storage for media files
-DEFAULT_FILE_STORAGE = 'storages.backends.gcloud.GoogleCloudStorage'
+# Configure Google Cloud Storage for media files. The cached backend keeps
+# signed URLs and object metadata so pages don't hit GCS for every .url call.
+DEFAULT_FILE_STORAGE = 'music_rental.storage_backends.CachedGoogleCloudStorage'
 
 # Update media URL to point to GCS
 MEDIA_URL = f'https://storage.googleapis.com/{GS_BUCKET_NAME}/{MEDIA_LOCATION}/'
@@ -196,10 +201,73 @@ MEDIA_URL = f'https://storage.googleapis.com/{GS_BUCKET_NAME}/{MEDIA_LOCATION}/'
 # Fall back to local storage for development if explicitly set
 USE_LOCAL_STORAGE = os.environ.get('USE_LOCAL_STORAGE', '') == '1'
 if USE_LOCAL_STORAGE:
-    # Use default Django file storage
-    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+    # Use local file storage (with the same URL/metadata caching)
+    DEFAULT_FILE_STORAGE = 'music_rental.storage_backends.CachedFileSystemStorage'
     MEDIA_URL = '/media/'
 
+# Background work (image derivatives etc.) runs on a small thread pool after
+# commit. Set BACKGROUND_TASKS_INLINE=1 to run it synchronously instead.
+BACKGROUND_TASKS_INLINE = os.environ.get('BACKGROUND_TASKS_INLINE', '') == '1'
+BACKGROUND_TASK_WORKERS = int(os.environ.get('BACKGROUND_TASK_WORKERS', '2'))
+
+# Storage URL/metadata cache (music_rental/storage_backends.py)
+STORAGE_CACHE_TIMEOUT = int(os.environ.get('STORAGE_CACHE_TIMEOUT', 3600))
+STORAGE_CACHE_MISSING_TIMEOUT = int(os.environ.get('STORAGE_CACHE_MISSING_TIMEOUT', 60))
+# How long each process trusts its in-memory copy before rechecking the shared cache
+STORAGE_CACHE_LOCAL_TIMEOUT = int(os.environ.get('STORAGE_CACHE_LOCAL_TIMEOUT', 5))
+
+# Chunked attachment uploads (inventory/uploads.py)
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 500 * 1024 * 1024))
+
+# History retention (music_rental/history_retention.py, `manage.py prune_history`).
+# Rows older than compact_after_days keep only the first and last version of
+# each object per day; rows older than archive_after_days are moved to
+# compressed JSONL in storage, keeping each object's latest version. Only the
+# models listed here are pruned. A 'default' entry would cover the rest, except
+# rentals.Rental and payments.Payment, which must be listed by name.
+HISTORY_RETENTION = {
+    'inventory.Equipment': {'compact_after_days': 90, 'archive_after_days': 730},
+    'rentals.Customer': {'compact_after_days': 90, 'archive_after_days': 730},
+}
+
+# Request instrumentation (music_rental/metrics.py). The Prometheus endpoint at
+# /internal/metrics/ answers staff users, METRICS_ALLOWED_IPS and requests
+# carrying "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_RING_SIZE = int(os.environ.get('METRICS_RING_SIZE', 200))
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+# Payment webhooks (payments/webhooks.py): Stripe's endpoint signing secret
+# (PayPal deliveries are verified through its API with
+# PAYMENT_GATEWAYS['paypal']['WEBHOOK_ID']), and how old a delivery may be in seconds
+PAYMENT_WEBHOOK_SECRETS = {
+    'stripe': os.environ.get('STRIPE_WEBHOOK_SECRET', ''),
+}
+PAYMENT_WEBHOOK_TOLERANCE = int(os.environ.get('PAYMENT_WEBHOOK_TOLERANCE', 300))
+
+# Payment provider clients (payments/gateways.py). PAYMENT_GATEWAY_FAKE=1 swaps
+# the provider APIs for in-process fakes (payments/fake_gateways.py).
+PAYMENT_GATEWAYS = {
+    'stripe': {
+        'SECRET_KEY': os.environ.get('STRIPE_SECRET_KEY', ''),
+        'PUBLISHABLE_KEY': os.environ.get('STRIPE_PUBLISHABLE_KEY', ''),
+    },
+    'paypal': {
+        'CLIENT_ID': os.environ.get('PAYPAL_CLIENT_ID', ''),
+        'CLIENT_SECRET': os.environ.get('PAYPAL_CLIENT_SECRET', ''),
+        'API_BASE': os.environ.get('PAYPAL_API_BASE', 'https://api-m.sandbox.paypal.com'),
+        # Verifies incoming webhooks (payments/webhooks.py)
+        'WEBHOOK_ID': os.environ.get('PAYPAL_WEBHOOK_ID', ''),
+    },
+}
+PAYMENT_GATEWAY_FAKE = os.environ.get('PAYMENT_GATEWAY_FAKE', '') == '1'
+PAYMENT_GATEWAY_FAKE_LATENCY = float(os.environ.get('PAYMENT_GATEWAY_FAKE_LATENCY', 0))
+PAYMENT_GATEWAY_TIMEOUT = float(os.environ.get('PAYMENT_GATEWAY_TIMEOUT', 10))
+PAYMENT_GATEWAY_MAX_CONNECTIONS = int(os.environ.get('PAYMENT_GATEWAY_MAX_CONNECTIONS', 20))
+
 # Crispy Forms settings
 CRISPY_TEMPLATE_PACK = 'bootstrap5'
 CRISPY_ALLOWED_TEMPLATE_PACKS = 'bootstrap5'
@@ -210,6 +278,12 @@ SITE_ID = 1
 # OpenAI API Key
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# Cached pricing answers for `create_inventory_with_openai --batch` (inventory/enrichment.py)
+OPENAI_PRICING_CACHE_DIR = os.environ.get('OPENAI_PRICING_CACHE_DIR', str(BASE_DIR / '.cache' / 'openai_pricing'))
+
+# Parsed supplier invoices for `manage.py ingest_invoices`, keyed by file hash (inventory/invoices.py)
+INVOICE_PARSE_CACHE_DIR = os.environ.get('INVOICE_PARSE_CACHE_DIR', str(BASE_DIR / '.cache' / 'invoices'))
+
 # Authentication settings
 LOGIN_URL = 'account_login'
 LOGIN_REDIRECT_URL = 'users:dashboard'
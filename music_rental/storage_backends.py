@@ -1,5 +1,18 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
 from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+from storages.backends.gcloud import GoogleCloudStorage
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from . import metrics
 
 class StaticStorage(S3Boto3Storage):
     location = settings.STATIC_LOCATION
@@ -8,4 +21,219 @@ class StaticStorage(S3Boto3Storage):
 class MediaStorage(S3Boto3Storage):
     location = settings.MEDIA_LOCATION
     default_acl = 'public-read'
-    file_overwrite = False
\ No newline at end of file
+    file_overwrite = False
+
+
+class CachedStorageMixin:
+    """
+    Cache generated URLs and object metadata (exists, size, etag).
+
+    Admin change lists and templates call .url on qr_code, main_image,
+    manual_file and attachments several times per row; for GCS each call signs
+    a URL and each exists()/size() is a round trip. Results are kept in the
+    shared Django cache and dropped from it whenever an object is saved or
+    deleted. Each process also keeps a small in-memory copy, but only for
+    STORAGE_CACHE_LOCAL_TIMEOUT seconds, since another process's writes
+    can't reach it; that bounds how long a deleted file can look present here.
+    """
+    # Process-wide so every storage instance shares one in-memory cache
+    _local_cache = TTLCache(maxsize=getattr(settings, 'STORAGE_CACHE_LOCAL_SIZE', 10000),
+                            ttl=getattr(settings, 'STORAGE_CACHE_LOCAL_TIMEOUT', 5))
+    _local_lock = threading.Lock()
+    _bypass = threading.local()
+
+    def cache_timeout(self):
+        return getattr(settings, 'STORAGE_CACHE_TIMEOUT', 3600)
+
+    def missing_cache_timeout(self):
+        # Objects we found missing may be created by another instance at any time
+        return getattr(settings, 'STORAGE_CACHE_MISSING_TIMEOUT', 60)
+
+    def local_cache_timeout(self):
+        return getattr(settings, 'STORAGE_CACHE_LOCAL_TIMEOUT', 5)
+
+    def url_cache_timeout(self):
+        return self.cache_timeout()
+
+    def cache_namespace(self):
+        """Distinguishes storages that would otherwise share object names."""
+        return self.__class__.__name__
+
+    def _cache_key(self, kind, name):
+        digest = hashlib.md5(f"{self.cache_namespace()}:{name}".encode('utf-8')).hexdigest()
+        return f"storage:{kind}:{digest}"
+
+    def _shared_cache(self):
+        return caches[getattr(settings, 'STORAGE_CACHE_ALIAS', 'default')]
+
+    def _cache_get(self, kind, name):
+        key = self._cache_key(kind, name)
+        with self._local_lock:
+            entry = self._local_cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            metrics.record_cache_lookup('storage', True)
+            return entry[1]
+        value = self._shared_cache().get(key)
+        if value is not None:
+            self._local_set(key, value, self.local_cache_timeout())
+        metrics.record_cache_lookup('storage', value is not None)
+        return value
+
+    def _local_set(self, key, value, timeout):
+        timeout = min(timeout, self.local_cache_timeout())
+        with self._local_lock:
+            self._local_cache[key] = (time.monotonic() + timeout, value)
+
+    def _cache_set(self, kind, name, value, timeout):
+        key = self._cache_key(kind, name)
+        self._local_set(key, value, timeout)
+        self._shared_cache().set(key, value, timeout)
+
+    def invalidate(self, name):
+        keys = [self._cache_key(kind, name) for kind in ('url', 'meta')]
+        with self._local_lock:
+            for key in keys:
+                self._local_cache.pop(key, None)
+        self._shared_cache().delete_many(keys)
+
+    # Metadata
+
+    def _fetch_metadata(self, name):
+        """Return {'exists', 'size', 'etag'} for name straight from the backend."""
+        raise NotImplementedError
+
+    def metadata(self, name):
+        if getattr(self._bypass, 'active', False):
+            return self._fetch_metadata(name)
+        meta = self._cache_get('meta', name)
+        if meta is None:
+            meta = self._fetch_metadata(name)
+            self._cache_metadata(name, meta)
+        return meta
+
+    def _cache_metadata(self, name, meta):
+        timeout = self.cache_timeout() if meta['exists'] else self.missing_cache_timeout()
+        self._cache_set('meta', name, meta, timeout)
+
+    def metadata_many(self, names):
+        """Metadata for several names, fetching all cache misses in one concurrent batch."""
+        results = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            meta = self._cache_get('meta', name)
+            if meta is None:
+                missing.append(name)
+            else:
+                results[name] = meta
+        if missing:
+            for name, meta in zip(missing, self._fetch_metadata_batch(missing)):
+                self._cache_metadata(name, meta)
+                results[name] = meta
+        return results
+
+    def _fetch_metadata_batch(self, names):
+        return [self._fetch_metadata(name) for name in names]
+
+    def exists(self, name):
+        return self.metadata(name)['exists']
+
+    def exists_many(self, names):
+        return {name: meta['exists'] for name, meta in self.metadata_many(names).items()}
+
+    def size(self, name):
+        meta = self.metadata(name)
+        if not meta['exists']:
+            return super().size(name)  # Let the backend raise its usual error
+        return meta['size']
+
+    def etag(self, name):
+        return self.metadata(name)['etag']
+
+    # URLs
+
+    def url(self, name, *args, **kwargs):
+        if args or kwargs:
+            return super().url(name, *args, **kwargs)
+        url = self._cache_get('url', name)
+        if url is None:
+            url = super().url(name)
+            self._cache_set('url', name, url, self.url_cache_timeout())
+        return url
+
+    # Writes invalidate what we know about the name
+
+    def get_available_name(self, name, max_length=None):
+        # Never pick a name based on stale existence data
+        self._bypass.active = True
+        try:
+            return super().get_available_name(name, max_length=max_length)
+        finally:
+            self._bypass.active = False
+
+    def save(self, name, content, max_length=None):
+        name = super().save(name, content, max_length=max_length)
+        self.invalidate(name)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.invalidate(name)
+
+
+class CachedGoogleCloudStorage(CachedStorageMixin, GoogleCloudStorage):
+    """Google Cloud Storage with cached signed URLs and blob metadata."""
+    batch_workers = 8
+
+    def cache_namespace(self):
+        return f"gcs:{self.bucket_name}:{self.location}"
+
+    def url_cache_timeout(self):
+        # Signed URLs must be replaced well before they expire
+        expiration = self.expiration.total_seconds() if hasattr(self.expiration, 'total_seconds') else self.expiration
+        return int(min(self.cache_timeout(), expiration / 2))
+
+    def _fetch_metadata(self, name):
+        blob = self.bucket.get_blob(self._normalize_name(clean_name(name)))
+        if blob is None:
+            return {'exists': False, 'size': None, 'etag': None}
+        return {'exists': True, 'size': blob.size, 'etag': blob.etag}
+
+    def _fetch_metadata_batch(self, names):
+        if len(names) == 1:
+            return [self._fetch_metadata(names[0])]
+        with ThreadPoolExecutor(max_workers=min(self.batch_workers, len(names))) as executor:
+            return list(executor.map(self._fetch_metadata, names))
+
+
+class CachedFileSystemStorage(CachedStorageMixin, FileSystemStorage):
+    """Local filesystem storage with the same caching behaviour, for development and tests."""
+
+    def cache_namespace(self):
+        return f"fs:{self.location}"
+
+    def _fetch_metadata(self, name):
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return {'exists': False, 'size': None, 'etag': None}
+        return {'exists': True, 'size': stat.st_size, 'etag': f"{stat.st_mtime_ns:x}-{stat.st_size:x}"}
+
+
+def file_metadata(files):
+    """
+    {name: metadata} for a list of FieldFiles, as from CachedStorageMixin.metadata,
+    with one batch per storage. Empty files are skipped.
+    """
+    by_storage = {}
+    for field_file in files:
+        if field_file:
+            by_storage.setdefault(field_file.storage, []).append(field_file.name)
+    results = {}
+    for storage, names in by_storage.items():
+        if isinstance(storage, CachedStorageMixin):
+            results.update(storage.metadata_many(names))
+            continue
+        for name in names:
+            exists = storage.exists(name)
+            results[name] = {'exists': exists, 'size': storage.size(name) if exists else None, 'etag': None}
+    return results
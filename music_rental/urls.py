@@ -21,6 +21,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from .admin_site import roknsound_admin_site
+from .views import metrics_view
 
 # Use our custom admin site
 admin.site = roknsound_admin_site
@@ -33,6 +34,7 @@ urlpatterns = [
     path("payments/", include("payments.urls")),
     path("users/", include("users.urls")),  # Keep users URLs first
     path("accounts/", include("allauth.urls")),  # Include all allauth URLs
+    path("internal/metrics/", metrics_view, name="metrics"),
 ]
 
 # Serve media files in development (keep this)
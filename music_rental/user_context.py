@@ -0,0 +1,109 @@
+"""
+The signed-in user for one request, loaded once.
+
+UserContextMiddleware replaces the lazy request.user from Django's
+AuthenticationMiddleware with one that loads the user together with their
+UserProfile, CustomerProfile and Customer in a single joined query, so
+request.user.profile and request.user.customer cost nothing afterwards (and
+hasattr() checks for a missing one don't query either).
+
+request.user_context is a UserContext with the role flags views branch on,
+computed from that already loaded profile, so it costs no query either and
+a profile change takes effect on the user's next request.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model, load_backend
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.crypto import constant_time_compare
+
+USER_RELATED = ('profile', 'profile__customer_info', 'customer')
+
+
+@dataclass(frozen=True)
+class UserContext:
+    user_id: Optional[int] = None
+    user_type: Optional[str] = None
+    customer_id: Optional[int] = None
+    is_staff: bool = False
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def is_staff_member(self):
+        return self.user_type in ('employee', 'admin')
+
+    @property
+    def is_admin(self):
+        return self.user_type == 'admin'
+
+    @property
+    def is_customer(self):
+        return self.user_type == 'customer'
+
+    @classmethod
+    def for_user(cls, user):
+        if not user.is_authenticated:
+            return cls()
+        profile = _related(user, 'profile')
+        customer = _related(user, 'customer')
+        return cls(
+            user_id=user.pk,
+            user_type=profile.user_type if profile else None,
+            customer_id=customer.pk if customer else None,
+            is_staff=user.is_staff or user.is_superuser,
+        )
+
+
+def _related(obj, name):
+    try:
+        return getattr(obj, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def get_user(request):
+    """
+    django.contrib.auth.get_user() with USER_RELATED joined in. The session
+    is verified the same way; unknown backends and inactive users are refused.
+    """
+    user = None
+    try:
+        user_id = get_user_model()._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    backend = load_backend(backend_path)
+    user = get_user_model()._default_manager.select_related(*USER_RELATED).filter(pk=user_id).first()
+    if user is None or not getattr(backend, 'user_can_authenticate', lambda user: True)(user):
+        return AnonymousUser()
+
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    session_auth_hash = user.get_session_auth_hash()
+    if session_hash and constant_time_compare(session_hash, session_auth_hash):
+        return user
+    # As in Django: a hash made with a fallback secret is upgraded, anything else logs out
+    if session_hash and any(constant_time_compare(session_hash, fallback)
+                            for fallback in user.get_session_auth_fallback_hash()):
+        request.session.cycle_key()
+        request.session[HASH_SESSION_KEY] = session_auth_hash
+        return user
+    request.session.flush()
+    return AnonymousUser()
+
+
+def get_user_context(request):
+    """The UserContext for request (works without the middleware too)."""
+    context = getattr(request, '_cached_user_context', None)
+    if context is None:
+        context = UserContext.for_user(request.user)
+        request._cached_user_context = context
+    return context
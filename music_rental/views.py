@@ -0,0 +1,24 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from . import metrics
+
+
+def _metrics_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if hmac.compare_digest(supplied, token):
+            return True
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1']):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; invisible unless the caller is allowed to see it."""
+    if not metrics.enabled() or not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
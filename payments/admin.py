@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from simple_history.admin import SimpleHistoryAdmin
-from .models import Payment, PayPalTransaction, StripeTransaction, VenmoTransaction
+from .models import Payment, PaymentEvent, PayPalTransaction, StripeTransaction, VenmoTransaction
 
 class PayPalTransactionInline(admin.StackedInline):
     model = PayPalTransaction
@@ -74,7 +74,7 @@ class PaymentAdmin(SimpleHistoryAdmin):
     customer_name.short_description = "Customer"
     
     def amount_formatted(self, obj):
-        return format_html('<span style="font-weight: bold;">${:.2f}</span>', obj.amount)
+        return format_html('<span style="font-weight: bold;">${}</span>', f'{obj.amount:.2f}')
     amount_formatted.short_description = "Amount"
     
     def payment_type_badge(self, obj):
@@ -237,3 +237,18 @@ class VenmoTransactionAdmin(admin.ModelAdmin):
     def payment_link(self, obj):
         return format_html('<a href="/admin/payments/payment/{}/change/">Payment #{}</a>', obj.payment.id, obj.payment.id)
     payment_link.short_description = "Payment"
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'provider', 'event_type', 'received_at', 'processed_at', 'attempts', 'error')
+    list_filter = ('provider', 'event_type', ('processed_at', admin.EmptyFieldListFilter))
+    search_fields = ('event_id', 'event_type')
+    date_hierarchy = 'received_at'
+    readonly_fields = [field.name for field in PaymentEvent._meta.fields]
+
+    # Events are only ever written by the webhook endpoint and the worker
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
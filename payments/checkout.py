@@ -0,0 +1,116 @@
+"""
+Taking a payment through a provider gateway (payments/gateways.py).
+
+start_checkout() creates the pending Payment, or finds the existing one for
+the same checkout, and asks the provider to authorise it. Stripe answers
+with a client secret for Stripe.js and PayPal with an approval URL.
+Once the customer has confirmed, schedule_capture() captures the payment in
+the background, and the provider's webhook (payments/events.py) confirms it
+again later.
+"""
+import logging
+from decimal import Decimal
+
+from django.utils import timezone
+
+from music_rental.background import run_in_background
+
+from .gateways import GatewayError, get_gateway
+from .models import Payment, PayPalTransaction, StripeTransaction
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+
+def checkout_key(rental, payment_type, amount):
+    """
+    The idempotency key for paying amount of payment_type on rental. A
+    checkout submitted twice gets the same key. Once the payment holding it
+    is settled (completed, failed or refunded), the next one gets a numbered
+    key so paying the same amount again is still possible.
+    """
+    base = f"rental-{rental.pk}-{payment_type}-{Decimal(amount).quantize(CENT)}"
+    settled = Payment.objects.filter(idempotency_key__startswith=base).exclude(status='pending').count()
+    return f"{base}-{settled + 1}" if settled else base
+
+
+def _fail(payment, error):
+    payment.status = 'failed'
+    payment.notes = f"{payment.notes}\n{error}".strip()
+    payment.save(update_fields=['status', 'notes', 'updated_at'])
+
+
+def start_checkout(rental, provider, payment_type='rental', amount=None, return_url='', cancel_url=''):
+    """
+    Authorise a payment of amount (default: the rental's balance) with
+    provider. Returns (payment, GatewayResult); raises GatewayError.
+    """
+    amount = Decimal(rental.balance_due if amount is None else amount).quantize(CENT)
+    if amount <= 0:
+        raise GatewayError("Nothing to pay")
+    gateway = get_gateway(provider)
+    key = checkout_key(rental, payment_type, amount)
+    payment, _ = Payment.objects.get_or_create(idempotency_key=key, defaults={
+        'rental': rental, 'amount': amount, 'payment_type': payment_type, 'payment_method': provider,
+    })
+
+    try:
+        result = gateway.create(payment, key, return_url=return_url, cancel_url=cancel_url)
+    except GatewayError as e:
+        _fail(payment, e)
+        raise
+
+    if provider == 'stripe':
+        StripeTransaction.objects.update_or_create(payment=payment, defaults={'payment_intent_id': result.reference})
+    elif provider == 'paypal':
+        PayPalTransaction.objects.update_or_create(payment=payment, defaults={'paypal_order_id': result.reference})
+    return payment, result
+
+
+def payment_reference(payment):
+    """The provider's id for payment (payment intent or order), or None."""
+    if payment.payment_method == 'stripe':
+        tx = StripeTransaction.objects.filter(payment=payment).first()
+        return tx.payment_intent_id if tx else None
+    if payment.payment_method == 'paypal':
+        tx = PayPalTransaction.objects.filter(payment=payment).first()
+        return tx.paypal_order_id if tx else None
+    return None
+
+
+def capture_payment(payment):
+    """Capture an authorised payment now. Returns the GatewayResult, or None if there was nothing to capture."""
+    reference = payment_reference(payment)
+    if payment.status != 'pending' or not reference:
+        return None
+    try:
+        result = get_gateway(payment.payment_method).capture(reference, f"{payment.idempotency_key}-capture")
+    except GatewayError as e:
+        _fail(payment, e)
+        raise
+
+    payment.status = result.status
+    payment.transaction_id = result.transaction_id or payment.transaction_id
+    payment.save(update_fields=['status', 'transaction_id', 'updated_at'])
+    if payment.payment_method == 'stripe' and result.transaction_id:
+        StripeTransaction.objects.filter(payment=payment).update(stripe_charge_id=result.transaction_id,
+                                                                 raw_response=result.raw)
+    elif payment.payment_method == 'paypal' and result.status == 'completed':
+        PayPalTransaction.objects.filter(payment=payment).update(payment_completed_at=timezone.now(),
+                                                                 raw_response=result.raw)
+    return result
+
+
+def _capture_for_pk(pk):
+    payment = Payment.objects.filter(pk=pk, status='pending').first()
+    if payment is not None:
+        capture_payment(payment)
+
+
+def schedule_capture(payment):
+    """Capture payment in the background where the provider allows it, otherwise right away."""
+    if get_gateway(payment.payment_method).supports_async_capture:
+        run_in_background(_capture_for_pk, payment.pk)
+    else:
+        capture_payment(payment)
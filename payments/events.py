@@ -0,0 +1,356 @@
+"""
+Applying stored webhook events (payments/webhooks.py) to payments.
+
+`manage.py process_payment_events` takes pending events in batches, oldest
+first. For a batch the matching transaction rows and payments are loaded in
+a few queries, each event is applied in memory in the order it arrived, and
+everything is written back with bulk updates. On PostgreSQL the batch is
+locked with SKIP LOCKED, so several workers can run side by side. Two
+batches can still hold events for the same payment, so the payments are
+locked too (in pk order, so workers can't deadlock) and one worker waits for
+the other to commit before it reads the payment's status.
+
+An event is matched by the provider's ids (payment intent or charge, PayPal
+order, Venmo transaction) and otherwise by our payment id in its metadata
+(Stripe metadata.payment_id, PayPal custom_id, Venmo metadata.payment_id).
+Events that match nothing are retried on later runs, up to MAX_ATTEMPTS.
+Event types we don't act on are marked processed and left alone. If a
+batch fails in the database it is rolled back, and its events are charged an
+attempt and the error in a transaction of their own, so a batch that can't be
+applied runs out of attempts instead of being retried forever.
+"""
+import datetime
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from simple_history.utils import bulk_update_with_history
+
+from .models import Payment, PaymentEvent, PayPalTransaction, StripeTransaction, VenmoTransaction
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 100
+
+TRANSACTION_MODELS = {
+    'stripe': StripeTransaction,
+    'paypal': PayPalTransaction,
+    'venmo': VenmoTransaction,
+}
+# The id field a new transaction row can't be saved without
+TRANSACTION_ID_FIELDS = {
+    'stripe': 'stripe_charge_id',
+    'paypal': 'paypal_order_id',
+    'venmo': 'venmo_transaction_id',
+}
+PAYMENT_FIELDS = ['status', 'transaction_id', 'refund_amount', 'refund_date', 'refund_transaction_id', 'updated_at']
+
+# Event type -> new payment status (None: record the details, keep the status)
+STRIPE_STATUSES = {
+    'payment_intent.succeeded': 'completed',
+    'payment_intent.payment_failed': 'failed',
+    'charge.succeeded': 'completed',
+    'charge.failed': 'failed',
+    'charge.refunded': 'refunded',
+}
+PAYPAL_STATUSES = {
+    'CHECKOUT.ORDER.APPROVED': None,
+    'PAYMENT.CAPTURE.COMPLETED': 'completed',
+    'PAYMENT.CAPTURE.DENIED': 'failed',
+    'PAYMENT.CAPTURE.DECLINED': 'failed',
+    'PAYMENT.CAPTURE.REFUNDED': 'refunded',
+}
+VENMO_STATUSES = {
+    'payment.completed': 'completed',
+    'payment.failed': 'failed',
+    'payment.refunded': 'refunded',
+}
+
+
+@dataclass
+class EventUpdate:
+    """What one event does to its payment."""
+    status: str = None
+    # Transaction fields that identify the payment, in order of preference
+    keys: dict = field(default_factory=dict)
+    payment_id: int = None
+    transaction_id: str = None
+    transaction: dict = field(default_factory=dict)
+    refund: dict = field(default_factory=dict)
+
+
+@dataclass
+class ProcessResult:
+    processed: int = 0
+    ignored: int = 0
+    failed: int = 0
+
+    def __add__(self, other):
+        return ProcessResult(self.processed + other.processed, self.ignored + other.ignored,
+                             self.failed + other.failed)
+
+    def __bool__(self):
+        return bool(self.processed or self.ignored or self.failed)
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _timestamp(value):
+    return datetime.datetime.fromtimestamp(value, tz=datetime.timezone.utc) if value else None
+
+
+def _stripe_update(payload):
+    if payload['type'] not in STRIPE_STATUSES:
+        return None
+    obj = payload['data']['object']
+    update = EventUpdate(status=STRIPE_STATUSES[payload['type']], transaction_id=obj['id'],
+                         payment_id=_int((obj.get('metadata') or {}).get('payment_id')))
+    if obj.get('object') == 'payment_intent':
+        update.keys = {'payment_intent_id': obj['id']}
+        update.transaction = {'payment_intent_id': obj['id'], 'stripe_charge_id': obj.get('latest_charge'),
+                              'stripe_customer_id': obj.get('customer')}
+        return update
+
+    card = (obj.get('payment_method_details') or {}).get('card') or {}
+    update.keys = {'stripe_charge_id': obj['id'], 'payment_intent_id': obj.get('payment_intent')}
+    update.transaction = {
+        'stripe_charge_id': obj['id'], 'payment_intent_id': obj.get('payment_intent'),
+        'stripe_customer_id': obj.get('customer'), 'payment_method_id': obj.get('payment_method'),
+        'card_last4': card.get('last4'), 'card_brand': card.get('brand'), 'raw_response': obj,
+    }
+    if update.status == 'refunded':
+        refunds = (obj.get('refunds') or {}).get('data') or [{}]
+        update.refund = {
+            'refund_amount': Decimal(obj.get('amount_refunded', 0)) / 100,
+            'refund_date': _timestamp(payload.get('created')),
+            'refund_transaction_id': refunds[0].get('id'),
+        }
+    return update
+
+
+def _paypal_update(payload):
+    if payload['event_type'] not in PAYPAL_STATUSES:
+        return None
+    resource = payload['resource']
+    update = EventUpdate(status=PAYPAL_STATUSES[payload['event_type']], payment_id=_int(resource.get('custom_id')))
+    if payload['event_type'].startswith('CHECKOUT.ORDER.'):
+        payer = resource.get('payer') or {}
+        units = resource.get('purchase_units') or [{}]
+        update.payment_id = _int(units[0].get('custom_id'))
+        update.keys = {'paypal_order_id': resource['id']}
+        update.transaction = {'paypal_order_id': resource['id'], 'paypal_payer_id': payer.get('payer_id'),
+                              'paypal_payer_email': payer.get('email_address'), 'raw_response': resource}
+        return update
+
+    order_id = ((resource.get('supplementary_data') or {}).get('related_ids') or {}).get('order_id')
+    update.keys = {'paypal_order_id': order_id}
+    update.transaction = {'paypal_order_id': order_id, 'raw_response': resource}
+    if update.status == 'refunded':
+        update.refund = {
+            'refund_amount': Decimal(resource['amount']['value']),
+            'refund_date': parse_datetime(resource.get('create_time') or ''),
+            'refund_transaction_id': resource['id'],
+        }
+    else:
+        update.transaction_id = resource['id']
+        if update.status == 'completed':
+            update.transaction['payment_completed_at'] = parse_datetime(resource.get('create_time') or '')
+    return update
+
+
+def _venmo_update(payload):
+    if payload['type'] not in VENMO_STATUSES:
+        return None
+    data = payload['data']
+    actor = data.get('actor') or {}
+    update = EventUpdate(status=VENMO_STATUSES[payload['type']], transaction_id=data['id'],
+                         payment_id=_int((data.get('metadata') or {}).get('payment_id')),
+                         keys={'venmo_transaction_id': data['id']})
+    update.transaction = {'venmo_transaction_id': data['id'], 'venmo_user_id': actor.get('id'),
+                          'venmo_username': actor.get('username'), 'venmo_email': actor.get('email'),
+                          'notes': data.get('note')}
+    if update.status == 'refunded':
+        update.transaction_id = None
+        update.refund = {'refund_amount': Decimal(str(data.get('amount', 0))),
+                         'refund_date': parse_datetime(data.get('date_completed') or ''),
+                         'refund_transaction_id': data.get('refund_id')}
+    return update
+
+
+PARSERS = {
+    'stripe': _stripe_update,
+    'paypal': _paypal_update,
+    'venmo': _venmo_update,
+}
+
+
+def status_allowed(current, new):
+    """Events can arrive out of order; never step back from completed or refunded."""
+    if new is None or current == new:
+        return False
+    if current == 'refunded':
+        return False
+    if current == 'completed':
+        return new == 'refunded'
+    return True
+
+
+def _load_transactions(updates):
+    """{provider: {(field, value): transaction}} for the ids the updates mention."""
+    found = {}
+    for provider, model in TRANSACTION_MODELS.items():
+        wanted = defaultdict(set)
+        for event, update in updates:
+            if event.provider == provider:
+                for key, value in update.keys.items():
+                    if value:
+                        wanted[key].add(value)
+        if not wanted:
+            continue
+        query = Q()
+        for key, values in wanted.items():
+            query |= Q(**{f'{key}__in': values})
+        found[provider] = {
+            (key, getattr(tx, key)): tx
+            for tx in model.objects.filter(query) for key in wanted
+        }
+    return found
+
+
+def _match(event, update, transactions):
+    """The payment id the update belongs to, or None."""
+    by_key = transactions.get(event.provider, {})
+    for key, value in update.keys.items():
+        tx = by_key.get((key, value)) if value else None
+        if tx is not None:
+            return tx.payment_id
+    return update.payment_id
+
+
+def apply_events(events, now=None):
+    """
+    Apply events (PaymentEvent rows, oldest first) and save everything they
+    change. Call it inside a transaction; it locks the payments it updates.
+    """
+    now = now or timezone.now()
+    result = ProcessResult()
+    updates = []
+    for event in events:
+        event.attempts += 1
+        try:
+            update = PARSERS[event.provider](event.payload)
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            event.error = f"Malformed payload: {e!r}"
+            result.failed += 1
+            continue
+        if update is None:
+            event.processed_at, event.error = now, ''
+            result.ignored += 1
+        else:
+            updates.append((event, update))
+
+    transactions = _load_transactions(updates)
+    payment_ids = {event.pk: _match(event, update, transactions) for event, update in updates}
+    payments = (Payment.objects.select_for_update().order_by('pk')
+                .in_bulk({pk for pk in payment_ids.values() if pk}))
+    tx_by_payment = {
+        provider: {tx.payment_id: tx for tx in model.objects.filter(payment_id__in=payments)}
+        for provider, model in TRANSACTION_MODELS.items()
+        if any(event.provider == provider for event, update in updates)
+    }
+
+    changed_payments, changed_tx, new_tx = {}, defaultdict(dict), defaultdict(dict)
+    tx_fields = defaultdict(set)
+    for event, update in updates:
+        payment = payments.get(payment_ids[event.pk])
+        if payment is None:
+            event.error = "No matching payment"
+            result.failed += 1
+            continue
+
+        if status_allowed(payment.status, update.status):
+            payment.status = update.status
+            changed_payments[payment.pk] = payment
+            if update.transaction_id:
+                payment.transaction_id = update.transaction_id
+            if update.status == 'refunded':
+                for name, value in update.refund.items():
+                    setattr(payment, name, value)
+
+        tx = tx_by_payment[event.provider].get(payment.pk)
+        if tx is None:
+            id_field = TRANSACTION_ID_FIELDS[event.provider]
+            tx = TRANSACTION_MODELS[event.provider](payment=payment, **{id_field: ''})
+            tx_by_payment[event.provider][payment.pk] = new_tx[event.provider][payment.pk] = tx
+        for name, value in update.transaction.items():
+            if value is not None and getattr(tx, name) != value:
+                setattr(tx, name, value)
+                tx_fields[event.provider].add(name)
+                if tx.pk:
+                    changed_tx[event.provider][tx.pk] = tx
+
+        event.processed_at, event.error = now, ''
+        result.processed += 1
+
+    for payment in changed_payments.values():
+        payment.updated_at = now
+    if changed_payments:
+        bulk_update_with_history(list(changed_payments.values()), Payment, PAYMENT_FIELDS)
+    for provider, model in TRANSACTION_MODELS.items():
+        if new_tx[provider]:
+            model.objects.bulk_create(new_tx[provider].values())
+        if changed_tx[provider]:
+            model.objects.bulk_update(changed_tx[provider].values(), sorted(tx_fields[provider]))
+    PaymentEvent.objects.bulk_update(events, ['processed_at', 'attempts', 'error'])
+    return result
+
+
+def pending_events(max_attempts=MAX_ATTEMPTS):
+    return PaymentEvent.objects.filter(processed_at__isnull=True, attempts__lt=max_attempts).order_by('received_at', 'id')
+
+
+def process_events(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Apply pending events, batch_size at a time, until none are left. Each
+    batch is its own transaction. Events that fail stay pending for a later
+    run; one pass moves forward through the queue and never retries them.
+    """
+    total, last = ProcessResult(), None
+    while True:
+        events = []
+        try:
+            with transaction.atomic():
+                queryset = pending_events(max_attempts)
+                if last is not None:
+                    queryset = queryset.filter(Q(received_at__gt=last.received_at) |
+                                               Q(received_at=last.received_at, pk__gt=last.pk))
+                if connection.features.has_select_for_update_skip_locked:
+                    queryset = queryset.select_for_update(skip_locked=True)
+                events = list(queryset[:batch_size])
+                if not events:
+                    return total
+                last = events[-1]
+                total += apply_events(events)
+        except DatabaseError as e:
+            if not events:
+                raise
+            logger.exception("Applying %d payment events failed", len(events))
+            _record_failure(events, e)
+            total += ProcessResult(failed=len(events))
+
+
+def _record_failure(events, error):
+    with transaction.atomic():
+        PaymentEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            attempts=F('attempts') + 1, error=f"Batch failed: {error!r}")
@@ -0,0 +1,145 @@
+"""
+In-process fakes of the Stripe and PayPal APIs the gateways use.
+
+fake_transport() returns an httpx.MockTransport, so the real gateway code
+(request building, idempotency headers, error handling) runs unchanged and
+only the network is missing. Like the real APIs, the fakes replay the stored
+answer when an idempotency key comes back. PAYMENT_GATEWAY_FAKE_LATENCY
+(seconds) is added to every call to approximate a provider's response time
+in load tests.
+
+A Stripe amount of 666 cents, or a PayPal order value of "6.66", is declined
+so failure paths can be exercised too. The fake PayPal verifies webhook
+transmissions signed with fake_transmission_sig() in place of PayPal's RSA
+signature.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl
+
+import httpx
+from django.conf import settings
+
+DECLINED_CENTS = 666
+
+
+def fake_transmission_sig(transmission_id, transmission_time, webhook_id, event):
+    """Stands in for PayPal's signature over the same fields (see webhooks.sign())."""
+    body = json.dumps(event, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{transmission_id}|{transmission_time}|{webhook_id}|{body}".encode()).hexdigest()
+
+
+class FakeProvider:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.replies = {}
+
+    def reset(self):
+        with self.lock:
+            self.objects.clear()
+            self.replies.clear()
+
+    def __call__(self, request):
+        latency = getattr(settings, 'PAYMENT_GATEWAY_FAKE_LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+        key = request.headers.get(self.idempotency_header)
+        with self.lock:
+            if key and (key, request.url.path) in self.replies:
+                status, body = self.replies[(key, request.url.path)]
+            else:
+                status, body = self.handle(request)
+                if key:
+                    self.replies[(key, request.url.path)] = (status, body)
+        return httpx.Response(status, json=body)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+
+class FakeStripe(FakeProvider):
+    idempotency_header = 'Idempotency-Key'
+
+    def handle(self, request):
+        path = request.url.path
+        if request.method == 'POST' and path == '/v1/payment_intents':
+            data = dict(parse_qsl(request.content.decode()))
+            if int(data['amount']) == DECLINED_CENTS:
+                return 402, {'error': {'type': 'card_error', 'code': 'card_declined'}}
+            intent_id = f"pi_fake_{uuid.uuid4().hex[:16]}"
+            self.objects[intent_id] = intent = {
+                'id': intent_id, 'object': 'payment_intent', 'amount': int(data['amount']),
+                'currency': data.get('currency', 'usd'), 'status': 'requires_capture',
+                'capture_method': data.get('capture_method', 'automatic'),
+                'client_secret': f"{intent_id}_secret_{uuid.uuid4().hex[:12]}", 'latest_charge': None,
+                'metadata': {key[9:-1]: value for key, value in data.items() if key.startswith('metadata[')},
+            }
+            return 200, intent
+        if request.method == 'POST' and path.startswith('/v1/payment_intents/') and path.endswith('/capture'):
+            intent = self.objects.get(path.split('/')[3])
+            if intent is None:
+                return 404, {'error': {'type': 'invalid_request_error', 'code': 'resource_missing'}}
+            if intent['status'] != 'requires_capture':
+                return 400, {'error': {'type': 'invalid_request_error', 'code': 'payment_intent_unexpected_state'}}
+            intent.update(status='succeeded', latest_charge=f"ch_fake_{uuid.uuid4().hex[:16]}")
+            return 200, intent
+        return 404, {'error': {'type': 'invalid_request_error', 'message': f"Unknown path {path}"}}
+
+
+class FakePayPal(FakeProvider):
+    idempotency_header = 'PayPal-Request-Id'
+
+    def handle(self, request):
+        path = request.url.path
+        if path == '/v1/oauth2/token':
+            return 200, {'access_token': f"fake-{uuid.uuid4().hex}", 'token_type': 'Bearer', 'expires_in': 32400}
+        if request.method == 'POST' and path == '/v1/notifications/verify-webhook-signature':
+            data = json.loads(request.content)
+            expected = fake_transmission_sig(data['transmission_id'], data['transmission_time'],
+                                             data['webhook_id'], data['webhook_event'])
+            return 200, {'verification_status': 'SUCCESS' if data['transmission_sig'] == expected else 'FAILURE'}
+        if request.method == 'POST' and path == '/v2/checkout/orders':
+            data = json.loads(request.content)
+            unit = data['purchase_units'][0]
+            if unit['amount']['value'] == f"{DECLINED_CENTS / 100:.2f}":
+                return 422, {'name': 'UNPROCESSABLE_ENTITY', 'details': [{'issue': 'INSTRUMENT_DECLINED'}]}
+            order_id = uuid.uuid4().hex[:17].upper()
+            self.objects[order_id] = order = {
+                'id': order_id, 'intent': data['intent'], 'status': 'CREATED',
+                'purchase_units': [dict(unit, payments={'captures': []})],
+                'links': [{'rel': 'approve', 'href': f"https://www.sandbox.paypal.com/checkoutnow?token={order_id}",
+                           'method': 'GET'}],
+            }
+            return 201, order
+        if request.method == 'POST' and path.startswith('/v2/checkout/orders/') and path.endswith('/capture'):
+            order = self.objects.get(path.split('/')[4])
+            if order is None:
+                return 404, {'name': 'RESOURCE_NOT_FOUND'}
+            if order['status'] == 'COMPLETED':
+                return 422, {'name': 'UNPROCESSABLE_ENTITY', 'details': [{'issue': 'ORDER_ALREADY_CAPTURED'}]}
+            order['status'] = 'COMPLETED'
+            unit = order['purchase_units'][0]
+            unit['payments']['captures'].append({'id': uuid.uuid4().hex[:17].upper(), 'status': 'COMPLETED',
+                                                 'amount': unit['amount']})
+            return 201, order
+        return 404, {'name': 'RESOURCE_NOT_FOUND'}
+
+
+FAKES = {}
+_fakes_lock = threading.Lock()
+
+
+def fake_provider(base_url):
+    """The fake behind base_url (Stripe for *stripe* hosts, PayPal otherwise)."""
+    with _fakes_lock:
+        if base_url not in FAKES:
+            FAKES[base_url] = FakeStripe() if 'stripe' in base_url else FakePayPal()
+        return FAKES[base_url]
+
+
+def fake_transport(base_url):
+    return httpx.MockTransport(fake_provider(base_url))
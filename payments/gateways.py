@@ -0,0 +1,243 @@
+"""
+Payment provider clients.
+
+Each provider's REST API is called through one process-wide httpx.Client
+per API host (http_client()). Connections are kept alive and reused across
+requests and threads, and every call has PAYMENT_GATEWAY_TIMEOUT as its
+client-side timeout, so a slow provider can't hold a worker indefinitely.
+
+Every create and capture call carries an idempotency key (Stripe's
+Idempotency-Key, PayPal's PayPal-Request-Id). The key comes from the
+rental, payment type and amount (see checkout.checkout_key), so a retried or
+double-submitted checkout reuses the provider's first answer instead of
+charging twice.
+
+Both providers support authorising at checkout and capturing later:
+Stripe through capture_method=manual, PayPal by capturing the order after the
+customer approves it. checkout.schedule_capture() captures in the background.
+
+With PAYMENT_GATEWAY_FAKE set, the clients talk to in-process fakes of the
+provider APIs (payments/fake_gateways.py) instead of the network, which is
+what tests and `manage.py checkout_load_test` use.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import httpx
+from django.conf import settings
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class GatewayError(Exception):
+    """A provider call failed or was refused; the message says which and why."""
+
+
+@dataclass
+class GatewayResult:
+    # The provider's id for the payment: payment intent or order
+    reference: str
+    # Payment.status the provider's answer corresponds to
+    status: str
+    client_secret: str = ''
+    approve_url: str = ''
+    # Charge or capture id, once captured
+    transaction_id: str = ''
+    raw: dict = field(default_factory=dict)
+
+
+def _fake():
+    return getattr(settings, 'PAYMENT_GATEWAY_FAKE', False)
+
+
+def http_client(base_url):
+    """The shared httpx.Client for base_url, created on first use."""
+    key = (base_url, _fake())
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                transport = None
+                if _fake():
+                    from .fake_gateways import fake_transport
+                    transport = fake_transport(base_url)
+                client = _clients[key] = httpx.Client(
+                    base_url=base_url, transport=transport,
+                    timeout=httpx.Timeout(getattr(settings, 'PAYMENT_GATEWAY_TIMEOUT', 10.0), connect=3.0),
+                    limits=httpx.Limits(max_connections=getattr(settings, 'PAYMENT_GATEWAY_MAX_CONNECTIONS', 20),
+                                        max_keepalive_connections=10),
+                )
+    return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _cents(amount):
+    return int((Decimal(amount) * 100).quantize(Decimal('1')))
+
+
+class Gateway:
+    provider = None
+    supports_async_capture = False
+
+    def __init__(self, config):
+        self.config = config
+
+    @property
+    def base_url(self):
+        raise NotImplementedError
+
+    def headers(self, idempotency_key=None):
+        return {}
+
+    def request(self, method, path, idempotency_key=None, **kwargs):
+        try:
+            response = http_client(self.base_url).request(
+                method, path, headers=self.headers(idempotency_key), **kwargs)
+        except httpx.HTTPError as e:
+            raise GatewayError(f"{self.provider} request to {path} failed: {e!r}") from e
+        if response.status_code >= 400:
+            raise GatewayError(f"{self.provider} answered {response.status_code} for {path}: {response.text[:300]}")
+        return response.json()
+
+    def create(self, payment, idempotency_key, return_url='', cancel_url=''):
+        """Start a payment with the provider; returns a pending GatewayResult."""
+        raise NotImplementedError
+
+    def capture(self, reference, idempotency_key):
+        raise NotImplementedError
+
+
+class StripeGateway(Gateway):
+    provider = 'stripe'
+    supports_async_capture = True
+    STATUSES = {'requires_capture': 'pending', 'succeeded': 'completed', 'canceled': 'failed'}
+
+    @property
+    def base_url(self):
+        return self.config.get('API_BASE', 'https://api.stripe.com')
+
+    def headers(self, idempotency_key=None):
+        headers = {'Authorization': f"Bearer {self.config.get('SECRET_KEY', '')}"}
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        return headers
+
+    def _result(self, intent):
+        return GatewayResult(reference=intent['id'], status=self.STATUSES.get(intent['status'], 'pending'),
+                             client_secret=intent.get('client_secret') or '',
+                             transaction_id=intent.get('latest_charge') or '', raw=intent)
+
+    def create(self, payment, idempotency_key, return_url='', cancel_url=''):
+        intent = self.request('POST', '/v1/payment_intents', idempotency_key, data={
+            'amount': _cents(payment.amount),
+            'currency': 'usd',
+            'capture_method': 'manual',
+            'automatic_payment_methods[enabled]': 'true',
+            'metadata[payment_id]': payment.pk,
+            'metadata[rental_id]': payment.rental_id,
+        })
+        return self._result(intent)
+
+    def capture(self, reference, idempotency_key):
+        return self._result(self.request('POST', f'/v1/payment_intents/{reference}/capture', idempotency_key))
+
+
+class PayPalGateway(Gateway):
+    provider = 'paypal'
+    supports_async_capture = True
+    STATUSES = {'COMPLETED': 'completed', 'VOIDED': 'failed', 'DECLINED': 'failed'}
+    # Tokens live for hours; renew a minute before PayPal's expiry
+    TOKEN_MARGIN = 60
+
+    _token = None
+    _token_expires = 0
+    _token_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return self.config.get('API_BASE', 'https://api-m.sandbox.paypal.com')
+
+    def access_token(self):
+        cls = type(self)
+        with cls._token_lock:
+            if cls._token is None or time.monotonic() >= cls._token_expires:
+                try:
+                    response = http_client(self.base_url).post(
+                        '/v1/oauth2/token', data={'grant_type': 'client_credentials'},
+                        auth=(self.config.get('CLIENT_ID', ''), self.config.get('CLIENT_SECRET', '')))
+                except httpx.HTTPError as e:
+                    raise GatewayError(f"paypal token request failed: {e!r}") from e
+                if response.status_code >= 400:
+                    raise GatewayError(f"paypal refused the client credentials ({response.status_code})")
+                token = response.json()
+                cls._token = token['access_token']
+                cls._token_expires = time.monotonic() + token.get('expires_in', 3600) - self.TOKEN_MARGIN
+            return cls._token
+
+    def headers(self, idempotency_key=None):
+        headers = {'Authorization': f"Bearer {self.access_token()}", 'Prefer': 'return=representation'}
+        if idempotency_key:
+            headers['PayPal-Request-Id'] = idempotency_key
+        return headers
+
+    def _result(self, order):
+        captures = [capture for unit in order.get('purchase_units', [])
+                    for capture in (unit.get('payments') or {}).get('captures', [])]
+        approve = next((link['href'] for link in order.get('links', [])
+                        if link.get('rel') in ('approve', 'payer-action')), '')
+        return GatewayResult(reference=order['id'], status=self.STATUSES.get(order['status'], 'pending'),
+                             approve_url=approve, transaction_id=captures[0]['id'] if captures else '', raw=order)
+
+    def create(self, payment, idempotency_key, return_url='', cancel_url=''):
+        order = self.request('POST', '/v2/checkout/orders', idempotency_key, json={
+            'intent': 'CAPTURE',
+            'purchase_units': [{
+                'reference_id': str(payment.rental_id),
+                'custom_id': str(payment.pk),
+                'amount': {'currency_code': 'USD', 'value': f"{Decimal(payment.amount):.2f}"},
+            }],
+            'application_context': {'return_url': return_url, 'cancel_url': cancel_url},
+        })
+        return self._result(order)
+
+    def capture(self, reference, idempotency_key):
+        return self._result(self.request('POST', f'/v2/checkout/orders/{reference}/capture', idempotency_key,
+                                         json={}))
+
+    def verify_webhook(self, headers, event):
+        """True if PayPal confirms it sent event with these PayPal-Transmission-* headers."""
+        webhook_id = self.config.get('WEBHOOK_ID')
+        if not webhook_id:
+            raise GatewayError("No PayPal WEBHOOK_ID configured")
+        answer = self.request('POST', '/v1/notifications/verify-webhook-signature', json={
+            'auth_algo': headers.get('PayPal-Auth-Algo'),
+            'cert_url': headers.get('PayPal-Cert-Url'),
+            'transmission_id': headers.get('PayPal-Transmission-Id'),
+            'transmission_sig': headers.get('PayPal-Transmission-Sig'),
+            'transmission_time': headers.get('PayPal-Transmission-Time'),
+            'webhook_id': webhook_id,
+            'webhook_event': event,
+        })
+        return answer.get('verification_status') == 'SUCCESS'
+
+
+GATEWAYS = {
+    'stripe': StripeGateway,
+    'paypal': PayPalGateway,
+}
+
+
+def get_gateway(provider):
+    if provider not in GATEWAYS:
+        raise GatewayError(f"No gateway for {provider!r}")
+    return GATEWAYS[provider](getattr(settings, 'PAYMENT_GATEWAYS', {}).get(provider, {}))
@@ -0,0 +1,112 @@
+"""
+The staff payment list: filters, keyset pages and totals.
+
+Pages are cut by (payment_date, id) rather than OFFSET, so any page costs
+the same as the first one however many payments there are; the cursor in
+the URL is the last (or first) row of the current page. The totals for the
+filtered set come from a single aggregate query.
+"""
+import datetime
+from dataclasses import dataclass
+
+from django import forms
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from rentals.search import search_customers
+
+from .models import Payment
+
+PAGE_SIZE = 50
+
+
+class PaymentFilterForm(forms.Form):
+    status = forms.ChoiceField(choices=(('', 'Any status'),) + Payment.PAYMENT_STATUS_CHOICES, required=False)
+    method = forms.ChoiceField(choices=(('', 'Any method'),) + Payment.PAYMENT_METHOD_CHOICES, required=False)
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    customer = forms.CharField(required=False, max_length=100)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs.setdefault('class', 'form-select' if isinstance(field, forms.ChoiceField)
+                                          else 'form-control')
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def filter_payments(queryset, filters):
+    """queryset narrowed by the cleaned_data of a PaymentFilterForm."""
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('method'):
+        queryset = queryset.filter(payment_method=filters['method'])
+    # Whole local days, as a range on payment_date so its index is usable
+    if filters.get('date_from'):
+        queryset = queryset.filter(payment_date__gte=_start_of_day(filters['date_from']))
+    if filters.get('date_to'):
+        queryset = queryset.filter(
+            payment_date__lt=_start_of_day(filters['date_to'] + datetime.timedelta(days=1)))
+    if filters.get('customer'):
+        queryset = queryset.filter(rental__customer__in=search_customers(filters['customer']))
+    return queryset
+
+
+def payment_totals(queryset):
+    return queryset.aggregate(
+        count=Count('pk'),
+        total=Sum('amount'),
+        completed=Sum('amount', filter=Q(status='completed')),
+        pending=Sum('amount', filter=Q(status='pending')),
+        refunded=Sum('refund_amount', filter=Q(status='refunded')),
+    )
+
+
+def encode_cursor(payment):
+    return f"{payment.payment_date.isoformat()}_{payment.pk}"
+
+
+def decode_cursor(cursor):
+    """(payment_date, pk) from encode_cursor(), or None if it is malformed."""
+    try:
+        date, pk = cursor.rsplit('_', 1)
+        date = datetime.datetime.fromisoformat(date)
+        return (date if timezone.is_aware(date) else timezone.make_aware(date)), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+@dataclass
+class PaymentPage:
+    payments: list
+    next_cursor: str = None
+    previous_cursor: str = None
+
+
+def keyset_page(queryset, after=None, before=None, size=PAGE_SIZE):
+    """
+    One page of queryset, newest first. after (a cursor) continues to older
+    payments, before goes back to newer ones; neither gives the first page.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before:
+        date, pk = before
+        rows = list(queryset.filter(Q(payment_date__gt=date) | Q(payment_date=date, pk__gt=pk))
+                    .order_by('payment_date', 'pk')[:size + 1])
+        more_newer = len(rows) > size
+        payments = rows[:size][::-1]
+        return PaymentPage(payments,
+                           next_cursor=encode_cursor(payments[-1]) if payments else None,
+                           previous_cursor=encode_cursor(payments[0]) if more_newer else None)
+
+    if after:
+        date, pk = after
+        queryset = queryset.filter(Q(payment_date__lt=date) | Q(payment_date=date, pk__lt=pk))
+    rows = list(queryset.order_by('-payment_date', '-pk')[:size + 1])
+    payments = rows[:size]
+    return PaymentPage(payments,
+                       next_cursor=encode_cursor(payments[-1]) if len(rows) > size else None,
+                       previous_cursor=encode_cursor(payments[0]) if after and payments else None)
@@ -0,0 +1,46 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from payments import gateways
+from payments.models import Payment
+
+
+class Command(BaseCommand):
+    help = 'Measure authorise + capture throughput through the gateway clients against the local provider fakes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', choices=sorted(gateways.GATEWAYS), default='stripe')
+        parser.add_argument('--count', type=int, default=1000, help='Checkouts to run')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent checkouts')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='Simulated provider response time per call, in seconds')
+
+    def handle(self, *args, **options):
+        with override_settings(PAYMENT_GATEWAY_FAKE=True, PAYMENT_GATEWAY_FAKE_LATENCY=options['latency']):
+            gateway = gateways.get_gateway(options['provider'])
+
+            def checkout(i):
+                # Unsaved payments: this measures the clients and pool, not the database
+                payment = Payment(pk=i, rental_id=1, amount=Decimal('35.00'), payment_type='rental',
+                                  payment_method=options['provider'])
+                start = time.perf_counter()
+                key = f"load-test-{i}"
+                result = gateway.create(payment, key)
+                gateway.capture(result.reference, f"{key}-capture")
+                return time.perf_counter() - start
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                timings = sorted(executor.map(checkout, range(1, options['count'] + 1)))
+            elapsed = time.perf_counter() - started
+            gateways.close_clients()
+
+        p95 = timings[int(len(timings) * 0.95) - 1] if timings else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(timings)} {options['provider']} checkouts in {elapsed:.2f}s "
+            f"({len(timings) / elapsed:.1f}/s), median {statistics.median(timings) * 1000:.0f}ms, "
+            f"p95 {p95 * 1000:.0f}ms"))
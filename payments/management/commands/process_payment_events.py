@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from payments import events
+
+
+class Command(BaseCommand):
+    help = 'Apply stored payment webhook events to payments and their transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=events.BATCH_SIZE, help='Events applied per transaction')
+        parser.add_argument('--max-attempts', type=int, default=events.MAX_ATTEMPTS,
+                            help='Give up on events that failed this many times')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling for new events')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            result = events.process_events(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            if result or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {result.processed} events, {result.ignored} ignored, {result.failed} failed"))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
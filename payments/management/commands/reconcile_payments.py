@@ -0,0 +1,49 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from payments import reconciliation
+from payments.models import PaymentEvent
+
+
+class Command(BaseCommand):
+    help = "Check payments against a provider's transaction export and correct statuses and refunds"
+
+    def add_arguments(self, parser):
+        parser.add_argument('provider', choices=[choice for choice, _ in PaymentEvent.PROVIDER_CHOICES])
+        parser.add_argument('source', help='Export file (CSV, JSON or JSON lines) or http(s) URL')
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without saving')
+        parser.add_argument('--report', type=str, help='Write every mismatch to this CSV file')
+        parser.add_argument('--batch-size', type=int, default=reconciliation.BATCH_SIZE,
+                            help='Payments per bulk update')
+
+    def handle(self, *args, **options):
+        try:
+            records = reconciliation.load_export(options['source'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['source']}: {e}")
+
+        result = reconciliation.reconcile(options['provider'], records, dry_run=options['dry_run'],
+                                          batch_size=options['batch_size'])
+
+        if options['verbosity'] > 1:
+            for mismatch in result.mismatches:
+                self.stdout.write(f"{mismatch.kind}: record {mismatch.record_id or '-'}, "
+                                  f"payment {mismatch.payment_id or '-'}, ours {mismatch.ours}, "
+                                  f"theirs {mismatch.theirs}")
+        if options['report']:
+            with open(options['report'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['kind', 'record_id', 'payment_id', 'ours', 'theirs'])
+                for mismatch in result.mismatches:
+                    writer.writerow([mismatch.kind, mismatch.record_id, mismatch.payment_id or '',
+                                     mismatch.ours if mismatch.ours is not None else '',
+                                     mismatch.theirs if mismatch.theirs is not None else ''])
+
+        summary = (f"{result.records} records, {result.matched} matched, "
+                   f"{result.count('status')} status and {result.count('refund')} refund differences, "
+                   f"{result.count('amount')} amount differences, {result.count('unknown')} unknown, "
+                   f"{result.count('missing')} missing from export")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Dry run: {summary}, {result.updated} payments would change"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {summary}, {result.updated} payments updated"))
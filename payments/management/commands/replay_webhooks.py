@@ -0,0 +1,45 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from payments import events, webhooks
+
+FIXTURE_DIR = os.path.join(settings.BASE_DIR, 'payments', 'fixtures', 'webhooks')
+
+
+class Command(BaseCommand):
+    help = ('Feed saved webhook payloads through signature checks and ingestion, as if the provider sent them. '
+            'PayPal payloads need PAYMENT_GATEWAY_FAKE; providers without verification (venmo) are stored directly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*',
+                            help='Payload files named <provider>_*.json (default: payments/fixtures/webhooks)')
+        parser.add_argument('--process', action='store_true', help='Apply the stored events afterwards')
+
+    def handle(self, *args, **options):
+        paths = options['files'] or sorted(
+            os.path.join(FIXTURE_DIR, name) for name in os.listdir(FIXTURE_DIR) if name.endswith('.json'))
+
+        stored = duplicates = 0
+        for path in paths:
+            provider = os.path.basename(path).split('_', 1)[0]
+            with open(path, 'rb') as f:
+                body = f.read()
+            try:
+                if provider in webhooks.VERIFIERS:
+                    event, created = webhooks.receive(provider, body, webhooks.sign(provider, body))
+                else:
+                    event, created = webhooks.store(provider, body)
+            except (webhooks.WebhookError, OSError) as e:
+                raise CommandError(f"{path}: {e}")
+            stored += created
+            duplicates += not created
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{'Stored' if created else 'Duplicate'} {event}")
+        self.stdout.write(self.style.SUCCESS(f"Replayed {len(paths)} webhooks: {stored} stored, {duplicates} duplicates"))
+
+        if options['process']:
+            result = events.process_events()
+            self.stdout.write(self.style.SUCCESS(
+                f"Processed {result.processed} events, {result.ignored} ignored, {result.failed} failed"))
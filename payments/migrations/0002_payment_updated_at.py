@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-19 19:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpayment',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_payment_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpayment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
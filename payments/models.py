@@ -43,14 +43,25 @@ class Payment(models.Model):
     refund_date = models.DateTimeField(blank=True, null=True)
     refund_transaction_id = models.CharField(max_length=255, blank=True, null=True)
     
+    # Sent with every provider call for this payment (payments/checkout.py)
+    idempotency_key = models.CharField(max_length=100, unique=True, blank=True, null=True, editable=False)
+    
+    # Lets report refreshes find changed payments (reports/summaries.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    
     # Track history
     history = HistoricalRecords()
     
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            # Keyset pages of the payment list (payments/listing.py)
+            models.Index(fields=['-payment_date', '-id'], name='payment_date_id_idx'),
+            models.Index(fields=['status', '-payment_date'], name='payment_status_date_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.get_payment_type_display()} for Rental #{self.rental.id} - ${self.amount}"
+        return f"{self.get_payment_type_display()} for Rental #{self.rental_id} - ${self.amount}"
 
 class PayPalTransaction(models.Model):
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='paypal_transaction')
@@ -87,3 +98,40 @@ class VenmoTransaction(models.Model):
     
     def __str__(self):
         return f"Venmo Transaction for Payment #{self.payment.id}"
+
+
+class PaymentEvent(models.Model):
+    """
+    A webhook delivery from a payment provider, stored as received (see
+    payments/webhooks.py). The raw columns are never changed; the worker only
+    fills in processed_at, attempts and error.
+    """
+    PROVIDER_CHOICES = (
+        ('stripe', 'Stripe'),
+        ('paypal', 'PayPal'),
+        ('venmo', 'Venmo'),
+    )
+
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    event_id = models.CharField(max_length=255)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['received_at', 'id']
+        constraints = [
+            # Providers retry deliveries; the second copy of an event is dropped
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='unique_payment_event'),
+        ]
+        indexes = [
+            models.Index(fields=['received_at', 'id'], name='payment_event_pending_idx',
+                         condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.get_provider_display()} {self.event_type} ({self.event_id})"
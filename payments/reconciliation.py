@@ -0,0 +1,261 @@
+"""
+Checking payments against provider transaction exports.
+
+`manage.py reconcile_payments` loads a provider's export (a CSV or JSON file,
+or the same from a URL such as a local mock server). It matches every record
+to a payment through in-memory lookup tables, one dict per id column:
+Payment.transaction_id, StripeTransaction.stripe_charge_id/payment_intent_id,
+PayPalTransaction.paypal_order_id and VenmoTransaction.venmo_transaction_id.
+The tables are built with one values_list() query each, so the cost doesn't
+depend on how many records the export has beyond a dict lookup per record.
+
+The provider is taken as the source of truth for status and refunds; those
+are corrected in a single transaction, with history. Amount
+differences, records we have no payment for and payments missing from the
+export are only reported. Amounts are read in currency units, as the
+dashboard exports write them.
+"""
+import csv
+import datetime
+import io
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Payment, PayPalTransaction, StripeTransaction, VenmoTransaction
+
+BATCH_SIZE = 1000
+
+# Export column names (lower-cased) for each normalised field, first match wins
+COLUMNS = {
+    'id': ('id', 'transaction id', 'transaction_id', 'charge id', 'charge_id'),
+    'reference': ('paymentintent id', 'payment_intent', 'payment intent', 'order id', 'order_id'),
+    'amount': ('amount', 'gross', 'amount_value'),
+    'refunded': ('amount refunded', 'amount_refunded', 'refunded amount', 'refunded_amount'),
+    'refund_id': ('refund id', 'refund_id'),
+    'status': ('status',),
+    'created': ('created (utc)', 'created', 'date', 'create_time'),
+}
+
+STATUSES = {
+    'succeeded': 'completed', 'paid': 'completed', 'completed': 'completed', 'settled': 'completed',
+    'complete': 'completed',
+    'pending': 'pending', 'processing': 'pending',
+    'failed': 'failed', 'denied': 'failed', 'declined': 'failed', 'canceled': 'failed', 'cancelled': 'failed',
+    'refunded': 'refunded', 'partially refunded': 'refunded', 'reversed': 'refunded',
+}
+
+# (model, id field) pairs whose values identify a provider record, in order of preference
+LOOKUPS = {
+    'stripe': [(StripeTransaction, 'stripe_charge_id'), (Payment, 'transaction_id'),
+               (StripeTransaction, 'payment_intent_id')],
+    'paypal': [(Payment, 'transaction_id'), (PayPalTransaction, 'paypal_order_id')],
+    'venmo': [(VenmoTransaction, 'venmo_transaction_id'), (Payment, 'transaction_id')],
+}
+
+
+@dataclass
+class ProviderRecord:
+    id: str
+    reference: str = ''
+    amount: Decimal = None
+    refunded: Decimal = None
+    refund_id: str = ''
+    status: str = None
+    created: object = None
+
+
+@dataclass
+class Mismatch:
+    kind: str  # status, refund, amount, unknown or missing
+    record_id: str = ''
+    payment_id: int = None
+    ours: object = None
+    theirs: object = None
+
+
+@dataclass
+class ReconcileResult:
+    records: int = 0
+    matched: int = 0
+    updated: int = 0
+    mismatches: list = field(default_factory=list)
+
+    def count(self, kind):
+        return sum(1 for mismatch in self.mismatches if mismatch.kind == kind)
+
+
+def _decimal(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value).replace('$', '').replace(',', '').strip())
+    except InvalidOperation:
+        return None
+
+
+def _created(value):
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return datetime.datetime.fromtimestamp(int(value), tz=datetime.timezone.utc).date()
+    parsed = parse_datetime(value.replace(' ', 'T', 1)) or parse_date(value[:10])
+    return parsed.date() if hasattr(parsed, 'date') else parsed
+
+
+def normalise(row):
+    """A ProviderRecord from one export row (a dict keyed by column name)."""
+    row = {str(key).strip().lower(): value for key, value in row.items()}
+    values = {}
+    for name, aliases in COLUMNS.items():
+        values[name] = next((row[alias] for alias in aliases if row.get(alias) not in (None, '')), None)
+    refunded = _decimal(values['refunded'])
+    status = STATUSES.get(str(values['status'] or '').strip().lower())
+    if status == 'completed' and refunded:
+        status = 'refunded'
+    return ProviderRecord(
+        id=str(values['id'] or '').strip(), reference=str(values['reference'] or '').strip(),
+        amount=_decimal(values['amount']), refunded=refunded, refund_id=str(values['refund_id'] or '').strip(),
+        status=status, created=_created(values['created']),
+    )
+
+
+def parse_export(text, name=''):
+    """ProviderRecords from CSV, JSON (a list or {"data": [...]}) or JSON lines text."""
+    stripped = text.lstrip()
+    if name.endswith('.csv') or not stripped.startswith(('[', '{')):
+        rows = csv.DictReader(io.StringIO(text))
+    elif name.endswith('.jsonl') or (stripped.startswith('{') and '\n{' in stripped):
+        rows = (json.loads(line) for line in text.splitlines() if line.strip())
+    else:
+        data = json.loads(text)
+        rows = data.get('data', []) if isinstance(data, dict) else data
+    return [record for record in map(normalise, rows) if record.id]
+
+
+def load_export(source):
+    """ProviderRecords from a file path or an http(s) URL."""
+    if source.startswith(('http://', 'https://')):
+        import httpx
+
+        response = httpx.get(source, timeout=120, follow_redirects=True)
+        response.raise_for_status()
+        name = '.csv' if 'csv' in response.headers.get('content-type', '') else source
+        return parse_export(response.text, name)
+    with open(source, encoding='utf-8-sig') as f:
+        return parse_export(f.read(), source)
+
+
+def lookup_tables(provider):
+    """[(field name, {id: payment pk})] for the provider, see LOOKUPS."""
+    tables = []
+    for model, name in LOOKUPS[provider]:
+        queryset = model.objects.exclude(**{f'{name}__isnull': True}).exclude(**{name: ''})
+        if model is Payment:
+            queryset = queryset.filter(payment_method=provider)
+            tables.append((name, dict(queryset.values_list(name, 'pk').iterator(chunk_size=10000))))
+        else:
+            tables.append((name, dict(queryset.values_list(name, 'payment_id').iterator(chunk_size=10000))))
+    return tables
+
+
+def match(record, tables):
+    for name, table in tables:
+        for value in (record.id, record.reference):
+            if value and value in table:
+                return table[value]
+    return None
+
+
+def reconcile(provider, records, dry_run=False, batch_size=BATCH_SIZE):
+    """Compare records with our payments and correct statuses and refunds unless dry_run."""
+    result = ReconcileResult(records=len(records))
+    tables = lookup_tables(provider)
+    ours = _payment_states(provider, tables)
+
+    changes = defaultdict(dict)
+    seen = set()
+    for record in records:
+        pk = match(record, tables)
+        if pk is None or pk not in ours:
+            result.mismatches.append(Mismatch('unknown', record.id, theirs=record.status))
+            continue
+        seen.add(pk)
+        result.matched += 1
+        status, amount, refund_amount, refund_transaction_id, paid_on = ours[pk]
+
+        if record.amount is not None and record.amount != amount:
+            result.mismatches.append(Mismatch('amount', record.id, pk, amount, record.amount))
+        if record.status and record.status != status:
+            result.mismatches.append(Mismatch('status', record.id, pk, status, record.status))
+            changes[pk]['status'] = record.status
+        if record.refunded and record.refunded != refund_amount:
+            result.mismatches.append(Mismatch('refund', record.id, pk, refund_amount, record.refunded))
+            changes[pk]['refund_amount'] = record.refunded
+            if record.refund_id and record.refund_id != refund_transaction_id:
+                changes[pk]['refund_transaction_id'] = record.refund_id
+
+    # Payments the export should have covered but doesn't
+    dates = [record.created for record in records if record.created]
+    if dates:
+        first, last = min(dates), max(dates)
+        for pk, (status, amount, _, _, paid_on) in ours.items():
+            if pk not in seen and status != 'pending' and first <= timezone.localdate(paid_on) <= last:
+                result.mismatches.append(Mismatch('missing', payment_id=pk, ours=status))
+
+    if changes and not dry_run:
+        result.updated = apply_changes(changes, batch_size)
+    elif changes:
+        result.updated = len(changes)
+    return result
+
+
+def _payment_states(provider, tables):
+    """{pk: (status, amount, refund_amount, refund_transaction_id, payment_date)} for every matchable payment."""
+    matchable = set()
+    for _, table in tables:
+        matchable.update(table.values())
+    rows = (Payment.objects.filter(payment_method=provider)
+            .values_list('pk', 'status', 'amount', 'refund_amount', 'refund_transaction_id', 'payment_date')
+            .iterator(chunk_size=10000))
+    return {row[0]: row[1:] for row in rows if row[0] in matchable}
+
+
+def apply_changes(changes, batch_size=BATCH_SIZE):
+    """
+    Write {payment pk: {field: value}} in one transaction, recording history.
+    Payments getting the same values (typically a status) share a plain
+    UPDATE ... WHERE id IN (...), which is far cheaper than bulk_update()'s
+    per-row CASE; only one-off values (e.g. refund amounts) go through it.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        payments = Payment.objects.in_bulk(list(changes))
+        groups = defaultdict(list)
+        for pk, values in changes.items():
+            payment = payments[pk]
+            values = dict(values, updated_at=now)
+            if values.get('refund_amount') and not payment.refund_date:
+                values['refund_date'] = now
+            for name, value in values.items():
+                setattr(payment, name, value)
+            groups[tuple(sorted(values.items()))].append(payment)
+
+        singles = defaultdict(list)
+        for values, group in groups.items():
+            if len(group) == 1:
+                singles[tuple(name for name, _ in values)].append(group[0])
+                continue
+            for start in range(0, len(group), batch_size):
+                Payment.objects.filter(pk__in=[payment.pk for payment in group[start:start + batch_size]]) \
+                    .update(**dict(values))
+        for fields, group in singles.items():
+            Payment.objects.bulk_update(group, fields, batch_size=batch_size)
+        Payment.history.bulk_history_create(list(payments.values()), batch_size=batch_size)
+    return len(payments)
@@ -9,9 +9,11 @@ urlpatterns = [
     path('<int:pk>/', views.payment_detail, name='detail'),
     path('success/', views.payment_success, name='success'),
     path('cancel/', views.payment_cancel, name='cancel'),
-    path('webhook/', views.payment_webhook, name='webhook'),
+    path('webhook/<slug:provider>/', views.payment_webhook, name='webhook'),
     # Payment method specific paths
     path('paypal/create/<int:rental_id>/', views.paypal_create, name='paypal_create'),
+    path('paypal/return/', views.paypal_return, name='paypal_return'),
     path('stripe/create/<int:rental_id>/', views.stripe_create, name='stripe_create'),
+    path('stripe/capture/<int:payment_id>/', views.stripe_capture, name='stripe_capture'),
     path('venmo/create/<int:rental_id>/', views.venmo_create, name='venmo_create'),
 ]
\ No newline at end of file
@@ -1,20 +1,49 @@
+import logging
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
-from .models import Payment
+from . import checkout, webhooks
+from .gateways import GatewayError
+from .listing import PaymentFilterForm, filter_payments, keyset_page, payment_totals
+from .models import Payment, PayPalTransaction
+from music_rental.user_context import get_user_context
 from rentals.models import Rental
 
+logger = logging.getLogger(__name__)
+
 # Placeholder views for the payments app
 # These will be implemented more fully later
 
 @login_required
 def payment_list(request):
-    """View to display a list of all payments."""
-    payments = Payment.objects.all().order_by('-payment_date')
-    context = {'payments': payments}
+    """View to display a filterable list of payments, newest first (see listing.py)."""
+    form = PaymentFilterForm(request.GET or None)
+    payments = Payment.objects.select_related('rental__customer')
+    if form.is_valid():
+        payments = filter_payments(payments, form.cleaned_data)
+
+    page = keyset_page(payments, after=request.GET.get('after'), before=request.GET.get('before'))
+
+    def page_url(**cursor):
+        query = request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query.update(cursor)
+        return f"?{query.urlencode()}"
+
+    context = {
+        'form': form,
+        'payments': page.payments,
+        'totals': payment_totals(payments),
+        'next_url': page_url(after=page.next_cursor) if page.next_cursor else None,
+        'previous_url': page_url(before=page.previous_cursor) if page.previous_cursor else None,
+    }
     return render(request, 'payments/payment_list.html', context)
 
 @login_required
@@ -44,28 +73,86 @@ def payment_cancel(request):
 
 @csrf_exempt
 @require_POST
-def payment_webhook(request):
-    """Webhook endpoint for payment providers."""
-    # This would handle callbacks from payment providers
-    return HttpResponse(status=200)
+def payment_webhook(request, provider):
+    """
+    Webhook endpoint for payment providers. Verified deliveries are stored and
+    acknowledged; process_payment_events applies them (see webhooks.py).
+    """
+    try:
+        event, created = webhooks.receive(provider, request.body, request.headers)
+    except webhooks.WebhookError as e:
+        logger.warning("Rejected %s webhook: %s", provider, e)
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'received': event.event_id, 'duplicate': not created})
 
 # Payment method specific views
+def _checkout_rental(request, rental_id):
+    """The rental being paid for; customers can only pay their own."""
+    rental = get_object_or_404(Rental, pk=rental_id)
+    context = get_user_context(request)
+    if not (context.is_staff or context.is_staff_member or rental.customer_id == context.customer_id):
+        raise Http404
+    return rental
+
 @login_required
 def paypal_create(request, rental_id):
-    """Create a PayPal payment."""
-    rental = get_object_or_404(Rental, pk=rental_id)
-    # Placeholder implementation
+    """Create a PayPal order and send the customer to PayPal to approve it."""
+    rental = _checkout_rental(request, rental_id)
+    if request.method == 'POST':
+        try:
+            payment, result = checkout.start_checkout(
+                rental, 'paypal', return_url=request.build_absolute_uri(reverse('payments:paypal_return')),
+                cancel_url=request.build_absolute_uri(reverse('payments:cancel')))
+        except GatewayError as e:
+            logger.warning("PayPal checkout for rental %s failed: %s", rental.pk, e)
+            messages.error(request, "PayPal could not start the payment. Please try again or choose another method.")
+            return redirect('payments:paypal_create', rental_id=rental.pk)
+        return redirect(result.approve_url)
     context = {'rental': rental}
     return render(request, 'payments/paypal_create.html', context)
 
+@login_required
+def paypal_return(request):
+    """PayPal sends the customer back here after approving; the order is captured in the background."""
+    transaction = get_object_or_404(PayPalTransaction.objects.select_related('payment'),
+                                     paypal_order_id=request.GET.get('token', ''))
+    _checkout_rental(request, transaction.payment.rental_id)
+    checkout.schedule_capture(transaction.payment)
+    return redirect('payments:success')
+
 @login_required
 def stripe_create(request, rental_id):
-    """Create a Stripe payment."""
-    rental = get_object_or_404(Rental, pk=rental_id)
-    # Placeholder implementation
-    context = {'rental': rental}
+    """
+    Create a Stripe payment. GET shows the card form; POST authorises the
+    balance and answers with the client secret Stripe.js confirms the card with.
+    """
+    rental = _checkout_rental(request, rental_id)
+    if request.method == 'POST':
+        try:
+            payment, result = checkout.start_checkout(rental, 'stripe')
+        except GatewayError as e:
+            logger.warning("Stripe checkout for rental %s failed: %s", rental.pk, e)
+            return JsonResponse({'error': "The card payment could not be started."}, status=502)
+        return JsonResponse({
+            'payment_id': payment.pk,
+            'client_secret': result.client_secret,
+            'capture_url': reverse('payments:stripe_capture', args=[payment.pk]),
+        })
+    context = {
+        'rental': rental,
+        'publishable_key': settings.PAYMENT_GATEWAYS.get('stripe', {}).get('PUBLISHABLE_KEY', ''),
+    }
     return render(request, 'payments/stripe_create.html', context)
 
+@login_required
+@require_POST
+def stripe_capture(request, payment_id):
+    """Called once Stripe.js has confirmed the card; captures in the background."""
+    payment = get_object_or_404(Payment, pk=payment_id, payment_method='stripe')
+    _checkout_rental(request, payment.rental_id)
+    checkout.schedule_capture(payment)
+    return JsonResponse({'redirect_url': reverse('payments:success')})
+
 @login_required
 def venmo_create(request, rental_id):
     """Create a Venmo payment."""
@@ -0,0 +1,170 @@
+"""
+Receiving payment provider webhooks.
+
+A delivery is verified, stored as a PaymentEvent and acknowledged straight
+away; nothing else happens in the request. `manage.py process_payment_events`
+applies stored events to payments later (payments/events.py). The
+(provider, event_id) unique constraint makes a provider's retries harmless:
+the second copy is acknowledged and dropped.
+
+Each provider is verified its own way (VERIFIERS):
+
+- Stripe signs the body with the endpoint secret in PAYMENT_WEBHOOK_SECRETS:
+  Stripe-Signature is "t=<unix time>,v1=<hex HMAC-SHA256 of '<t>.<body>'>".
+- PayPal sends PayPal-Transmission-* headers, which are checked by PayPal's
+  verify-webhook-signature API through the gateway client
+  (payments/gateways.py), against PAYMENT_GATEWAYS['paypal']['WEBHOOK_ID'].
+
+Deliveries older than PAYMENT_WEBHOOK_TOLERANCE seconds are refused so a
+captured request can't be replayed later. Venmo has no webhook verification
+of its own (Venmo business payments reach us through PayPal), so the
+endpoint refuses venmo deliveries.
+
+Saved payloads in payments/fixtures/webhooks/ can be replayed locally with
+`manage.py replay_webhooks`.
+"""
+import datetime
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.datastructures import CaseInsensitiveMapping
+from django.utils.dateparse import parse_datetime
+
+from .models import PaymentEvent
+
+PROVIDERS = dict(PaymentEvent.PROVIDER_CHOICES)
+PAYPAL_HEADERS = ('PayPal-Auth-Algo', 'PayPal-Cert-Url', 'PayPal-Transmission-Id', 'PayPal-Transmission-Sig',
+                  'PayPal-Transmission-Time')
+
+
+class WebhookError(Exception):
+    """The delivery can't be accepted; the message says why."""
+
+
+def _secret(provider):
+    return getattr(settings, 'PAYMENT_WEBHOOK_SECRETS', {}).get(provider) or ''
+
+
+def _check_age(timestamp, now=None):
+    tolerance = getattr(settings, 'PAYMENT_WEBHOOK_TOLERANCE', 300)
+    if abs((time.time() if now is None else now) - timestamp) > tolerance:
+        raise WebhookError("Signature timestamp outside the allowed window")
+
+
+def _stripe_signature(body, timestamp):
+    return hmac.new(_secret('stripe').encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+
+
+def verify_stripe(body, headers, now=None):
+    if not _secret('stripe'):
+        raise WebhookError("No webhook secret configured for stripe")
+    try:
+        parts = dict(part.split('=', 1) for part in (headers.get('Stripe-Signature') or '').split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        raise WebhookError("Missing or malformed signature")
+    _check_age(timestamp, now)
+    if not hmac.compare_digest(_stripe_signature(body, timestamp), parts.get('v1', '')):
+        raise WebhookError("Signature does not match")
+
+
+def verify_paypal(body, headers, now=None):
+    from .gateways import GatewayError, get_gateway
+
+    if any(not headers.get(name) for name in PAYPAL_HEADERS):
+        raise WebhookError("Missing PayPal transmission headers")
+    sent = parse_datetime(headers['PayPal-Transmission-Time'])
+    if sent is None:
+        raise WebhookError("Malformed PayPal transmission time")
+    _check_age(sent.timestamp(), now)
+    try:
+        verified = get_gateway('paypal').verify_webhook(headers, json.loads(body))
+    except ValueError:
+        raise WebhookError("Body is not JSON")
+    except GatewayError as e:
+        raise WebhookError(f"PayPal verification failed: {e}")
+    if not verified:
+        raise WebhookError("Signature does not match")
+
+
+VERIFIERS = {
+    'stripe': verify_stripe,
+    'paypal': verify_paypal,
+}
+
+
+def verify(provider, body, headers, now=None):
+    """Check a delivery's signature; headers is the request's (case-insensitive) headers."""
+    if provider not in PROVIDERS:
+        raise WebhookError(f"Unknown provider {provider!r}")
+    if provider not in VERIFIERS:
+        raise WebhookError(f"Webhooks from {provider} can't be verified")
+    VERIFIERS[provider](body, CaseInsensitiveMapping(headers or {}), now)
+
+
+def sign(provider, body, timestamp=None):
+    """
+    Headers a provider would send with body (used by replay_webhooks and
+    tests). PayPal's only verify against the fake gateway (PAYMENT_GATEWAY_FAKE).
+    """
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    if provider == 'stripe':
+        return {'Stripe-Signature': f"t={timestamp},v1={_stripe_signature(body, timestamp)}"}
+    if provider == 'paypal':
+        from .fake_gateways import fake_transmission_sig
+
+        transmission_id = str(uuid.uuid4())
+        sent = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).isoformat()
+        webhook_id = getattr(settings, 'PAYMENT_GATEWAYS', {}).get('paypal', {}).get('WEBHOOK_ID', '')
+        return {
+            'PayPal-Auth-Algo': 'SHA256withRSA',
+            'PayPal-Cert-Url': 'https://api-m.sandbox.paypal.com/v1/notifications/certs/CERT-fake',
+            'PayPal-Transmission-Id': transmission_id,
+            'PayPal-Transmission-Sig': fake_transmission_sig(transmission_id, sent, webhook_id, json.loads(body)),
+            'PayPal-Transmission-Time': sent,
+        }
+    raise WebhookError(f"Webhooks from {provider} can't be signed")
+
+
+def event_identity(provider, payload):
+    """(event_id, event_type) of a delivery."""
+    if provider == 'paypal':
+        event_id, event_type = payload.get('id'), payload.get('event_type')
+    else:
+        event_id, event_type = payload.get('id'), payload.get('type')
+    if not event_id or not event_type:
+        raise WebhookError("Payload has no event id or type")
+    return str(event_id), str(event_type)
+
+
+def store(provider, body):
+    """
+    Store one delivery without verifying it (only for verified or locally
+    trusted payloads). Returns (event, created); created is False for a
+    redelivery of an event that is already stored.
+    """
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise WebhookError("Body is not JSON")
+    if not isinstance(payload, dict):
+        raise WebhookError("Body is not a JSON object")
+    event_id, event_type = event_identity(provider, payload)
+
+    try:
+        with transaction.atomic():
+            return PaymentEvent.objects.create(
+                provider=provider, event_id=event_id, event_type=event_type, payload=payload), True
+    except IntegrityError:
+        return PaymentEvent.objects.get(provider=provider, event_id=event_id), False
+
+
+def receive(provider, body, headers):
+    """Verify and store one delivery. Returns (event, created) as store() does."""
+    verify(provider, body, headers)
+    return store(provider, body)
@@ -2,6 +2,32 @@ from django.contrib import admin
 from django.utils.html import format_html
 from simple_history.admin import SimpleHistoryAdmin
 from .models import Customer, Rental, RentalItem, Contract
+from .bulk import bulk_transition_rentals
+
+
+def _transition_action(status, description):
+    @admin.action(description=description)
+    def action(modeladmin, request, queryset):
+        result = bulk_transition_rentals(queryset, status, user=request.user,
+                                         reason=f"Bulk action: {description.lower()}")
+        message = f"Updated {len(result.changed)} rental(s)."
+        if result.equipment_released:
+            message += f" {len(result.equipment_released)} equipment item(s) are available again."
+        modeladmin.message_user(request, message, level='SUCCESS')
+        if result.skipped:
+            modeladmin.message_user(
+                request,
+                f"Skipped {result.skipped} rental(s) that can't be marked {status}.",
+                level='WARNING',
+            )
+    action.__name__ = f"mark_{status}"
+    return action
+
+
+mark_active = _transition_action('active', 'Mark selected rentals as active')
+mark_overdue = _transition_action('overdue', 'Mark selected rentals as overdue')
+mark_completed = _transition_action('completed', 'Mark selected rentals as returned')
+mark_cancelled = _transition_action('cancelled', 'Cancel selected rentals')
 
 class RentalItemInline(admin.TabularInline):
     model = RentalItem
@@ -94,6 +120,7 @@ class RentalAdmin(SimpleHistoryAdmin):
     date_hierarchy = 'start_date'
     list_per_page = 20
     save_on_top = True
+    actions = [mark_active, mark_overdue, mark_completed, mark_cancelled]
     
     fieldsets = (
         ('Customer Information', {
@@ -186,9 +213,11 @@ class RentalAdmin(SimpleHistoryAdmin):
 
 @admin.register(Contract)
 class ContractAdmin(admin.ModelAdmin):
-    list_display = ('rental', 'customer_name', 'generated_on', 'download_link')
+    list_display = ('rental', 'customer_name', 'generated_on', 'rendered_at', 'download_link')
+    list_select_related = ('rental__customer',)
     search_fields = ('rental__customer__first_name', 'rental__customer__last_name')
-    readonly_fields = ('generated_on', 'preview_content')
+    readonly_fields = ('generated_on', 'rendered_at', 'content_hash', 'preview_content')
+    actions = ['rerender_contracts']
     
     def customer_name(self, obj):
         return obj.rental.customer
@@ -204,9 +233,17 @@ class ContractAdmin(admin.ModelAdmin):
         return format_html('<div style="max-height: 400px; overflow-y: auto; background-color: #1E1E1E; padding: 15px; border-radius: 5px;">{}</div>', obj.content)
     preview_content.short_description = "Contract Content"
     
+    @admin.action(description="Re-render selected contract PDFs")
+    def rerender_contracts(self, request, queryset):
+        from .contracts import render_contracts
+        rentals = Rental.objects.filter(contract__in=queryset)
+        results = list(render_contracts(rentals, force=True))
+        failed = sum(1 for _, _, error in results if error is not None)
+        self.message_user(request, f"Re-rendered {len(results) - failed} contracts, {failed} failed.")
+    
     fieldsets = (
         (None, {
-            'fields': ('rental', 'generated_on')
+            'fields': ('rental', 'generated_on', 'rendered_at', 'content_hash')
         }),
         ('Contract', {
             'fields': ('file', 'preview_content')
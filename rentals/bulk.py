@@ -0,0 +1,44 @@
+"""Bulk rental status changes, see music_rental/bulk_status.py."""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.bulk import release_equipment
+from music_rental.bulk_status import bulk_set_status
+
+from .models import Rental, RentalItem
+
+
+@dataclass
+class TransitionResult:
+    changed: list = field(default_factory=list)
+    skipped: int = 0
+    equipment_released: list = field(default_factory=list)
+
+
+def bulk_transition_rentals(queryset, status, user=None, reason=''):
+    """
+    Move rentals in queryset to status, following Rental.STATUS_TRANSITIONS.
+
+    Rentals that can't make the transition are skipped. Completing a rental
+    marks its items returned; completing or cancelling releases equipment
+    that isn't out on another open rental.
+    """
+    if status not in Rental.STATUS_TRANSITIONS:
+        raise ValueError(f"Unknown rental status: {status}")
+
+    now = timezone.now()
+    with transaction.atomic():
+        total = queryset.count()
+        changed = bulk_set_status(queryset, status, allowed_from=Rental.statuses_leading_to(status),
+                                  user=user, reason=reason, now=now)
+        result = TransitionResult(changed=changed, skipped=total - len(changed))
+
+        if changed and status in ('completed', 'cancelled'):
+            items = RentalItem.objects.filter(rental_id__in=changed)
+            equipment_ids = list(items.values_list('equipment_id', flat=True).distinct())
+            if status == 'completed':
+                items.filter(returned=False).update(returned=True, returned_date=now)
+            result.equipment_released = release_equipment(equipment_ids, user=user, reason=reason, now=now)
+    return result
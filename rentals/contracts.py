@@ -0,0 +1,294 @@
+"""
+Rental contract PDFs.
+
+A contract is rendered from the rental, its items and the customer's
+signature into a PDF (reportlab) and stored on Contract.file. The contract
+also records a fingerprint of everything that went into the PDF: the rental
+data, the terms template (rentals/contract_terms.txt) and CONTRACT_LAYOUT_VERSION.
+As long as the fingerprint still matches, the stored file is served as is;
+once the rental changes the next request queues a re-render in the
+background (music_rental/background.py). Only one render per rental is
+queued at a time (a cache key held until it finishes), and render_contract()
+locks the rental row, so concurrent renders of one contract run one after
+the other and the later one finds the file already current.
+
+After editing the terms template every contract is stale; re-render them up
+front with `manage.py render_contracts`.
+"""
+import base64
+import hashlib
+import json
+import logging
+from decimal import Decimal
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from music_rental.background import run_in_background
+
+from .models import Contract, Rental
+
+logger = logging.getLogger(__name__)
+
+TERMS_TEMPLATE = 'rentals/contract_terms.txt'
+# Bump when the PDF layout in build_pdf() changes
+CONTRACT_LAYOUT_VERSION = 1
+COMPANY_NAME = 'ROKNSOUND'
+# How long a queued render blocks queueing another for the same rental, in
+# case the task never runs (its transaction rolled back or the process died)
+RENDER_PENDING_TIMEOUT = 300
+
+
+def contract_queryset():
+    """Rentals with everything a contract needs, in as few queries as possible."""
+    return Rental.objects.select_related('customer', 'contract').prefetch_related('items__equipment')
+
+
+def _template_digest():
+    template = get_template(TERMS_TEMPLATE)
+    return hashlib.sha256(template.template.source.encode()).hexdigest()
+
+
+def _money(value):
+    return f"{Decimal(str(value)):.2f}"
+
+
+def contract_data(rental):
+    """Everything printed on the contract, as JSON-serialisable values."""
+    customer = rental.customer
+    return {
+        'rental': rental.pk,
+        'customer': {
+            'name': customer.get_full_name(),
+            'email': customer.email,
+            'phone': str(customer.phone),
+            'address': f"{customer.address}, {customer.city}, {customer.state} {customer.zip_code}",
+            'id': f"{customer.get_id_type_display()} {customer.id_number}",
+        },
+        'start_date': rental.start_date.isoformat(),
+        'end_date': rental.end_date.isoformat(),
+        'duration_type': rental.duration_type,
+        'total_price': _money(rental.total_price),
+        'deposit_total': _money(rental.deposit_total),
+        'notes': rental.notes,
+        'items': [
+            {
+                'name': item.equipment.name,
+                'brand': item.equipment.brand,
+                'serial': item.equipment.serial_number,
+                'quantity': item.quantity,
+                'price': _money(item.price),
+            }
+            for item in sorted(rental.items.all(), key=lambda item: item.pk)
+        ],
+        'signed': rental.contract_signed,
+        'signed_date': rental.contract_signed_date.isoformat() if rental.contract_signed_date else None,
+        'signature': hashlib.sha256(rental.contract_signature_data.encode()).hexdigest()
+        if rental.contract_signature_data else None,
+    }
+
+
+def contract_fingerprint(rental, template_digest=None):
+    payload = {
+        'layout': CONTRACT_LAYOUT_VERSION,
+        'template': template_digest or _template_digest(),
+        'data': contract_data(rental),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def existing_contract(rental):
+    try:
+        return rental.contract
+    except Contract.DoesNotExist:
+        return None
+
+
+def is_current(rental, template_digest=None):
+    """True if the stored PDF was rendered from the rental as it is now."""
+    contract = existing_contract(rental)
+    return bool(contract and contract.file and
+                contract.content_hash == contract_fingerprint(rental, template_digest))
+
+
+def render_terms(rental):
+    return render_to_string(TERMS_TEMPLATE, {
+        'rental': rental, 'start_date': rental.start_date, 'end_date': rental.end_date,
+    }).strip()
+
+
+def _signature_image(signature_data):
+    """Decode a canvas data URL (data:image/png;base64,...) to (bytes, width, height), or None."""
+    from PIL import Image
+
+    if not signature_data or not signature_data.startswith('data:image'):
+        return None
+    try:
+        data = base64.b64decode(signature_data.split(',', 1)[1])
+        with Image.open(BytesIO(data)) as image:
+            # Decode fully so a corrupt upload is dropped here rather than failing the render
+            image.load()
+            width, height = image.size
+    except Exception:
+        return None
+    return data, width, height
+
+
+def build_pdf(rental, terms):
+    """The contract as PDF bytes."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    from xml.sax.saxutils import escape
+
+    data = contract_data(rental)
+    styles = getSampleStyleSheet()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title=f'Rental Contract #{rental.pk}',
+                            leftMargin=0.75 * inch, rightMargin=0.75 * inch,
+                            topMargin=0.75 * inch, bottomMargin=0.75 * inch)
+
+    story = [
+        Paragraph(f'{COMPANY_NAME} Rental Contract #{rental.pk}', styles['Title']),
+        Paragraph(f"Customer: {escape(data['customer']['name'])}", styles['Normal']),
+        Paragraph(f"Address: {escape(data['customer']['address'])}", styles['Normal']),
+        Paragraph(f"Phone: {escape(data['customer']['phone'])} &nbsp; Email: {escape(data['customer']['email'])}",
+                  styles['Normal']),
+        Paragraph(f"ID: {escape(data['customer']['id'])}", styles['Normal']),
+        Spacer(1, 0.15 * inch),
+        Paragraph(f"Rental period: {rental.start_date:%B %d, %Y} to {rental.end_date:%B %d, %Y} "
+                  f"({rental.get_duration_type_display()})", styles['Normal']),
+        Spacer(1, 0.2 * inch),
+    ]
+
+    rows = [['Equipment', 'Brand', 'Serial', 'Qty', 'Price']]
+    for item in data['items']:
+        rows.append([Paragraph(escape(item['name']), styles['Normal']), item['brand'], item['serial'],
+                     item['quantity'], f"${item['price']}"])
+    rows.append(['', '', '', 'Total', f"${data['total_price']}"])
+    rows.append(['', '', '', 'Deposit', f"${data['deposit_total']}"])
+    table = Table(rows, colWidths=[2.6 * inch, 1.2 * inch, 1.3 * inch, 0.6 * inch, 1.0 * inch], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#333333')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -3), 0.25, colors.grey),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+    story += [table, Spacer(1, 0.25 * inch)]
+
+    if data['notes']:
+        story += [Paragraph(f"Notes: {escape(data['notes'])}", styles['Normal']), Spacer(1, 0.15 * inch)]
+
+    story.append(Paragraph('Terms and Conditions', styles['Heading2']))
+    for paragraph in terms.split('\n\n'):
+        story.append(Paragraph(escape(paragraph.strip()), styles['Normal']))
+        story.append(Spacer(1, 0.08 * inch))
+
+    story.append(Spacer(1, 0.3 * inch))
+    if rental.contract_signed:
+        signature = _signature_image(rental.contract_signature_data)
+        if signature is not None:
+            image, width, height = signature
+            scale = min(2.5 * inch / width, 0.8 * inch / height, 1)
+            story.append(Image(BytesIO(image), width=width * scale, height=height * scale, hAlign='LEFT'))
+        signed_on = timezone.localtime(rental.contract_signed_date) if rental.contract_signed_date else None
+        story.append(Paragraph(
+            f"Signed by {escape(data['customer']['name'])}"
+            + (f" on {signed_on:%B %d, %Y at %I:%M %p}" if signed_on else ''), styles['Normal']))
+    else:
+        story.append(Paragraph('Customer signature: ______________________________ &nbsp; Date: __________',
+                               styles['Normal']))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render_contract(rental, force=False, template_digest=None):
+    """
+    Render rental's contract if the stored one is missing or stale (or force)
+    and return the Contract. Holds a lock on the rental row throughout, so a
+    concurrent render of the same contract waits and then sees this one.
+    """
+    fingerprint = contract_fingerprint(rental, template_digest)
+    contract = existing_contract(rental)
+    if contract and contract.file and contract.content_hash == fingerprint and not force:
+        return contract
+
+    with transaction.atomic():
+        Rental.objects.select_for_update().filter(pk=rental.pk).exists()
+        # Re-read under the lock: another render may have stored it meanwhile
+        contract = Contract.objects.filter(rental_id=rental.pk).first()
+        if contract and contract.file and contract.content_hash == fingerprint and not force:
+            rental.contract = contract
+            return contract
+
+        terms = render_terms(rental)
+        pdf = build_pdf(rental, terms)
+        if contract is None:
+            contract = Contract(rental=rental)
+        old_name = contract.file.name if contract.file else None
+
+        contract.content = terms
+        contract.content_hash = fingerprint
+        contract.rendered_at = timezone.now()
+        contract.file.save(f'rental-{rental.pk}-{fingerprint[:12]}.pdf', ContentFile(pdf), save=False)
+        contract.save()
+        rental.contract = contract
+        if old_name and old_name != contract.file.name:
+            # Only once the new file is the one on record; a rollback keeps the old
+            storage = contract.file.storage
+            transaction.on_commit(lambda: storage.delete(old_name))
+    return contract
+
+
+def _pending_key(pk):
+    return f'contract-render-pending:{pk}'
+
+
+def _render_for_pk(pk):
+    try:
+        rental = contract_queryset().filter(pk=pk).first()
+        if rental is not None:
+            render_contract(rental)
+    finally:
+        cache.delete(_pending_key(pk))
+
+
+def schedule_contract_render(rental):
+    """
+    Queue a render of rental's contract once the current transaction commits,
+    unless one is already queued or running. Returns whether it was queued.
+    """
+    if not cache.add(_pending_key(rental.pk), 1, RENDER_PENDING_TIMEOUT):
+        return False
+    run_in_background(_render_for_pk, rental.pk)
+    return True
+
+
+def render_contracts(queryset, force=False, batch_size=100):
+    """
+    Re-render contracts for every rental in queryset that needs it. Yields
+    (rental, rendered, error) as it goes so callers can report progress;
+    one failing rental does not stop the rest.
+    """
+    digest = _template_digest()
+    queryset = queryset.select_related('customer', 'contract').prefetch_related('items__equipment')
+    for rental in queryset.order_by('pk').iterator(chunk_size=batch_size):
+        if not force and is_current(rental, digest):
+            yield rental, False, None
+            continue
+        try:
+            render_contract(rental, force=True, template_digest=digest)
+        except Exception as e:
+            logger.exception("Rendering the contract for rental %s failed", rental.pk)
+            yield rental, False, e
+        else:
+            yield rental, True, None
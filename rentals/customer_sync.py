@@ -0,0 +1,183 @@
+"""
+Keeping each customer-type user's Customer in step with their User and UserProfile.
+
+The Customer copies the name and email from the User and the contact details
+from the profile. The signal handlers in rentals/models.py call
+sync_customer() after a save that may have touched those fields. It compares
+first and writes only the fields that differ, so re-saving an unchanged user
+writes nothing (and logins skip it entirely). sync_customers() does the same
+for many users at once with bulk writes and history rows.
+
+For repairing drift in bulk (create_missing_customers, reconcile_customers)
+the differences are found in SQL first: missing_customers() and
+drifted_customers() are single queries, so only the rows that need work are
+loaded.
+"""
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+from users.models import CustomerProfile, UserProfile
+
+from .models import Customer
+
+# User / UserProfile field -> Customer field
+USER_FIELDS = {'first_name': 'first_name', 'last_name': 'last_name', 'email': 'email'}
+PROFILE_FIELDS = {'phone_number': 'phone', 'address': 'address', 'city': 'city', 'state': 'state',
+                  'zip_code': 'zip_code'}
+DERIVED_FIELDS = [*Customer.SEARCH_FIELDS, 'updated_at']
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def customer_values(user, profile):
+    """What the user's Customer fields should hold."""
+    values = {field: getattr(user, source) for source, field in USER_FIELDS.items()}
+    values.update({field: getattr(profile, source) for source, field in PROFILE_FIELDS.items()})
+    return values
+
+
+def changed_fields(customer, values):
+    return [field for field, value in values.items() if _text(getattr(customer, field)) != _text(value)]
+
+
+def new_customer(user, profile):
+    """An unsaved Customer for user, with placeholder ID details as at registration."""
+    customer = Customer(user=user, id_type='drivers_license', id_number=f"USER{user.id}",
+                        **customer_values(user, profile))
+    customer.update_search_fields()
+    return customer
+
+
+def _related(user, name):
+    try:
+        return getattr(user, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def sync_customer(user, create=True):
+    """
+    Bring user's Customer up to date, creating it if missing (and create).
+    Returns the Customer, or None for users who are not customers.
+    """
+    profile = _related(user, 'profile')
+    if profile is None or profile.user_type != 'customer':
+        return None
+
+    customer = _related(user, 'customer')
+    values = customer_values(user, profile)
+    if customer is None:
+        if not create:
+            return None
+        customer = new_customer(user, profile)
+        customer.save()
+        user.customer = customer
+        return customer
+
+    changed = changed_fields(customer, values)
+    if changed:
+        for field in changed:
+            setattr(customer, field, values[field])
+        customer.save(update_fields=changed + ['updated_at'])
+    return customer
+
+
+def sync_customers(users, create=True, batch_size=500, progress=None):
+    """
+    sync_customer() for every customer-type user in the users queryset, in
+    batches of batch_size with one bulk insert and one bulk update per batch.
+    progress(done, total) is called after each batch. Returns (created,
+    updated) counts.
+    """
+    users = (users.filter(profile__user_type='customer')
+             .select_related('profile', 'customer').order_by('pk'))
+    total = users.count() if progress else None
+    created = updated = seen = 0
+    to_create, to_update, fields = [], [], set()
+
+    def flush():
+        nonlocal created, updated
+        if progress:
+            progress(seen, total)
+        if to_create:
+            bulk_create_with_history(to_create, Customer, batch_size=batch_size)
+            created += len(to_create)
+        if to_update:
+            bulk_update_with_history(to_update, Customer, sorted(fields) + DERIVED_FIELDS, batch_size=batch_size)
+            updated += len(to_update)
+        to_create.clear()
+        to_update.clear()
+        fields.clear()
+
+    now = timezone.now()
+    for user in users.iterator(chunk_size=batch_size):
+        seen += 1
+        customer = _related(user, 'customer')
+        if customer is None:
+            if create:
+                to_create.append(new_customer(user, user.profile))
+        else:
+            values = customer_values(user, user.profile)
+            changed = changed_fields(customer, values)
+            if changed:
+                for field in changed:
+                    setattr(customer, field, values[field])
+                customer.update_search_fields()
+                customer.updated_at = now
+                fields.update(changed)
+                to_update.append(customer)
+        if len(to_create) + len(to_update) >= batch_size:
+            flush()
+    flush()
+    return created, updated
+
+
+def missing_customers():
+    """Customer-type users without a Customer (one anti-join)."""
+    return User.objects.filter(profile__user_type='customer', customer__isnull=True)
+
+
+def drifted_customers():
+    """Customers of customer-type users whose copied fields no longer match the user or profile."""
+    matching = {field: F(f'user__{source}') for source, field in USER_FIELDS.items()}
+    matching.update({field: F(f'user__profile__{source}') for source, field in PROFILE_FIELDS.items()})
+    return Customer.objects.filter(user__profile__user_type='customer').exclude(**matching)
+
+
+def create_missing_customers(batch_size=500, dry_run=False, progress=None):
+    """
+    Create a Customer, with history, for every customer-type user lacking one,
+    batch_size at a time. progress(done, total) is called after each batch.
+    Returns the number created (or that would be, with dry_run).
+    """
+    users = missing_customers().select_related('profile').order_by('pk')
+    total = users.count()
+    done = 0
+    last_pk = 0
+    # Walk by primary key so each batch is a fresh, bounded query
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        if not dry_run:
+            bulk_create_with_history([new_customer(user, user.profile) for user in batch], Customer,
+                                     batch_size=batch_size)
+        done += len(batch)
+        if progress:
+            progress(done, total)
+    return done
+
+
+def missing_customer_profiles():
+    """Customer-type profiles without their CustomerProfile."""
+    return UserProfile.objects.filter(user_type='customer', customer_info__isnull=True)
+
+
+def stale_customer_profiles():
+    """CustomerProfiles left behind on profiles that are no longer customers."""
+    return CustomerProfile.objects.exclude(user_profile__user_type='customer')
@@ -1,4 +1,5 @@
 from django import forms
+from django.urls import reverse_lazy
 from django.utils import timezone
 from .models import Customer, Rental, RentalItem
 from inventory.models import Equipment
@@ -45,13 +46,33 @@ class RentalForm(forms.ModelForm):
         if commit:
             instance.total_price = 0  # Will be calculated after rental items are added
             instance.deposit_total = 0  # Will be calculated after rental items are added
-            instance.save()
+            instance.save(validate=True)
         return instance
 
+class CustomerTypeaheadWidget(forms.Select):
+    """
+    Customer select that renders only the chosen customer; js/customer_typeahead.js
+    adds a search box that fills it from rentals:customer_search.
+    """
+    class Media:
+        js = ('js/customer_typeahead.js',)
+
+    def __init__(self, attrs=None):
+        super().__init__({'class': 'form-select', 'data-typeahead-url': reverse_lazy('rentals:customer_search'),
+                          **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [v for v in value if str(v).isdigit()]
+        self.choices = [('', '---------')] + [
+            (customer.pk, str(customer)) for customer in Customer.objects.filter(pk__in=selected)
+        ]
+        return super().optgroups(name, value, attrs)
+
 class StaffRentalForm(RentalForm):
     """Rental form for staff users that includes customer selection"""
     class Meta(RentalForm.Meta):
         fields = ['customer'] + RentalForm.Meta.fields
+        widgets = {**RentalForm.Meta.widgets, 'customer': CustomerTypeaheadWidget()}
 
 class RentalItemForm(forms.ModelForm):
     equipment = forms.ModelChoiceField(
@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rentals import customer_sync
+from users.models import CustomerProfile
+
+
+class Command(BaseCommand):
+    help = 'Repair drift between users, their profiles and their Customer records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drift without fixing it')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        def progress(label):
+            def report(done, total):
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{label}: {done}/{total}")
+            return report
+
+        missing_profiles = customer_sync.missing_customer_profiles()
+        stale_profiles = customer_sync.stale_customer_profiles()
+        drifted = customer_sync.drifted_customers()
+        counts = {
+            'customer profiles missing': missing_profiles.count(),
+            'customer profiles on non-customers': stale_profiles.count(),
+            'customers out of date': drifted.count(),
+        }
+
+        if not dry_run:
+            with transaction.atomic():
+                profiles = list(missing_profiles.values_list('pk', flat=True))
+                CustomerProfile.objects.bulk_create(
+                    [CustomerProfile(user_profile_id=pk) for pk in profiles], batch_size=batch_size)
+                stale_profiles.delete()
+            customer_sync.sync_customers(User.objects.filter(customer__in=drifted), create=False,
+                                         batch_size=batch_size, progress=progress('customers updated'))
+        counts['customers missing'] = customer_sync.create_missing_customers(
+            batch_size=batch_size, dry_run=dry_run, progress=progress('customers created'))
+
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+        summary = ', '.join(f"{count} {label}" for label, count in counts.items())
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Dry run: {summary}, nothing changed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {summary}"))
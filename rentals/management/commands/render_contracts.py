@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from rentals.contracts import render_contracts
+from rentals.models import Rental
+
+
+class Command(BaseCommand):
+    help = 'Render contract PDFs that are missing or out of date (e.g. after changing the contract template)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--id', type=int, action='append', help='Rental ID to render (repeatable)')
+        parser.add_argument('--status', type=str, action='append', help='Only rentals with this status (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Re-render contracts that are already up to date')
+        parser.add_argument('--batch-size', type=int, default=100, help='Rentals loaded per query')
+
+    def handle(self, *args, **options):
+        rentals = Rental.objects.all()
+        if options['id']:
+            rentals = rentals.filter(id__in=options['id'])
+        if options['status']:
+            rentals = rentals.filter(status__in=options['status'])
+
+        rendered = current = failed = 0
+        for rental, was_rendered, error in render_contracts(rentals, force=options['force'],
+                                                             batch_size=options['batch_size']):
+            if error is not None:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"Failed for rental #{rental.id}: {error}"))
+            elif was_rendered:
+                rendered += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"Rendered contract for rental #{rental.id}")
+            else:
+                current += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} contracts, {current} already up to date, {failed} failed"))
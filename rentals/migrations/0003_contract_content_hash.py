@@ -0,0 +1,23 @@
+# Generated by Django 4.2.11 on 2026-10-19 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0002_rentalitem_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='rendered_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
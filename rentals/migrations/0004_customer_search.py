@@ -0,0 +1,64 @@
+# Generated by Django 4.2.11 on 2026-10-19 18:33
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalize(value):
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    return ' '.join(''.join(char for char in value if not unicodedata.combining(char)).lower().split())
+
+
+def fill_search_columns(apps, schema_editor):
+    Customer = apps.get_model('rentals', 'Customer')
+    batch = []
+    for customer in Customer.objects.only('first_name', 'last_name', 'email', 'phone').iterator(chunk_size=1000):
+        phone = ''.join(char for char in str(customer.phone or '') if char.isdigit())
+        customer.search_text = _normalize(
+            f"{customer.first_name} {customer.last_name} {customer.email} {phone}")[:255]
+        customer.search_last_first = _normalize(f"{customer.last_name} {customer.first_name}")[:255]
+        batch.append(customer)
+        if len(batch) == 1000:
+            Customer.objects.bulk_update(batch, ['search_text', 'search_last_first'])
+            batch = []
+    Customer.objects.bulk_update(batch, ['search_text', 'search_last_first'])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Substring matching on PostgreSQL; other databases use the plain indexes for prefixes."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in ('search_text', 'search_last_first'):
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS rentals_customer_{column}_trgm '
+                              f'ON rentals_customer USING gin ({column} gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in ('search_text', 'search_last_first'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS rentals_customer_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0003_contract_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='search_last_first',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_text',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-19 19:16
+
+from django.db import migrations, models
+
+
+def fill_contact_columns(apps, schema_editor):
+    Customer = apps.get_model('rentals', 'Customer')
+    batch = []
+    for customer in Customer.objects.only('email', 'phone').iterator(chunk_size=1000):
+        national = getattr(customer.phone, 'national_number', None)
+        customer.search_email = ' '.join(str(customer.email or '').lower().split())[:254]
+        customer.search_phone = str(national) if national else \
+            ''.join(char for char in str(customer.phone or '') if char.isdigit())[:32]
+        batch.append(customer)
+        if len(batch) == 1000:
+            Customer.objects.bulk_update(batch, ['search_email', 'search_phone'])
+            batch = []
+    Customer.objects.bulk_update(batch, ['search_email', 'search_phone'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0004_customer_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='search_email',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_phone',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32),
+        ),
+        migrations.RunPython(fill_contact_columns, migrations.RunPython.noop),
+    ]
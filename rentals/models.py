@@ -8,9 +8,14 @@ from inventory.models import Equipment
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from music_rental.model_mixins import DirtyFieldsMixin
 import uuid
 
 class Customer(models.Model):
+    # The normalized lookup columns below
+    SEARCH_FIELDS = ['search_text', 'search_last_first', 'search_email', 'search_phone']
+    
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -30,60 +35,65 @@ class Customer(models.Model):
     id_image = models.ImageField(upload_to='customer_ids/', blank=True, null=True)
     notes = models.TextField(blank=True)
     
+    # Normalized copies for customer lookups (rentals/search.py), set in save()
+    search_text = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    search_last_first = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
+    search_email = models.CharField(max_length=254, blank=True, editable=False, db_index=True)
+    search_phone = models.CharField(max_length=32, blank=True, editable=False, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    history = HistoricalRecords()
+    history = HistoricalRecords(excluded_fields=SEARCH_FIELDS)
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
     
+    def update_search_fields(self):
+        """Refresh the normalized lookup columns; call before bulk_create(), which skips save()."""
+        from .search import customer_search_fields
+        
+        self.search_text, self.search_last_first, self.search_email, self.search_phone = customer_search_fields(self)
+    
+    def save(self, *args, **kwargs):
+        self.update_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(self.SEARCH_FIELDS)
+        super().save(*args, **kwargs)
+    
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
     
     def get_absolute_url(self):
         return reverse('rentals:customer_detail', args=[str(self.id)])
 
-# Signal to create Customer record when a User is created or updated
+# Keep the Customer record in step with its User (see rentals/customer_sync.py)
 @receiver(post_save, sender=User)
-def create_or_update_customer(sender, instance, created, **kwargs):
+def create_or_update_customer(sender, instance, created, update_fields=None, **kwargs):
     """
     Create or update a Customer record when a User registers or is updated.
     This links the User auth system with the Rental customer records.
     """
-    # Only proceed if the user has a profile and is a customer type
-    if hasattr(instance, 'profile') and instance.profile.user_type == 'customer':
-        # Check if a customer record already exists for this user
-        customer, created = Customer.objects.get_or_create(
-            user=instance,
-            defaults={
-                'first_name': instance.first_name,
-                'last_name': instance.last_name,
-                'email': instance.email,
-                'phone': getattr(instance.profile, 'phone_number', ''),
-                'address': getattr(instance.profile, 'address', ''),
-                'city': getattr(instance.profile, 'city', ''),
-                'state': getattr(instance.profile, 'state', ''),
-                'zip_code': getattr(instance.profile, 'zip_code', ''),
-                'id_type': 'drivers_license',  # Default value
-                'id_number': f"USER{instance.id}",  # Default value
-            }
-        )
-        
-        # If customer exists but user info was updated, update the customer record too
-        if not created:
-            customer.first_name = instance.first_name
-            customer.last_name = instance.last_name
-            customer.email = instance.email
-            if hasattr(instance, 'profile'):
-                if hasattr(instance.profile, 'phone_number'):
-                    customer.phone = instance.profile.phone_number
-                customer.address = instance.profile.address
-                customer.city = instance.profile.city
-                customer.state = instance.profile.state
-                customer.zip_code = instance.profile.zip_code
-            customer.save()
+    from .customer_sync import USER_FIELDS, sync_customer
+    
+    # Saves that touch no copied field, such as the last_login update on every login
+    if update_fields is not None and not set(update_fields) & USER_FIELDS.keys():
+        return
+    sync_customer(instance)
+
+@receiver(post_save, sender='users.UserProfile')
+def update_customer_from_profile(sender, instance, created, **kwargs):
+    """
+    Copy changed contact details from a saved profile to an existing Customer,
+    and create the Customer when the profile has just become a customer.
+    """
+    from .customer_sync import PROFILE_FIELDS, sync_customer
+    
+    dirty = instance.get_dirty_fields()
+    if not created and dirty.keys() & (PROFILE_FIELDS.keys() | {'user_type'}):
+        sync_customer(instance.user, create='user_type' in dirty and instance.user_type == 'customer')
 
-class Rental(models.Model):
+class Rental(DirtyFieldsMixin, models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
         ('active', 'Active'),
@@ -92,6 +102,18 @@ class Rental(models.Model):
         ('cancelled', 'Cancelled'),
     )
     
+    # Statuses each status may move to; completed and cancelled are final
+    STATUS_TRANSITIONS = {
+        'pending': ('active', 'cancelled'),
+        'active': ('overdue', 'completed', 'cancelled'),
+        'overdue': ('active', 'completed', 'cancelled'),
+        'completed': (),
+        'cancelled': (),
+    }
+    
+    # Rentals whose equipment is still out (or reserved)
+    OPEN_STATUSES = ('pending', 'active', 'overdue')
+    
     DURATION_TYPE_CHOICES = (
         ('daily', 'Daily'),
         ('weekly', 'Weekly'),
@@ -125,15 +147,25 @@ class Rental(models.Model):
     def get_absolute_url(self):
         return reverse('rentals:rental_detail', args=[str(self.id)])
     
+    @classmethod
+    def statuses_leading_to(cls, status):
+        """Statuses from which a rental may move to status."""
+        return [source for source, targets in cls.STATUS_TRANSITIONS.items() if status in targets]
+    
+    def can_transition_to(self, status):
+        return status in self.STATUS_TRANSITIONS.get(self.status, ())
+    
     def is_active(self):
         return self.status == 'active'
     
     def is_overdue(self):
-        print(f"Checking overdue: end_date={self.end_date}, today={timezone.now().date()}, status={self.status}")
         return self.end_date < timezone.now().date() and self.status == 'active'
     
     def mark_as_returned(self):
-        for item in self.items.all():
+        # Checked before any equipment is touched; returning twice is harmless
+        if self.status != 'completed' and not self.can_transition_to('completed'):
+            raise ValidationError({'status': f"A {self.get_status_display().lower()} rental cannot be returned"})
+        for item in self.items.select_related('equipment'):
             equipment = item.equipment
             equipment.status = 'available'
             equipment.save()
@@ -146,7 +178,7 @@ class Rental(models.Model):
         return total
     
     def calculate_deposit_total(self):
-        total = sum(item.equipment.deposit_amount * item.quantity for item in self.items.all())
+        total = sum(item.equipment.deposit_amount * item.quantity for item in self.items.select_related('equipment'))
         return total
         
     @property
@@ -160,14 +192,62 @@ class Rental(models.Model):
         return self.total_price - self.amount_paid
     
     def clean(self):
-        """Validate that end_date is not before start_date"""
+        """Validate that end_date is not before start_date and the status change is allowed"""
         if self.end_date and self.start_date and self.end_date < self.start_date:
-            from django.core.exceptions import ValidationError
             raise ValidationError("End date cannot be before start date")
+        error = self.status_change_error()
+        if error:
+            raise ValidationError({'status': error})
     
-    def save(self, *args, **kwargs):
-        """Call clean() before saving"""
-        self.full_clean()
+    def status_change_error(self, dirty=None):
+        """
+        Why the status can't move from its loaded value (see STATUS_TRANSITIONS),
+        or None. dirty is get_dirty_fields(), if the caller already has it.
+        """
+        if dirty is None:
+            dirty = self.get_dirty_fields()
+        if self._state.adding or 'status' not in dirty or dirty['status'] == self.status:
+            return None
+        if self.status not in self.STATUS_TRANSITIONS.get(dirty['status'], ()):
+            return f"A {dirty['status']} rental cannot become {self.status}"
+        return None
+    
+    def validate_changes(self):
+        """
+        Run only the checks that depend on what changed since the rental was
+        loaded: date order when a date moved, STATUS_TRANSITIONS when the status
+        did. Unlike full_clean() this never queries the database.
+        """
+        dirty = self.get_dirty_fields()
+        
+        def changed(*names):
+            return self._state.adding or any(name in dirty for name in names)
+        
+        if changed('start_date', 'end_date') and self.end_date and self.start_date \
+                and self.end_date < self.start_date:
+            raise ValidationError("End date cannot be before start date")
+        errors = {}
+        if changed('status'):
+            error = self.status_change_error(dirty)
+            if self.status not in self.STATUS_TRANSITIONS:
+                errors['status'] = f"Unknown status {self.status!r}"
+            elif error:
+                errors['status'] = error
+        if changed('duration_type') and self.duration_type not in dict(self.DURATION_TYPE_CHOICES):
+            errors['duration_type'] = f"Unknown duration type {self.duration_type!r}"
+        if errors:
+            raise ValidationError(errors)
+    
+    def save(self, *args, validate=False, **kwargs):
+        """
+        Check the changed fields before saving; validate=True runs the full
+        full_clean(), which includes the status transition check (form and
+        other user input paths).
+        """
+        if validate:
+            self.full_clean()
+        else:
+            self.validate_changes()
         super().save(*args, **kwargs)
 
 class RentalItem(models.Model):
@@ -198,6 +278,9 @@ class Contract(models.Model):
     content = models.TextField()
     generated_on = models.DateTimeField(auto_now_add=True)
     file = models.FileField(upload_to='contracts/', blank=True, null=True)
+    # Fingerprint of the rental data and template the file was rendered from, see rentals/contracts.py
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    rendered_at = models.DateTimeField(blank=True, null=True, editable=False)
     
     def __str__(self):
         return f"Contract for Rental #{self.rental.id}"
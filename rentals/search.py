@@ -0,0 +1,92 @@
+"""
+Customer lookup for the staff typeahead and the rental list search.
+
+Customer.search_text holds a normalized copy of the name, email and phone
+digits (lower case, accents stripped, single spaces) and
+Customer.search_last_first the name the other way round;
+Customer.search_email and Customer.search_phone (national number digits)
+hold the contact details on their own. All are kept up to date in
+Customer.save(). On PostgreSQL the name columns have trigram indexes, so
+any substring matches; elsewhere the ordinary indexes serve prefix matches
+on either name order. On every backend the email and phone columns match by
+prefix, phone queries as typed (punctuation, "+" country code) included.
+"""
+import re
+import unicodedata
+
+import phonenumbers
+from django.db import connection
+from django.db.models import Q
+
+from .models import Customer
+
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+# Queries made only of these characters are phone numbers as typed
+PHONE_QUERY = re.compile(r'^[\d\s()+.-]+$')
+
+
+def normalize_search_text(value):
+    """Lower-case, accent-free, single-spaced text for the search columns."""
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.lower().split())
+
+
+def _digits(value):
+    return ''.join(char for char in str(value or '') if char.isdigit())
+
+
+def _phone_prefix(text):
+    """National number digits of a (possibly partial) phone query; "+1 212" gives "212"."""
+    if text.startswith('+'):
+        try:
+            return str(phonenumbers.parse(text).national_number)
+        except phonenumbers.NumberParseException:
+            pass
+    return _digits(text)
+
+
+def customer_search_fields(customer):
+    """Values for Customer.search_text, search_last_first, search_email and search_phone."""
+    national = getattr(customer.phone, 'national_number', None)
+    return (
+        normalize_search_text(
+            f"{customer.first_name} {customer.last_name} {customer.email} {_digits(customer.phone)}")[:255],
+        normalize_search_text(f"{customer.last_name} {customer.first_name}")[:255],
+        normalize_search_text(customer.email)[:254],
+        str(national) if national else _digits(customer.phone)[:32],
+    )
+
+
+def _prefix(field, text):
+    # A range rather than LIKE so any backend can answer it from the index
+    return Q(**{f'{field}__gte': text, f'{field}__lt': text + '\uffff'})
+
+
+def search_customers(query):
+    """Customers matching query, by name, email, phone or exact id, in name order."""
+    text = normalize_search_text(query)
+    if not text:
+        return Customer.objects.none()
+
+    if connection.vendor == 'postgresql':
+        matches = Q(search_text__contains=text) | Q(search_last_first__contains=text)
+    else:
+        matches = _prefix('search_text', text) | _prefix('search_last_first', text)
+    matches |= _prefix('search_email', text)
+    if PHONE_QUERY.match(text) and len(_digits(text)) >= 3:
+        matches |= _prefix('search_phone', _phone_prefix(text))
+    if text.isdigit():
+        matches |= Q(pk=int(text))
+    return Customer.objects.filter(matches).order_by('last_name', 'first_name', 'pk')
+
+
+def typeahead_results(query, limit=TYPEAHEAD_LIMIT):
+    """The first limit matches as plain dicts, reading only the columns shown."""
+    limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+    rows = search_customers(query).values('pk', 'first_name', 'last_name', 'email')[:limit]
+    return [
+        {'id': row['pk'], 'text': f"{row['first_name']} {row['last_name']}", 'email': row['email']}
+        for row in rows
+    ]
@@ -1,14 +1,17 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.db.models import Q
 from django.core.paginator import Paginator
 from django.utils import timezone
+from . import contracts
+from .search import TYPEAHEAD_LIMIT, search_customers, typeahead_results
 from .models import Rental, RentalItem, Customer
 from .forms import RentalForm, RentalItemForm, CustomerForm, ReturnRentalItemForm, ContractSignatureForm, StaffRentalForm, StaffRentalItemForm
 from inventory.models import Equipment
 from inventory.utils import log_search_query
+from music_rental.user_context import get_user_context
 from decimal import Decimal
 
 # Rental list and detail views remain unchanged
@@ -28,10 +31,10 @@ def rental_list(request):
         rentals_list = Rental.objects.all().order_by('-start_date')
     else:
         # For regular users, show only their own rentals
-        try:
-            customer = Customer.objects.get(user=request.user)
-            rentals_list = Rental.objects.filter(customer=customer).order_by('-start_date')
-        except Customer.DoesNotExist:
+        customer_id = get_user_context(request).customer_id
+        if customer_id:
+            rentals_list = Rental.objects.filter(customer_id=customer_id).order_by('-start_date')
+        else:
             rentals_list = Rental.objects.none()
     
     # Apply status filter if provided
@@ -40,12 +43,10 @@ def rental_list(request):
     
     # Apply search filter if provided
     if search_query:
-        rentals_list = rentals_list.filter(
-            Q(customer__first_name__icontains=search_query) | 
-            Q(customer__last_name__icontains=search_query) | 
-            Q(customer__email__icontains=search_query) |
-            Q(id__icontains=search_query)
-        )
+        matches = Q(customer__in=search_customers(search_query))
+        if search_query.strip().isdigit():
+            matches |= Q(id=int(search_query))
+        rentals_list = rentals_list.filter(matches)
         
         # Log the search query
         log_search_query(
@@ -70,6 +71,17 @@ def rental_list(request):
     
     return render(request, 'rentals/rental_list.html', context)
 
+@login_required
+def customer_search(request):
+    """Typeahead matches for the staff customer picker, as JSON."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'status': 'error', 'message': 'Staff only'}, status=403)
+    try:
+        limit = int(request.GET.get('limit', TYPEAHEAD_LIMIT))
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+    return JsonResponse({'results': typeahead_results(request.GET.get('q', ''), limit)})
+
 @login_required
 def rental_detail(request, pk):
     """View to display details of a specific rental."""
@@ -111,8 +123,8 @@ def rental_create(request):
             # For non-staff users, automatically set the customer to their own customer record
             if not is_staff:
                 try:
-                    # Try to get the customer record linked to the user
-                    rental.customer = Customer.objects.get(user=request.user)
+                    # The customer record linked to the user, loaded with request.user
+                    rental.customer = request.user.customer
                 except Customer.DoesNotExist:
                     messages.error(request, "You don't have a customer profile. Please contact the staff.")
                     return redirect('home')  # Changed from 'index' to 'home'
@@ -121,7 +133,7 @@ def rental_create(request):
             rental.total_price = Decimal('0.00')
             rental.deposit_total = Decimal('0.00')
             
-            rental.save()
+            rental.save(validate=True)
             messages.success(request, f'Rental created! Now add equipment items.')
             
             # If we have an equipment ID from query params, redirect to add_rental_item with that equipment pre-selected
@@ -244,7 +256,7 @@ def add_rental_item(request, pk):
 def remove_rental_item(request, rental_pk, item_pk):
     """Remove an item from a rental."""
     rental = get_object_or_404(Rental, pk=rental_pk)
-    item = get_object_or_404(RentalItem, pk=item_pk, rental=rental)
+    item = get_object_or_404(RentalItem.objects.select_related('equipment'), pk=item_pk, rental=rental)
     
     if request.method == 'POST':
         # Update equipment status back to available
@@ -270,8 +282,12 @@ def rental_return(request, pk):
     rental = get_object_or_404(Rental, pk=pk)
 
     if request.method == 'POST':
+        if not rental.can_transition_to('completed'):
+            messages.error(request, f'A {rental.get_status_display().lower()} rental cannot be returned.')
+            return redirect('rentals:rental_detail', pk=rental.id)
+        
         # Inspect returned equipment
-        for item in rental.items.all():
+        for item in rental.items.select_related('equipment'):
             item.returned = True
             item.returned_date = timezone.now()
             item.save()
@@ -302,6 +318,9 @@ def rental_cancel(request, pk):
     """View to cancel a rental."""
     rental = get_object_or_404(Rental, pk=pk)
     if request.method == 'POST':
+        if not rental.can_transition_to('cancelled'):
+            messages.error(request, f'A {rental.get_status_display().lower()} rental cannot be cancelled.')
+            return redirect('rentals:rental_detail', pk=rental.id)
         rental.status = 'cancelled'
         rental.save()
         messages.success(request, f'Rental #{rental.id} has been cancelled.')
@@ -310,20 +329,78 @@ def rental_cancel(request, pk):
     context = {'rental': rental}
     return render(request, 'rentals/rental_cancel.html', context)
 
+def _can_view_contract(request, rental):
+    is_staff = request.user.is_staff or request.user.is_superuser
+    is_owner = hasattr(request.user, 'customer') and request.user.customer == rental.customer
+    return is_staff or is_owner
+
 @login_required
 def rental_contract(request, pk):
-    """View to generate a rental contract."""
-    rental = get_object_or_404(Rental, pk=pk)
-    # Placeholder implementation
-    context = {'rental': rental}
+    """View a rental contract; queues the PDF if it is missing or out of date."""
+    rental = get_object_or_404(contracts.contract_queryset(), pk=pk)
+    if not _can_view_contract(request, rental):
+        messages.error(request, "You don't have permission to view this contract.")
+        return redirect('rentals:rental_list')
+
+    pdf_ready = contracts.is_current(rental)
+    if not pdf_ready:
+        contracts.schedule_contract_render(rental)
+
+    context = {
+        'rental': rental,
+        'items': rental.items.all(),
+        'terms': contracts.render_terms(rental),
+        'pdf_ready': pdf_ready,
+    }
     return render(request, 'rentals/rental_contract.html', context)
 
+@login_required
+def rental_contract_pdf(request, pk):
+    """Serve the stored contract PDF while it matches the rental."""
+    rental = get_object_or_404(contracts.contract_queryset(), pk=pk)
+    if not _can_view_contract(request, rental):
+        messages.error(request, "You don't have permission to view this contract.")
+        return redirect('rentals:rental_list')
+
+    if not contracts.is_current(rental):
+        contracts.schedule_contract_render(rental)
+        context = {'rental': rental}
+        return render(request, 'rentals/rental_contract_pending.html', context, status=202)
+
+    contract = rental.contract
+    return FileResponse(contract.file.open('rb'), content_type='application/pdf',
+                        filename=f'rental-contract-{rental.id}.pdf')
+
 @login_required
 def rental_sign(request, pk):
     """View to handle signing a rental contract."""
-    rental = get_object_or_404(Rental, pk=pk)
-    # Placeholder implementation
-    context = {'rental': rental}
+    rental = get_object_or_404(contracts.contract_queryset(), pk=pk)
+    if not _can_view_contract(request, rental):
+        messages.error(request, "You don't have permission to sign this contract.")
+        return redirect('rentals:rental_list')
+    if rental.contract_signed:
+        messages.info(request, f'The contract for rental #{rental.id} is already signed.')
+        return redirect('rentals:rental_contract', pk=rental.id)
+
+    if request.method == 'POST':
+        form = ContractSignatureForm(request.POST)
+        if form.is_valid():
+            rental.contract_signed = True
+            rental.contract_signed_date = timezone.now()
+            rental.contract_signature_data = form.cleaned_data['signature']
+            rental.save()
+            contracts.schedule_contract_render(rental)
+            messages.success(request, f'The contract for rental #{rental.id} has been signed.')
+            return redirect('rentals:rental_contract', pk=rental.id)
+    else:
+        form = ContractSignatureForm()
+
+    context = {
+        'rental': rental,
+        'items': rental.items.all(),
+        'terms': contracts.render_terms(rental),
+        'form': form,
+    }
     return render(request, 'rentals/rental_sign.html', context)
 
 @login_required
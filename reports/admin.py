@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from .models import ReportWatermark
+
+
+@admin.register(ReportWatermark)
+class ReportWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    readonly_fields = ('updated_at',)
@@ -0,0 +1,171 @@
+"""
+Daily fact table behind the utilization and revenue reports.
+
+EquipmentDailyFact holds one row per equipment item per day it was out on a
+rental: units out, the rental revenue attributed to that day (each item's
+price spread evenly over its rental's days) and the rental items that started
+that day. Reports then only need SUM()s over a date range.
+
+Facts are maintained incrementally. A ReportWatermark records when the last
+refresh ran; the next one finds rentals changed since then (Rental.updated_at,
+plus history rows so deletions and date changes are seen), works out every date
+any version of those rentals covered, and rebuilds just that window. Adding or
+removing items bumps the rental's updated_at (see reports/models.py). Each
+fact also carries a copy of its equipment's category. When an item changed
+since the last refresh now has a different category, its facts are moved
+to the new one in place (recategorize_facts).
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Min, OuterRef, Q, Subquery, Sum
+from inventory.models import Equipment
+from django.utils import timezone
+from rentals.models import Rental, RentalItem
+
+from .models import EquipmentDailyFact, ReportWatermark
+
+WATERMARK = 'equipment_daily_facts'
+# Rentals whose equipment actually went out
+COUNTED_STATUSES = ('active', 'overdue', 'completed')
+# Re-read changes this far behind the watermark, for transactions that
+# committed after the last refresh started. Rebuilding a window is idempotent.
+REFRESH_OVERLAP = timedelta(minutes=5)
+CENT = Decimal('0.01')
+
+
+@dataclass
+class RefreshResult:
+    start: object = None
+    end: object = None
+    facts: int = 0
+    recategorized: int = 0
+
+
+def rental_days(start_date, end_date):
+    """Length of a rental in days, counting both the start and end date."""
+    return (end_date - start_date).days + 1
+
+
+def _date_bounds(queryset):
+    bounds = queryset.aggregate(start=Min('start_date'), end=Max('end_date'))
+    return bounds['start'], bounds['end']
+
+
+def _merge(window, other):
+    if other[0] is None:
+        return window
+    if window[0] is None:
+        return other
+    return min(window[0], other[0]), max(window[1], other[1])
+
+
+def changed_window(since):
+    """First and last date covered by any version of a rental changed after since."""
+    HistoricalRental = Rental.history.model
+    changed = (Q(id__in=Rental.objects.filter(updated_at__gt=since).values('pk')) |
+               Q(id__in=HistoricalRental.objects.filter(history_date__gt=since).values('id')))
+    # Old versions cover dates the rental has since moved away from
+    window = _date_bounds(HistoricalRental.objects.filter(changed))
+    return _merge(window, _date_bounds(Rental.objects.filter(changed)))
+
+
+def recategorize_facts(since):
+    """
+    Move the facts of equipment changed after since to its current category.
+    Returns the number of facts updated.
+    """
+    current = Equipment.objects.filter(pk=OuterRef('equipment_id')).values('category_id')
+    return (EquipmentDailyFact.objects
+            .filter(equipment__updated_at__gt=since)
+            .exclude(category_id=F('equipment__category_id'))
+            .update(category_id=Subquery(current)))
+
+
+def full_window():
+    return _date_bounds(Rental.objects.filter(status__in=COUNTED_STATUSES))
+
+
+def build_facts(start, end):
+    """
+    EquipmentDailyFact rows (unsaved) for start..end. Items are grouped in SQL
+    by equipment and rental period, so each group is spread over its days once.
+    """
+    groups = (
+        RentalItem.objects
+        .filter(rental__status__in=COUNTED_STATUSES, rental__start_date__lte=end, rental__end_date__gte=start)
+        .values('equipment_id', 'equipment__category_id', 'rental__start_date', 'rental__end_date')
+        .annotate(
+            units=Sum('quantity'),
+            items=Count('id'),
+            value=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+        )
+        .order_by()
+    )
+
+    facts = {}
+    for group in groups.iterator():
+        rental_start, rental_end = group['rental__start_date'], group['rental__end_date']
+        length = rental_days(rental_start, rental_end)
+        daily_revenue = (group['value'] or Decimal(0)) / length
+        day = max(rental_start, start)
+        last = min(rental_end, end)
+        while day <= last:
+            fact = facts.get((day, group['equipment_id']))
+            if fact is None:
+                fact = facts[(day, group['equipment_id'])] = EquipmentDailyFact(
+                    date=day, equipment_id=group['equipment_id'], category_id=group['equipment__category_id'],
+                    revenue=Decimal(0),
+                )
+            fact.units_rented += group['units']
+            fact.revenue += daily_revenue
+            if day == rental_start:
+                fact.rentals_started += group['items']
+                fact.rental_days_started += group['items'] * length
+            day += timedelta(days=1)
+
+    for fact in facts.values():
+        fact.revenue = fact.revenue.quantize(CENT)
+    return list(facts.values())
+
+
+def rebuild_window(start, end, batch_size=1000):
+    """Replace the facts for start..end. Returns the number of rows written."""
+    facts = build_facts(start, end)
+    with transaction.atomic():
+        EquipmentDailyFact.objects.filter(date__range=(start, end)).delete()
+        EquipmentDailyFact.objects.bulk_create(facts, batch_size=batch_size)
+    return len(facts)
+
+
+def refresh_equipment_facts(full=False, now=None):
+    """
+    Bring the fact table up to date: everything on the first run (or with
+    full), otherwise only dates touched by rentals changed since the last run
+    and the category of equipment changed since then.
+    """
+    now = now or timezone.now()
+    watermark, _ = ReportWatermark.objects.get_or_create(name=WATERMARK)
+
+    recategorized = 0
+    if full or watermark.value is None:
+        start, end = full_window()
+        if start is not None:
+            # Facts outside the rebuilt range can only be stale
+            EquipmentDailyFact.objects.exclude(date__range=(start, end)).delete()
+        else:
+            EquipmentDailyFact.objects.all().delete()
+    else:
+        since = watermark.value - REFRESH_OVERLAP
+        recategorized = recategorize_facts(since)
+        start, end = changed_window(since)
+
+    result = RefreshResult(start, end, recategorized=recategorized)
+    if start is not None:
+        result.facts = rebuild_window(start, end)
+
+    watermark.value = now
+    watermark.save()
+    return result
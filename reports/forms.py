@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django import forms
+from django.utils import timezone
+from inventory.models import Category
+
+
+class UtilizationReportForm(forms.Form):
+    GROUP_CHOICES = (
+        ('equipment', 'Equipment'),
+        ('category', 'Category'),
+    )
+
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    group = forms.ChoiceField(choices=GROUP_CHOICES, initial='equipment')
+    category = forms.ModelChoiceField(queryset=Category.objects.all(), required=False,
+                                      help_text='Only used when grouping by equipment')
+
+    @classmethod
+    def default_window(cls):
+        today = timezone.now().date()
+        return {'start': today - timedelta(days=29), 'end': today, 'group': 'equipment'}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError('The start date must be on or before the end date.')
+        return cleaned_data
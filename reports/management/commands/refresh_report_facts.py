@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from reports.facts import refresh_equipment_facts
+
+
+class Command(BaseCommand):
+    help = 'Update the daily equipment facts behind the utilization and revenue reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every date instead of only changed ones')
+
+    def handle(self, *args, **options):
+        result = refresh_equipment_facts(full=options['full'])
+        if result.recategorized:
+            self.stdout.write(f"Moved {result.recategorized} daily facts to their equipment's new category")
+        if result.start is None:
+            self.stdout.write(self.style.SUCCESS('Report facts already up to date'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {result.facts} daily facts for {result.start} to {result.end}"))
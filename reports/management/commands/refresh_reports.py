@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from reports.facts import refresh_equipment_facts
+from reports.summaries import refresh_summaries
+
+
+class Command(BaseCommand):
+    help = 'Refresh every reporting summary table (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild everything instead of only what changed')
+
+    def handle(self, *args, **options):
+        for result in refresh_summaries(full=options['full']):
+            if result.skipped:
+                self.stdout.write(f"{result.name}: no changes")
+            else:
+                self.stdout.write(f"{result.name}: {result.rows} rows rebuilt")
+
+        facts = refresh_equipment_facts(full=options['full'])
+        if facts.recategorized:
+            self.stdout.write(f"equipment facts: {facts.recategorized} rows moved to a new category")
+        if facts.start is None:
+            self.stdout.write("equipment facts: no changes")
+        else:
+            self.stdout.write(f"equipment facts: {facts.facts} rows rebuilt for {facts.start} to {facts.end}")
+        self.stdout.write(self.style.SUCCESS('Reports refreshed'))
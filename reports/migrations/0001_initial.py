@@ -0,0 +1,46 @@
+# Generated by Django 4.2.11 on 2026-10-19 18:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('inventory', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EquipmentDailyFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units_rented', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rentals_started', models.PositiveIntegerField(default=0)),
+                ('rental_days_started', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_facts', to='inventory.category')),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_facts', to='inventory.equipment')),
+            ],
+            options={
+                'ordering': ['date', 'equipment'],
+                'indexes': [models.Index(fields=['date', 'category'], name='reports_equ_date_f151bf_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentdailyfact',
+            constraint=models.UniqueConstraint(fields=('date', 'equipment'), name='unique_equipment_daily_fact'),
+        ),
+    ]
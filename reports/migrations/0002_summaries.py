@@ -0,0 +1,86 @@
+# Generated by Django 4.2.11 on 2026-10-19 18:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+RENTAL_STATUS_VIEW = """
+CREATE MATERIALIZED VIEW reports_rentalstatussummary AS
+SELECT status, COUNT(*) AS rentals, COALESCE(SUM(total_price), 0) AS total_value
+FROM rentals_rental GROUP BY status
+"""
+
+
+def create_rental_status_summary(apps, schema_editor):
+    """A materialized view on PostgreSQL (a unique index allows REFRESH ... CONCURRENTLY), a table elsewhere."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(RENTAL_STATUS_VIEW)
+        schema_editor.execute('CREATE UNIQUE INDEX reports_rentalstatussummary_status '
+                              'ON reports_rentalstatussummary (status)')
+    else:
+        model = apps.get_model('reports', 'RentalStatusSummary')
+        model._meta.managed = True
+        try:
+            schema_editor.create_model(model)
+        finally:
+            model._meta.managed = False
+
+
+def drop_rental_status_summary(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP MATERIALIZED VIEW IF EXISTS reports_rentalstatussummary')
+    else:
+        schema_editor.execute('DROP TABLE IF EXISTS reports_rentalstatussummary')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_payment_updated_at'),
+        ('rentals', '0003_contract_content_hash'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentalStatusSummary',
+            fields=[
+                ('status', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('rentals', models.PositiveIntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'db_table': 'reports_rentalstatussummary',
+                'ordering': ['status'],
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_rental_status_summary, drop_rental_status_summary),
+        migrations.CreateModel(
+            name='DailyRevenueSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('collected', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerBalanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open_rentals', models.PositiveIntegerField(default=0)),
+                ('billed', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_summary', to='rentals.customer')),
+            ],
+            options={
+                'ordering': ['-balance'],
+            },
+        ),
+    ]
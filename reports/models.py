@@ -0,0 +1,105 @@
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from inventory.models import Category, Equipment
+from rentals.models import Customer, Rental, RentalItem
+
+
+class ReportWatermark(models.Model):
+    """How far an incremental refresh (see reports/facts.py) has got."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+class EquipmentDailyFact(models.Model):
+    """One equipment item on one day, maintained by reports.facts.refresh_equipment_facts()."""
+    date = models.DateField()
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='daily_facts')
+    # Copied from the equipment so category reports need no join; refreshes follow moves
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='daily_facts')
+    # Units out on rental that day
+    units_rented = models.PositiveIntegerField(default=0)
+    # Rental revenue spread evenly over each rental's days
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Rental items starting that day, and their total length in days
+    rentals_started = models.PositiveIntegerField(default=0)
+    rental_days_started = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date', 'equipment']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'equipment'], name='unique_equipment_daily_fact'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'category']),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_id} on {self.date}"
+
+
+class DailyRevenueSummary(models.Model):
+    """Money in and out per day, maintained by reports.summaries.refresh_daily_revenue()."""
+    date = models.DateField(unique=True)
+    # Completed (or later refunded) payments made that day
+    payments = models.PositiveIntegerField(default=0)
+    collected = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Refunds issued that day
+    refunds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: ${self.net}"
+
+
+class RentalStatusSummary(models.Model):
+    """
+    Rental counts and value per status. A materialized view on PostgreSQL and a
+    plain table elsewhere (see migration 0002), refreshed by
+    reports.summaries.refresh_rental_status().
+    """
+    status = models.CharField(max_length=20, primary_key=True)
+    rentals = models.PositiveIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        managed = False
+        db_table = 'reports_rentalstatussummary'
+        ordering = ['status']
+
+    def __str__(self):
+        return f"{self.status}: {self.rentals}"
+
+
+class CustomerBalanceSummary(models.Model):
+    """What each customer owes, maintained by reports.summaries.refresh_customer_balances()."""
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='balance_summary')
+    open_rentals = models.PositiveIntegerField(default=0)
+    # Same definition as Rental.balance_due, summed over non-cancelled rentals
+    billed = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
+
+    class Meta:
+        ordering = ['-balance']
+
+    def __str__(self):
+        return f"{self.customer_id} owes ${self.balance}"
+
+
+@receiver(post_save, sender=RentalItem)
+@receiver(post_delete, sender=RentalItem)
+def touch_rental_for_reports(sender, instance, **kwargs):
+    """
+    Item changes don't save the rental, so bump its updated_at for the
+    incremental report refresh (an update(), so no history row or signals).
+    """
+    Rental.objects.filter(pk=instance.rental_id).update(updated_at=timezone.now())
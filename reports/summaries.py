@@ -0,0 +1,217 @@
+"""
+Summary tables for reporting, so report pages never query the live rental
+and payment tables that checkout is writing to:
+
+- DailyRevenueSummary: payments collected, refunds and net per day
+- RentalStatusSummary: rental count and value per status
+- CustomerBalanceSummary: what each customer still owes
+
+Each summary has a ReportWatermark. A refresh finds rows changed since the
+watermark (updated_at, plus history rows so deletions count too) and rebuilds
+only the affected days or customers. Rentals by status is small enough to
+recompute whole; on PostgreSQL it is a materialized view refreshed
+concurrently, so readers are never blocked.
+
+`manage.py refresh_reports` runs every refresh; schedule it nightly.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from payments.models import Payment
+from rentals.models import Customer, Rental
+
+from .facts import REFRESH_OVERLAP
+from .models import CustomerBalanceSummary, DailyRevenueSummary, ReportWatermark, RentalStatusSummary
+
+COLLECTED_STATUSES = ('completed', 'refunded')
+
+
+@dataclass
+class SummaryRefresh:
+    name: str
+    rows: int = 0
+    skipped: bool = False
+
+
+def _since(watermark, full):
+    """Changes after this time need refreshing, or None to rebuild everything."""
+    if full or watermark.value is None:
+        return None
+    return watermark.value - REFRESH_OVERLAP
+
+
+def _changed_payments(since):
+    HistoricalPayment = Payment.history.model
+    return Q(id__in=Payment.objects.filter(updated_at__gt=since).values('pk')) | \
+        Q(id__in=HistoricalPayment.objects.filter(history_date__gt=since).values('id'))
+
+
+def _changed_rentals(since):
+    HistoricalRental = Rental.history.model
+    return Q(id__in=Rental.objects.filter(updated_at__gt=since).values('pk')) | \
+        Q(id__in=HistoricalRental.objects.filter(history_date__gt=since).values('id'))
+
+
+def _payment_dates(queryset):
+    """Every day a payment in queryset was made or refunded on."""
+    dates = set(queryset.annotate(day=TruncDate('payment_date')).values_list('day', flat=True).distinct())
+    dates |= set(queryset.filter(refund_date__isnull=False).annotate(day=TruncDate('refund_date'))
+                 .values_list('day', flat=True).distinct())
+    return dates
+
+
+def build_daily_revenue(dates=None):
+    """DailyRevenueSummary rows (unsaved) for dates, or for every day if dates is None."""
+    payments = Payment.objects.all()
+    refunds = Payment.objects.filter(refund_amount__isnull=False, refund_date__isnull=False)
+    if dates is not None:
+        payments = payments.filter(payment_date__date__in=dates)
+        refunds = refunds.filter(refund_date__date__in=dates)
+
+    days = defaultdict(lambda: {'payments': 0, 'collected': Decimal(0), 'refunds': Decimal(0)})
+    for row in (payments.filter(status__in=COLLECTED_STATUSES).annotate(day=TruncDate('payment_date'))
+                .values('day').annotate(count=Count('id'), total=Sum('amount')).order_by()):
+        days[row['day']].update(payments=row['count'], collected=row['total'])
+    for row in refunds.annotate(day=TruncDate('refund_date')).values('day').annotate(
+            total=Sum('refund_amount')).order_by():
+        days[row['day']]['refunds'] = row['total']
+
+    return [
+        DailyRevenueSummary(date=day, net=totals['collected'] - totals['refunds'], **totals)
+        for day, totals in days.items()
+    ]
+
+
+def refresh_daily_revenue(full=False, now=None):
+    now = now or timezone.now()
+    watermark, _ = ReportWatermark.objects.get_or_create(name='daily_revenue')
+    since = _since(watermark, full)
+
+    if since is None:
+        dates = None
+    else:
+        changed = _changed_payments(since)
+        # Old versions cover days a payment was deleted or moved from
+        dates = _payment_dates(Payment.history.model.objects.filter(changed))
+        dates |= _payment_dates(Payment.objects.filter(changed))
+
+    result = SummaryRefresh('daily revenue', skipped=dates == set())
+    if not result.skipped:
+        rows = build_daily_revenue(dates)
+        with transaction.atomic():
+            stale = DailyRevenueSummary.objects.all()
+            if dates is not None:
+                stale = stale.filter(date__in=dates)
+            stale.delete()
+            DailyRevenueSummary.objects.bulk_create(rows, batch_size=1000)
+        result.rows = len(rows)
+
+    watermark.value = now
+    watermark.save()
+    return result
+
+
+def refresh_rental_status(full=False, now=None):
+    now = now or timezone.now()
+    watermark, _ = ReportWatermark.objects.get_or_create(name='rental_status')
+    since = _since(watermark, full)
+
+    result = SummaryRefresh('rentals by status')
+    if since is not None and not (Rental.objects.filter(updated_at__gt=since).exists() or
+                                  Rental.history.filter(history_date__gt=since).exists()):
+        result.skipped = True
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY reports_rentalstatussummary')
+        result.rows = RentalStatusSummary.objects.count()
+    else:
+        rows = [
+            RentalStatusSummary(status=row['status'], rentals=row['rentals'], total_value=row['total'])
+            for row in Rental.objects.values('status').annotate(rentals=Count('id'), total=Sum('total_price'))
+            .order_by()
+        ]
+        with transaction.atomic():
+            RentalStatusSummary.objects.all().delete()
+            RentalStatusSummary.objects.bulk_create(rows)
+        result.rows = len(rows)
+
+    watermark.value = now
+    watermark.save()
+    return result
+
+
+def build_customer_balances(customers):
+    """CustomerBalanceSummary rows (unsaved) for the customers in the customers queryset."""
+    billed = customers.annotate(
+        billed=Sum('rentals__total_price', filter=~Q(rentals__status='cancelled')),
+        open_rentals=Count('rentals', filter=Q(rentals__status__in=Rental.OPEN_STATUSES)),
+    ).values_list('pk', 'billed', 'open_rentals')
+    # Summed separately; joining payments onto rentals above would repeat each rental's price
+    paid = dict(
+        Payment.objects.filter(rental__customer__in=customers, status='completed')
+        .exclude(rental__status='cancelled')
+        .values('rental__customer').annotate(total=Sum('amount'))
+        .values_list('rental__customer', 'total').order_by()
+    )
+
+    rows = []
+    for pk, total, open_rentals in billed:
+        if total is None and not open_rentals:
+            # No rentals, or only cancelled ones
+            continue
+        total = total or Decimal(0)
+        paid_total = paid.get(pk) or Decimal(0)
+        rows.append(CustomerBalanceSummary(customer_id=pk, open_rentals=open_rentals, billed=total,
+                                           paid=paid_total, balance=total - paid_total))
+    return rows
+
+
+def refresh_customer_balances(full=False, now=None):
+    now = now or timezone.now()
+    watermark, _ = ReportWatermark.objects.get_or_create(name='customer_balances')
+    since = _since(watermark, full)
+
+    if since is None:
+        customer_ids = None
+        customers = Customer.objects.all()
+    else:
+        HistoricalRental = Rental.history.model
+        rentals = Rental.objects.filter(
+            _changed_rentals(since) |
+            Q(id__in=Payment.objects.filter(_changed_payments(since)).values('rental_id')) |
+            Q(id__in=Payment.history.model.objects.filter(_changed_payments(since)).values('rental_id')))
+        customer_ids = set(rentals.values_list('customer_id', flat=True))
+        # Earlier versions catch deleted rentals and ones moved to another customer
+        customer_ids |= set(HistoricalRental.objects.filter(_changed_rentals(since))
+                            .values_list('customer_id', flat=True))
+        customers = Customer.objects.filter(pk__in=customer_ids)
+
+    result = SummaryRefresh('customer balances', skipped=customer_ids == set())
+    if not result.skipped:
+        rows = build_customer_balances(customers)
+        with transaction.atomic():
+            stale = CustomerBalanceSummary.objects.all()
+            if customer_ids is not None:
+                stale = stale.filter(customer_id__in=customer_ids)
+            stale.delete()
+            CustomerBalanceSummary.objects.bulk_create(rows, batch_size=1000)
+        result.rows = len(rows)
+
+    watermark.value = now
+    watermark.save()
+    return result
+
+
+def refresh_summaries(full=False, now=None):
+    """Refresh every summary table, returning a SummaryRefresh for each."""
+    now = now or timezone.now()
+    return [
+        refresh_daily_revenue(full, now),
+        refresh_rental_status(full, now),
+        refresh_customer_balances(full, now),
+    ]
@@ -0,0 +1,93 @@
+"""
+Equipment utilization, revenue and rental length over a date range, read
+from EquipmentDailyFact (reports/facts.py) so any window is a single
+aggregate query however many rentals it covers.
+
+Utilization is unit-days rented over unit-days owned (quantity x days in the
+window); average length is over rental items that started in the window.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.db.models import DecimalField, IntegerField, Q, Sum
+from django.db.models.functions import Coalesce
+from inventory.models import Category, Equipment
+
+from .models import EquipmentDailyFact
+
+COLUMNS = ['id', 'name', 'quantity', 'unit_days', 'utilization', 'revenue', 'rentals', 'average_days']
+
+
+def _row(pk, name, quantity, days, unit_days, revenue, rentals, rental_days):
+    capacity = quantity * days
+    return {
+        'id': pk,
+        'name': name,
+        'quantity': quantity,
+        'unit_days': unit_days,
+        'utilization': round(unit_days / capacity, 4) if capacity else 0.0,
+        'revenue': revenue.quantize(Decimal('0.01')),
+        'rentals': rentals,
+        'average_days': round(rental_days / rentals, 1) if rentals else None,
+    }
+
+
+def equipment_report(start, end, category=None):
+    """One row per equipment item for start..end, busiest first."""
+    days = (end - start).days + 1
+    in_window = Q(daily_facts__date__range=(start, end))
+    queryset = Equipment.objects.exclude(status='retired')
+    if category is not None:
+        queryset = queryset.filter(category=category)
+    queryset = queryset.annotate(
+        unit_days=Coalesce(Sum('daily_facts__units_rented', filter=in_window), 0, output_field=IntegerField()),
+        revenue_total=Coalesce(Sum('daily_facts__revenue', filter=in_window), Decimal(0),
+                               output_field=DecimalField(max_digits=14, decimal_places=2)),
+        rentals=Coalesce(Sum('daily_facts__rentals_started', filter=in_window), 0, output_field=IntegerField()),
+        rental_days=Coalesce(Sum('daily_facts__rental_days_started', filter=in_window), 0,
+                             output_field=IntegerField()),
+    ).values_list('pk', 'name', 'quantity', 'unit_days', 'revenue_total', 'rentals', 'rental_days')
+
+    rows = [_row(pk, name, quantity, days, *totals) for pk, name, quantity, *totals in queryset]
+    rows.sort(key=lambda row: (-row['utilization'], -row['revenue'], row['name']))
+    return rows
+
+
+def category_report(start, end):
+    """One row per category for start..end, busiest first."""
+    days = (end - start).days + 1
+    # Facts and quantities are summed separately; joining both would multiply the sums
+    totals = {
+        row['category']: row
+        for row in EquipmentDailyFact.objects.filter(date__range=(start, end))
+        .values('category')
+        .annotate(unit_days=Sum('units_rented'), revenue_total=Sum('revenue'),
+                  rentals=Sum('rentals_started'), rental_days=Sum('rental_days_started'))
+        .order_by()
+    }
+    quantities = dict(
+        Equipment.objects.exclude(status='retired').values('category')
+        .annotate(total=Sum('quantity')).values_list('category', 'total').order_by()
+    )
+
+    rows = []
+    for pk, name in Category.objects.values_list('pk', 'name'):
+        row = totals.get(pk, {})
+        rows.append(_row(pk, name, quantities.get(pk) or 0, days, row.get('unit_days', 0),
+                         row.get('revenue_total', Decimal(0)), row.get('rentals', 0), row.get('rental_days', 0)))
+    rows.sort(key=lambda row: (-row['utilization'], -row['revenue'], row['name']))
+    return rows
+
+
+def to_csv(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def to_json(rows, **meta):
+    return json.dumps({**meta, 'rows': rows}, default=str)
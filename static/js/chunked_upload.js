@@ -0,0 +1,113 @@
+/*
+ * Chunked, resumable uploads for equipment attachments.
+ *
+ * Any form with a data-upload-session-url attribute has its file sent in
+ * chunks to the inventory upload endpoints instead of one multipart POST.
+ * Failed chunks are retried, and an interrupted upload resumes from the
+ * chunks the server already has.
+ */
+(function () {
+    'use strict';
+
+    var MAX_RETRIES = 3;
+
+    function csrfToken(form) {
+        var input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    function request(method, url, options) {
+        options = options || {};
+        return fetch(url, {
+            method: method,
+            credentials: 'same-origin',
+            headers: options.headers || {},
+            body: options.body
+        }).then(function (response) {
+            return response.json().then(function (data) {
+                if (!response.ok) {
+                    throw new Error(data.message || ('Upload failed (' + response.status + ')'));
+                }
+                return data;
+            });
+        });
+    }
+
+    function sendChunk(session, file, index, headers, attempt) {
+        var start = index * session.chunk_size;
+        var blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+        var url = session.chunk_url_template.replace('{index}', index);
+        return request('PUT', url, {headers: headers, body: blob}).catch(function (error) {
+            if (attempt >= MAX_RETRIES) {
+                throw error;
+            }
+            return sendChunk(session, file, index, headers, attempt + 1);
+        });
+    }
+
+    function upload(form, file, onProgress) {
+        var token = csrfToken(form);
+        var description = form.querySelector('[name="description"]');
+        var body = new FormData();
+        body.append('filename', file.name);
+        body.append('size', file.size);
+        body.append('content_type', file.type);
+        body.append('description', description ? description.value : '');
+
+        return request('POST', form.dataset.uploadSessionUrl, {
+            headers: {'X-CSRFToken': token},
+            body: body
+        }).then(function (session) {
+            var headers = {'X-CSRFToken': token, 'X-Upload-Token': session.token};
+            var pending = session.missing_chunks.slice();
+            var done = session.total_chunks - pending.length;
+
+            function next() {
+                if (!pending.length) {
+                    return request('POST', session.complete_url, {headers: headers});
+                }
+                var index = pending.shift();
+                return sendChunk(session, file, index, headers, 1).then(function () {
+                    done += 1;
+                    onProgress(done / session.total_chunks);
+                    return next();
+                });
+            }
+            return next();
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var forms = document.querySelectorAll('form[data-upload-session-url]');
+        Array.prototype.forEach.call(forms, function (form) {
+            if (!window.fetch || !window.FormData) {
+                return;  // Fall back to the regular multipart form
+            }
+            form.addEventListener('submit', function (event) {
+                var input = form.querySelector('input[type="file"]');
+                if (!input || !input.files.length) {
+                    return;
+                }
+                event.preventDefault();
+                var button = form.querySelector('[type="submit"]');
+                var label = button ? button.textContent : '';
+                if (button) {
+                    button.disabled = true;
+                }
+                upload(form, input.files[0], function (fraction) {
+                    if (button) {
+                        button.textContent = 'Uploading ' + Math.round(fraction * 100) + '%';
+                    }
+                }).then(function (result) {
+                    window.location.href = result.redirect_url;
+                }).catch(function (error) {
+                    if (button) {
+                        button.disabled = false;
+                        button.textContent = label;
+                    }
+                    alert(error.message);
+                });
+            });
+        });
+    });
+})();
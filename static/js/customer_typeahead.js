@@ -0,0 +1,85 @@
+/*
+ * Customer typeahead for staff rental forms.
+ *
+ * A select with a data-typeahead-url attribute only contains the chosen
+ * customer. This adds a search box in front of it that asks the typeahead
+ * endpoint for matches as staff type and puts the picked customer in the
+ * select, so the page never has to list every customer.
+ */
+(function () {
+    'use strict';
+
+    var MIN_LENGTH = 2;
+    var DELAY_MS = 150;
+
+    function attach(select) {
+        var wrapper = document.createElement('div');
+        wrapper.className = 'position-relative mb-2';
+        var input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control';
+        input.placeholder = 'Search customers by name, email, phone or ID';
+        input.autocomplete = 'off';
+        var menu = document.createElement('div');
+        menu.className = 'list-group position-absolute w-100 shadow';
+        menu.style.zIndex = 1000;
+        wrapper.appendChild(input);
+        wrapper.appendChild(menu);
+        select.parentNode.insertBefore(wrapper, select);
+
+        var timer = null;
+        var latest = 0;
+
+        function choose(result) {
+            select.innerHTML = '';
+            select.appendChild(new Option(result.text, result.id, true, true));
+            select.dispatchEvent(new Event('change', {bubbles: true}));
+            input.value = result.text;
+            menu.innerHTML = '';
+        }
+
+        function show(results) {
+            menu.innerHTML = '';
+            results.forEach(function (result) {
+                var item = document.createElement('button');
+                item.type = 'button';
+                item.className = 'list-group-item list-group-item-action';
+                item.textContent = result.text + (result.email ? ' (' + result.email + ')' : '');
+                item.addEventListener('click', function () { choose(result); });
+                menu.appendChild(item);
+            });
+        }
+
+        function search() {
+            var query = input.value.trim();
+            if (query.length < MIN_LENGTH && !/^\d+$/.test(query)) {
+                menu.innerHTML = '';
+                return;
+            }
+            var request = ++latest;
+            var url = select.dataset.typeaheadUrl + '?q=' + encodeURIComponent(query);
+            fetch(url, {credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    // Ignore answers to queries the user has already typed past
+                    if (request === latest) {
+                        show(data.results || []);
+                    }
+                });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(search, DELAY_MS);
+        });
+        input.addEventListener('keydown', function (event) {
+            if (event.key === 'Escape') {
+                menu.innerHTML = '';
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-typeahead-url]').forEach(attach);
+    });
+})();
@@ -0,0 +1,168 @@
+/*
+ * Offline copy of the equipment catalog for the mobile scan page.
+ *
+ * The catalog is downloaded once (snapshot) and then kept current with
+ * deltas, so scanned items are looked up on the device without a request.
+ * Status changes are queued locally and sent in batches when the device is
+ * online. See inventory/catalog.py for the endpoints.
+ */
+(function () {
+    'use strict';
+
+    var CATALOG_KEY = 'offlineCatalog';
+    var QUEUE_KEY = 'offlineStatusQueue';
+
+    function load(key, fallback) {
+        try {
+            return JSON.parse(localStorage.getItem(key)) || fallback;
+        } catch (e) {
+            return fallback;
+        }
+    }
+
+    function save(key, value) {
+        try {
+            localStorage.setItem(key, JSON.stringify(value));
+        } catch (e) {
+            console.error('Could not store ' + key, e);
+        }
+    }
+
+    function OfflineCatalog(options) {
+        this.urls = options.urls;
+        this.csrfToken = options.csrfToken;
+        this.data = load(CATALOG_KEY, null);
+        this.queue = load(QUEUE_KEY, []);
+    }
+
+    OfflineCatalog.prototype.toItem = function (fields, row) {
+        var item = {};
+        fields.forEach(function (name, i) { item[name] = row[i]; });
+        return item;
+    };
+
+    OfflineCatalog.prototype.upsert = function (fields, rows) {
+        var self = this;
+        rows.forEach(function (row) {
+            var item = self.toItem(fields, row);
+            self.data.items[item.id] = item;
+            self.data.byUuid[item.qr_uuid] = item.id;
+        });
+    };
+
+    OfflineCatalog.prototype.fetchSnapshot = function () {
+        var self = this;
+        var headers = {'Accept': 'application/json'};
+        if (self.data && self.data.etag) {
+            headers['If-None-Match'] = self.data.etag;
+        }
+        return fetch(self.urls.snapshot, {credentials: 'same-origin', headers: headers}).then(function (response) {
+            if (response.status === 304) {
+                return self.data;
+            }
+            if (!response.ok) {
+                throw new Error('Catalog download failed (' + response.status + ')');
+            }
+            var etag = response.headers.get('ETag');
+            return response.json().then(function (snapshot) {
+                self.data = {cursor: snapshot.cursor, etag: etag, items: {}, byUuid: {}};
+                self.upsert(snapshot.fields, snapshot.rows);
+                save(CATALOG_KEY, self.data);
+                return self.data;
+            });
+        });
+    };
+
+    OfflineCatalog.prototype.fetchChanges = function () {
+        var self = this;
+        var url = self.urls.changes + '?since=' + encodeURIComponent(self.data.cursor);
+        return fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}}).then(function (response) {
+            if (response.status === 410) {
+                return self.fetchSnapshot();
+            }
+            if (!response.ok) {
+                throw new Error('Catalog update failed (' + response.status + ')');
+            }
+            return response.json().then(function (delta) {
+                self.upsert(delta.fields, delta.rows);
+                delta.deleted.forEach(function (id) {
+                    var item = self.data.items[id];
+                    if (item) {
+                        delete self.data.byUuid[item.qr_uuid];
+                        delete self.data.items[id];
+                    }
+                });
+                self.data.cursor = delta.cursor;
+                save(CATALOG_KEY, self.data);
+                return self.data;
+            });
+        });
+    };
+
+    // Bring the local copy up to date; a no-op offline
+    OfflineCatalog.prototype.refresh = function () {
+        if (!navigator.onLine) {
+            return Promise.resolve(this.data);
+        }
+        return this.data ? this.fetchChanges() : this.fetchSnapshot();
+    };
+
+    // The item for an equipment id or QR uuid, or null
+    OfflineCatalog.prototype.lookup = function (key) {
+        if (!this.data) {
+            return null;
+        }
+        var id = /^\d+$/.test(key) ? key : this.data.byUuid[key];
+        return (id && this.data.items[id]) || null;
+    };
+
+    // Change an item's status locally and queue it for the server
+    OfflineCatalog.prototype.setStatus = function (id, status) {
+        var item = this.lookup(String(id));
+        if (item) {
+            item.status = status;
+            save(CATALOG_KEY, this.data);
+        }
+        this.queue.push({id: id, status: status, cursor: this.data ? this.data.cursor : null});
+        save(QUEUE_KEY, this.queue);
+        return this.sync();
+    };
+
+    // Send queued status changes; conflicting ones take the server's row
+    OfflineCatalog.prototype.sync = function () {
+        var self = this;
+        if (!navigator.onLine || !self.queue.length || self.syncing) {
+            return Promise.resolve(null);
+        }
+        var batch = self.queue.slice();
+        // The oldest copy any change was made against, so no server change is overwritten unseen
+        var cursor = batch.map(function (change) { return change.cursor; }).filter(Boolean).sort()[0]
+            || (self.data && self.data.cursor);
+        self.syncing = true;
+        return fetch(self.urls.sync, {
+            method: 'POST',
+            credentials: 'same-origin',
+            headers: {'Content-Type': 'application/json', 'Accept': 'application/json', 'X-CSRFToken': self.csrfToken},
+            body: JSON.stringify({cursor: cursor, changes: batch.map(function (change) {
+                return {id: change.id, status: change.status};
+            })})
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error('Status sync failed (' + response.status + ')');
+            }
+            return response.json();
+        }).then(function (result) {
+            self.queue = self.queue.slice(batch.length);
+            save(QUEUE_KEY, self.queue);
+            if (self.data) {
+                self.upsert(result.fields, result.conflicts);
+                save(CATALOG_KEY, self.data);
+            }
+            return self.refresh().then(function () { return result; });
+        }).finally(function () {
+            self.syncing = false;
+        });
+    };
+
+    window.OfflineCatalog = OfflineCatalog;
+})();
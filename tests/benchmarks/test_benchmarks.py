@@ -0,0 +1,47 @@
+"""
+View benchmarks, see music_rental/benchmarks.py.
+
+Skipped unless RUN_BENCHMARKS=1. BENCHMARK_SCALE picks the dataset size
+(default 'tiny') and BENCHMARK_OUTPUT saves the results as JSON:
+
+    RUN_BENCHMARKS=1 BENCHMARK_SCALE=small BENCHMARK_OUTPUT=bench.json pytest tests/benchmarks
+"""
+import os
+import pytest
+from django.db import transaction
+from music_rental import benchmarks
+
+SCALE = os.environ.get('BENCHMARK_SCALE', 'tiny')
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS=1 to run benchmarks'),
+]
+
+
+@pytest.fixture(scope='module')
+def results():
+    collected = []
+    yield collected
+    if os.environ.get('BENCHMARK_OUTPUT') and collected:
+        benchmarks.write_report(benchmarks.build_report(collected, SCALE), os.environ['BENCHMARK_OUTPUT'])
+
+
+@pytest.fixture(scope='module')
+def seeded(django_db_setup, django_db_blocker):
+    """Seed once per module inside a transaction that is rolled back afterwards."""
+    with django_db_blocker.unblock():
+        with transaction.atomic():
+            yield benchmarks.seed(SCALE)
+            transaction.set_rollback(True)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', [benchmark.name for benchmark in benchmarks.BENCHMARKS])
+def test_benchmark(name, seeded, results, settings, local_media):
+    settings.BACKGROUND_TASKS_INLINE = True
+    benchmark = benchmarks.get_benchmarks([name])[0]
+    result = benchmarks.run_benchmark(benchmark, benchmarks.benchmark_client(),
+                                      iterations=int(os.environ.get('BENCHMARK_ITERATIONS', 3)))
+    results.append(result)
+    assert result['status'] < 400
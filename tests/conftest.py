@@ -1,5 +1,6 @@
 import pytest
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.test import Client
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -7,10 +8,46 @@ from inventory.models import Category, Equipment, EquipmentAttachment, Maintenan
 from rentals.models import Rental, RentalItem, Customer
 from payments.models import Payment
 
+# Smallest valid PNG, stored instead of a real QR code by the side-effect stubs
+PLACEHOLDER_PNG = (
+    b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89'
+    b'\x00\x00\x00\rIDATx\x9cc````\x00\x00\x00\x05\x00\x01\xa5\xf6E@\x00\x00\x00\x00IEND\xaeB`\x82'
+)
+
+@pytest.fixture(autouse=True)
+def stub_side_effects(request, monkeypatch):
+    """
+    Replace the slow Equipment.save() side effects: QR codes get a placeholder
+    image and manuals are never looked up (no OpenAI or network calls).
+    Mark a test with @pytest.mark.real_side_effects to keep the real ones.
+    """
+    if request.node.get_closest_marker('real_side_effects'):
+        return
+
+    def placeholder_qr_code(equipment):
+        equipment.qr_code.save(f'qr-{equipment.qr_uuid}.png', ContentFile(PLACEHOLDER_PNG), save=False)
+
+    monkeypatch.setattr(Equipment, 'generate_qr_code', placeholder_qr_code)
+    monkeypatch.setattr('inventory.utils.download_and_store_manual', lambda equipment, *args, **kwargs: False)
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache (render and lookup markers don't leak between tests)."""
+    from django.core.cache import cache
+    cache.clear()
+
 @pytest.fixture
 def client():
     return Client()
 
+@pytest.fixture
+def local_media(settings, tmp_path):
+    """Store uploads on the local filesystem under a temporary MEDIA_ROOT"""
+    settings.DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_URL = '/media/'
+    return tmp_path
+
 @pytest.fixture
 def test_user():
     """Create a test user"""
@@ -0,0 +1,99 @@
+"""
+Test database set up once and cloned per pytest-xdist worker.
+
+Running migrations is the slowest part of starting the suite, and with
+pytest-xdist every worker would do it again. Instead the first worker to get
+the lock builds a template database, and every worker clones it with
+Django's own clone_test_db(): a file copy on SQLite, CREATE DATABASE ...
+TEMPLATE on PostgreSQL.
+
+The template is only migrated. Apart from what migrations and post_migrate
+create (content types, permissions, the site) its tables are empty. It is
+not seeded with seed_scale data because tests build their own rows through
+fixtures and many of them count what is in a table.
+
+On SQLite the template is a file named after a hash of the migration files,
+kept in the temp directory and reused by later runs until a migration changes
+(or --create-db is passed).
+"""
+import fcntl
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+TEMPLATE_DIR = Path(tempfile.gettempdir()) / 'music-rental-test-db'
+
+
+def migrations_digest():
+    """Hash of every migration file, so schema changes invalidate the template."""
+    digest = hashlib.sha1()
+    for path in sorted(Path(settings.BASE_DIR).glob('*/migrations/*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+@contextmanager
+def exclusive_lock(name):
+    TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(TEMPLATE_DIR / f'{name}.lock', 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _use_file_template(connection, digest):
+    """Point SQLite tests at an on-disk template instead of an in-memory database."""
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        test_settings['NAME'] = str(TEMPLATE_DIR / f'{connection.alias}-{digest}.sqlite3')
+
+
+def setup_worker_databases(worker_id, rebuild=False):
+    """
+    Make sure the template exists and clone it for this worker.
+    Returns the state teardown_worker_databases() needs.
+    """
+    digest = migrations_digest()
+    # Concurrent pytest runs must not share clones
+    suffix = f'{worker_id}_{os.getpid()}'
+    state = []
+    for connection in connections.all():
+        _use_file_template(connection, digest)
+        old_name = connection.settings_dict['NAME']
+        with exclusive_lock(f'{connection.alias}-{digest}'):
+            template = connection.creation._get_test_db_name()
+            if rebuild and connection.vendor == 'sqlite' and os.path.exists(template):
+                os.remove(template)
+            # keepdb reuses an existing template; migrate still applies anything new
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=not rebuild,
+                                               serialize=False)
+            connection.close()
+            connection.creation.clone_test_db(suffix=suffix, verbosity=0, keepdb=False)
+        clone_name = connection.creation.get_test_db_clone_settings(suffix)['NAME']
+        _point_at(connection, clone_name)
+        state.append((connection, old_name, clone_name))
+    return state
+
+
+def _point_at(connection, name):
+    connection.close()
+    settings.DATABASES[connection.alias]['NAME'] = name
+    connection.settings_dict['NAME'] = name
+
+
+def teardown_worker_databases(state):
+    """Drop this worker's clones; the template is kept for the next run."""
+    for connection, old_name, clone_name in state:
+        # Remembered rather than read back from settings_dict, which unittest
+        # style test cases may have reset to the template's name by now
+        connection.close()
+        connection.creation._destroy_test_db(clone_name, verbosity=0)
+        _point_at(connection, old_name)
@@ -0,0 +1,89 @@
+import pytest
+from inventory.bulk import bulk_set_equipment_status
+from inventory.models import Equipment
+from rentals.bulk import bulk_transition_rentals
+from rentals.models import Rental
+
+
+@pytest.mark.django_db
+class TestBulkStatus:
+    def test_equipment_status_change_writes_history(self, test_equipment, test_staff):
+        """Test bulk equipment changes write one history row per item"""
+        before = test_equipment.history.count()
+
+        changed = bulk_set_equipment_status(Equipment.objects.all(), 'maintenance',
+                                            user=test_staff, reason='Sweep')
+
+        assert changed == [test_equipment.pk]
+        test_equipment.refresh_from_db()
+        assert test_equipment.status == 'maintenance'
+        latest = test_equipment.history.first()
+        assert test_equipment.history.count() == before + 1
+        assert latest.history_type == '~'
+        assert latest.status == 'maintenance'
+        assert latest.history_user == test_staff
+        assert latest.history_change_reason == 'Sweep'
+
+    def test_completing_rentals_returns_items_and_equipment(self, test_rental, test_equipment):
+        """Test a bulk return completes rentals, marks items returned and frees equipment"""
+        test_equipment.refresh_from_db()
+        assert test_equipment.status == 'rented'
+
+        result = bulk_transition_rentals(Rental.objects.all(), 'completed')
+
+        assert result.changed == [test_rental.pk]
+        test_rental.refresh_from_db()
+        assert test_rental.status == 'completed'
+        assert test_rental.history.first().status == 'completed'
+        assert all(item.returned and item.returned_date for item in test_rental.items.all())
+        test_equipment.refresh_from_db()
+        assert test_equipment.status == 'available'
+        assert result.equipment_released == [test_equipment.pk]
+
+    def test_invalid_transitions_are_skipped(self, test_rental):
+        """Test rentals that can't make the transition are left untouched"""
+        Rental.objects.filter(pk=test_rental.pk).update(status='completed')
+        history_before = test_rental.history.count()
+
+        result = bulk_transition_rentals(Rental.objects.all(), 'active')
+
+        assert result.changed == []
+        assert result.skipped == 1
+        test_rental.refresh_from_db()
+        assert test_rental.status == 'completed'
+        assert test_rental.history.count() == history_before
+
+    def test_equipment_on_another_open_rental_stays_rented(self, test_rental, test_customer, test_equipment):
+        """Test cancelling one rental doesn't free equipment still out on another"""
+        other = Rental.objects.create(
+            customer=test_customer, start_date=test_rental.start_date, end_date=test_rental.end_date,
+            status='active', total_price=10, deposit_total=10,
+        )
+        other.items.create(equipment=test_equipment, quantity=1, price=10)
+
+        result = bulk_transition_rentals(Rental.objects.filter(pk=test_rental.pk), 'cancelled')
+
+        assert result.changed == [test_rental.pk]
+        assert result.equipment_released == []
+        test_equipment.refresh_from_db()
+        assert test_equipment.status == 'rented'
+
+    def test_admin_mark_available_skips_rented_out_equipment(self, rf, test_rental, test_equipment, test_category,
+                                                             test_staff):
+        """Test the admin action frees idle equipment but not equipment out on an open rental"""
+        from django.contrib.admin.sites import site
+        from inventory.admin import mark_available
+
+        idle = Equipment.objects.create(name='Idle', brand='Test', category=test_category, serial_number='IDLE',
+                                        status='maintenance', rental_price_daily=10, rental_price_weekly=40,
+                                        rental_price_monthly=120, deposit_amount=50)
+        modeladmin = site._registry[Equipment]
+        messages = []
+        modeladmin.message_user = lambda request, message, level: messages.append(level)
+
+        request = rf.post('/')
+        request.user = test_staff
+        mark_available(modeladmin, request, Equipment.objects.filter(pk__in=[idle.pk, test_equipment.pk]))
+        assert Equipment.objects.get(pk=idle.pk).status == 'available'
+        assert Equipment.objects.get(pk=test_equipment.pk).status == 'rented'
+        assert messages == ['SUCCESS', 'WARNING']
@@ -0,0 +1,107 @@
+import datetime
+import gzip
+import json
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from inventory import catalog
+from inventory.models import Equipment
+
+
+@pytest.fixture
+def catalog_items(test_category):
+    return Equipment.objects.bulk_create([
+        Equipment(name=f'Catalog Item {i}', brand='Yamaha', serial_number=f'CAT-{i}', category=test_category, condition='good',
+                  rental_price_daily=10, rental_price_weekly=50, rental_price_monthly=150, deposit_amount=100)
+        for i in range(30)
+    ])
+
+
+@pytest.mark.django_db
+class TestCatalogSync:
+    def test_snapshot_is_gzipped_and_cached(self, client, test_user, catalog_items):
+        """Test the snapshot is compact gzipped JSON and an unchanged catalog answers 304"""
+        client.force_login(test_user)
+        url = reverse('inventory:catalog_snapshot')
+
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        assert response['Content-Encoding'] == 'gzip'
+        data = json.loads(gzip.decompress(response.content))
+        assert data['fields'] == ['id', 'qr_uuid', 'name', 'status', 'brand']
+        item = catalog_items[0]
+        assert [item.pk, str(item.qr_uuid), item.name, 'available', 'Yamaha'] in data['rows']
+        assert len(data['rows']) == 30
+
+        assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+        Equipment.objects.filter(pk=item.pk).update(status='damaged', updated_at=timezone.now())
+        assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 200
+
+    def test_changes_since_cursor(self, client, test_user, catalog_items):
+        """Test a delta returns changed and deleted items and a stale cursor asks for a snapshot"""
+        client.force_login(test_user)
+        url = reverse('inventory:catalog_changes')
+        Equipment.objects.update(updated_at=timezone.now() - datetime.timedelta(hours=1))
+        cursor = client.get(reverse('inventory:catalog_snapshot')).json()['cursor']
+
+        changed, deleted = Equipment.objects.get(pk=catalog_items[0].pk), Equipment.objects.get(pk=catalog_items[1].pk)
+        changed.status = 'maintenance'
+        changed.save()
+        deleted.delete()
+
+        data = client.get(url, {'since': cursor}).json()
+        assert data['rows'] == [[changed.pk, str(changed.qr_uuid), changed.name, 'maintenance', 'Yamaha']]
+        assert data['deleted'] == [catalog_items[1].pk]
+        assert data['cursor'] > cursor
+
+        stale = catalog.encode_cursor(timezone.now() - catalog.MAX_CURSOR_AGE - datetime.timedelta(days=1))
+        assert client.get(url, {'since': stale}).status_code == 410
+        assert client.get(url, {'since': 'yesterday'}).status_code == 400
+
+    def test_sync_applies_changes_and_reports_conflicts(self, client, test_user, test_staff, catalog_items):
+        """Test a batch of offline status changes is applied with history, server changes winning"""
+        url = reverse('inventory:catalog_sync')
+        first, second, third = catalog_items[:3]
+        cursor = catalog.encode_cursor(timezone.now())
+        # Changed on the server after the device's copy was taken
+        Equipment.objects.filter(pk=second.pk).update(status='damaged',
+                                                      updated_at=timezone.now() + datetime.timedelta(seconds=1))
+        body = json.dumps({'cursor': cursor, 'changes': [
+            {'id': first.pk, 'status': 'maintenance'},
+            {'id': first.pk, 'status': 'rented'},
+            {'id': second.pk, 'status': 'available'},
+            {'id': third.pk, 'status': 'lost'},
+            {'id': 999999, 'status': 'rented'},
+        ]})
+
+        client.force_login(test_user)
+        assert client.post(url, body, content_type='application/json').status_code == 403
+
+        client.force_login(test_staff)
+        data = client.post(url, body, content_type='application/json').json()
+        assert data['applied'] == [first.pk]
+        assert data['conflicts'] == [[second.pk, str(second.qr_uuid), second.name, 'damaged', 'Yamaha']]
+        assert sorted(data['invalid']) == [third.pk, 999999]
+        assert dict(Equipment.objects.filter(pk__in=[first.pk, second.pk, third.pk]).values_list('pk', 'status')) == {
+            first.pk: 'rented', second.pk: 'damaged', third.pk: 'available'}
+        record = Equipment.history.filter(id=first.pk).latest('history_date')
+        assert (record.status, record.history_user, record.history_change_reason) == \
+            ('rented', test_staff, catalog.SYNC_REASON)
+
+    def test_sync_keeps_rented_out_items(self, client, test_staff, test_rental, test_equipment, catalog_items):
+        """Test a queued change to available doesn't free equipment still out on an open rental"""
+        Equipment.objects.filter(pk=test_equipment.pk).update(status='rented')
+        repaired = catalog_items[0]
+        Equipment.objects.filter(pk=repaired.pk).update(status='maintenance')
+        cursor = catalog.encode_cursor(timezone.now() + datetime.timedelta(seconds=1))
+        body = json.dumps({'cursor': cursor, 'changes': [
+            {'id': test_equipment.pk, 'status': 'available'},
+            {'id': repaired.pk, 'status': 'available'},
+        ]})
+
+        client.force_login(test_staff)
+        data = client.post(reverse('inventory:catalog_sync'), body, content_type='application/json').json()
+        assert data['applied'] == [repaired.pk]
+        assert [row[:1] + row[3:4] for row in data['conflicts']] == [[test_equipment.pk, 'rented']]
+        assert dict(Equipment.objects.filter(pk__in=[test_equipment.pk, repaired.pk]).values_list('pk', 'status')) == {
+            test_equipment.pk: 'rented', repaired.pk: 'available'}
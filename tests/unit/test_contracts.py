@@ -0,0 +1,114 @@
+import base64
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from rentals import contracts
+from rentals.models import Rental
+from tests.conftest import PLACEHOLDER_PNG
+
+SIGNATURE = 'data:image/png;base64,' + base64.b64encode(PLACEHOLDER_PNG).decode()
+
+
+@pytest.mark.django_db
+class TestContracts:
+    def test_render_is_cached_until_rental_changes(self, test_rental, django_capture_on_commit_callbacks):
+        """Test the stored PDF is reused until the rental changes, then replaced"""
+        contract = contracts.render_contract(test_rental)
+        first_name = contract.file.name
+        assert contract.file.read(5) == b'%PDF-'
+        assert contracts.is_current(test_rental)
+
+        rental = contracts.contract_queryset().get(pk=test_rental.pk)
+        assert contracts.render_contract(rental).rendered_at == contract.rendered_at
+
+        rental.end_date += rental.end_date.resolution
+        rental.save()
+        rental = contracts.contract_queryset().get(pk=test_rental.pk)
+        assert not contracts.is_current(rental)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            updated = contracts.render_contract(rental)
+        assert updated.file.name != first_name
+        assert not updated.file.storage.exists(first_name)
+
+    def test_rolled_back_render_keeps_the_old_file(self, test_rental, django_capture_on_commit_callbacks):
+        """Test the previous PDF is only deleted once the new one is committed"""
+        contract = contracts.render_contract(test_rental)
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError), transaction.atomic():
+                contracts.render_contract(test_rental, force=True)
+                raise RuntimeError("caller's transaction fails")
+
+        contract.refresh_from_db()
+        assert contract.file.storage.exists(contract.file.name)
+        assert contract.file.read(5) == b'%PDF-'
+
+    def test_pdf_view_renders_in_background(self, client, settings, test_user, test_rental,
+                                            django_capture_on_commit_callbacks):
+        """Test a stale contract answers 202 and queues a render, then serves the PDF"""
+        settings.BACKGROUND_TASKS_INLINE = True
+        client.force_login(test_user)
+        url = reverse('rentals:rental_contract_pdf', args=[test_rental.id])
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            response = client.get(url)
+        assert response.status_code == 202
+        assert len(callbacks) == 1
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/pdf'
+        assert b''.join(response.streaming_content).startswith(b'%PDF-')
+
+    def test_pending_render_is_queued_once(self, client, settings, test_user, test_rental,
+                                           django_capture_on_commit_callbacks):
+        """Test repeated hits on a pending contract queue one render, and a finished render frees the rental"""
+        settings.BACKGROUND_TASKS_INLINE = True
+        client.force_login(test_user)
+        url = reverse('rentals:rental_contract_pdf', args=[test_rental.id])
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            assert client.get(url).status_code == 202
+            assert client.get(url).status_code == 202
+        assert len(callbacks) == 1
+        assert not contracts.schedule_contract_render(test_rental)
+
+        callbacks[0]()
+        assert contracts.is_current(contracts.contract_queryset().get(pk=test_rental.pk))
+        assert contracts.schedule_contract_render(test_rental)
+
+    def test_sign_records_signature_and_rerenders(self, client, settings, test_user, test_rental,
+                                                  django_capture_on_commit_callbacks):
+        """Test signing stores the signature and the new PDF includes it"""
+        settings.BACKGROUND_TASKS_INLINE = True
+        contracts.render_contract(test_rental)
+        unsigned_hash = test_rental.contract.content_hash
+        client.force_login(test_user)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post(reverse('rentals:rental_sign', args=[test_rental.id]),
+                                   {'signature': SIGNATURE, 'agree_to_terms': 'on'})
+
+        assert response.status_code == 302
+        rental = contracts.contract_queryset().get(pk=test_rental.pk)
+        assert rental.contract_signed and rental.contract_signature_data == SIGNATURE
+        assert rental.contract.content_hash != unsigned_hash
+        assert contracts.is_current(rental)
+
+    def test_render_contracts_command_skips_current(self, test_rental):
+        """Test the bulk command only renders missing or stale contracts unless forced"""
+        out = StringIO()
+        call_command('render_contracts', stdout=out)
+        assert 'Rendered 1 contracts, 0 already up to date, 0 failed' in out.getvalue()
+
+        out = StringIO()
+        call_command('render_contracts', stdout=out)
+        assert 'Rendered 0 contracts, 1 already up to date, 0 failed' in out.getvalue()
+
+        out = StringIO()
+        call_command('render_contracts', '--force', '--status', 'active', stdout=out)
+        assert 'Rendered 1 contracts' in out.getvalue()
+        assert Rental.objects.filter(contract__isnull=False).count() == 1
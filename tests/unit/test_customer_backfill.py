@@ -0,0 +1,63 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rentals.models import Customer
+from users.models import CustomerProfile
+
+
+def make_users(count):
+    User = get_user_model()
+    users = [User.objects.create_user(f'backfill{i}', f'backfill{i}@example.com', 'pass12345',
+                                      first_name='Back', last_name=f'Fill{i}') for i in range(count)]
+    Customer.objects.filter(user__in=users).delete()
+    return users
+
+
+@pytest.mark.django_db
+class TestCustomerBackfill:
+    def test_create_missing_customers_is_set_based(self):
+        """Test the backfill creates customers with history in a few queries per batch"""
+        make_users(6)
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('create_missing_customers', '--batch-size', '4', stdout=out)
+
+        assert Customer.objects.filter(user__username__startswith='backfill').count() == 6
+        assert Customer.history.filter(user__username__startswith='backfill').count() == 6
+        assert '4/6 users processed' in out.getvalue() and 'Created 6 customer records' in out.getvalue()
+        # Count + two batches of select/insert/history insert, plus the empty final batch
+        assert len(queries.captured_queries) < 15
+
+        out = StringIO()
+        call_command('create_missing_customers', stdout=out)
+        assert 'Created 0 customer records' in out.getvalue()
+
+    def test_reconcile_customers(self, test_staff):
+        """Test drift is reported on a dry run and repaired otherwise"""
+        users = make_users(2)
+        call_command('create_missing_customers', stdout=StringIO())
+        Customer.objects.filter(user=users[0]).update(email='stale@example.com')
+        CustomerProfile.objects.filter(user_profile__user=users[1]).delete()
+        CustomerProfile.objects.create(user_profile=test_staff.profile)
+        Customer.objects.filter(user=users[1]).delete()
+
+        out = StringIO()
+        call_command('reconcile_customers', '--dry-run', stdout=out)
+        assert ('1 customer profiles missing, 1 customer profiles on non-customers, '
+                '1 customers out of date, 1 customers missing') in out.getvalue()
+        assert Customer.objects.get(user=users[0]).email == 'stale@example.com'
+
+        call_command('reconcile_customers', stdout=StringIO())
+        assert Customer.objects.get(user=users[0]).email == 'backfill0@example.com'
+        assert Customer.objects.filter(user=users[1]).exists()
+        assert CustomerProfile.objects.filter(user_profile__user=users[1]).exists()
+        assert not CustomerProfile.objects.filter(user_profile__user=test_staff).exists()
+
+        out = StringIO()
+        call_command('reconcile_customers', '--dry-run', stdout=out)
+        assert 'Dry run: 0 customer profiles missing' in out.getvalue()
+        assert '0 customers out of date, 0 customers missing' in out.getvalue()
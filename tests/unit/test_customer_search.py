@@ -0,0 +1,86 @@
+import pytest
+from django.urls import reverse
+from rentals.forms import StaffRentalForm
+from rentals.models import Customer
+from django.db import connection
+from rentals.search import _phone_prefix, search_customers
+
+
+def make_customer(first_name, last_name, email):
+    return Customer.objects.create(
+        first_name=first_name, last_name=last_name, email=email, phone='+12125552368',
+        address='1 Main St', city='Test City', state='TS', zip_code='12345',
+        id_type='drivers_license', id_number=email,
+    )
+
+
+@pytest.mark.django_db
+class TestCustomerSearch:
+    def test_search_columns_are_normalized(self):
+        """Test names are stored lower case and accent-free, and kept current on save"""
+        customer = make_customer('José', 'Álvarez', 'Jose@Example.com')
+        assert customer.search_text == 'jose alvarez jose@example.com 12125552368'
+        assert customer.search_last_first == 'alvarez jose'
+
+        customer.last_name = 'Smith'
+        customer.save(update_fields=['last_name'])
+        customer.refresh_from_db()
+        assert customer.search_last_first == 'smith jose'
+
+    def test_matches_either_name_order_and_id(self):
+        """Test first name, last name, full name and exact id all find the customer"""
+        jose = make_customer('José', 'Álvarez', 'jose@example.com')
+        make_customer('Ann', 'Lee', 'ann@example.com')
+
+        for query in ('jos', 'ALVA', 'jose alv', 'álvarez j', str(jose.pk)):
+            assert list(search_customers(query)) == [jose], query
+        assert not search_customers('   ').exists()
+
+    def test_matches_email_and_phone(self, client, test_staff):
+        """Test the email and phone number (as typed, with or without the country code) find the customer"""
+        jose = make_customer('José', 'Álvarez', 'Jose.Alvarez@example.com')
+        ann = make_customer('Ann', 'Lee', 'ann@example.com')
+        ann.phone = '+13105550000'
+        ann.save()
+
+        for query in ('jose.alv', 'JOSE.ALVAREZ@EXAMPLE.COM', '212', '(212) 555-23', '+1 212 555 2368'):
+            assert list(search_customers(query)) == [jose], query
+
+        client.force_login(test_staff)
+        results = client.get(reverse('rentals:customer_search'), {'q': 'ann@exa'}).json()['results']
+        assert [result['id'] for result in results] == [ann.pk]
+
+    def test_phone_queries_on_postgresql(self, monkeypatch):
+        """Test the PostgreSQL query also matches phone numbers typed with punctuation or a country code"""
+        assert _phone_prefix('+1 212 555') == '212555'
+        assert _phone_prefix('(212) 555-23') == '21255523'
+        jose = make_customer('José', 'Álvarez', 'jose@example.com')
+        monkeypatch.setattr(connection, 'vendor', 'postgresql')
+
+        for query in ('(212) 555-23', '+1 212 555', 'jose@exa', 'varez'):
+            assert list(search_customers(query)) == [jose], query
+
+    def test_typeahead_endpoint_is_staff_only(self, client, test_user, test_staff):
+        """Test staff get the top matches and other users are refused"""
+        for i in range(15):
+            make_customer(f'Sam{i}', 'Jones', f'sam{i}@example.com')
+        url = reverse('rentals:customer_search')
+
+        client.force_login(test_user)
+        assert client.get(url, {'q': 'sam'}).status_code == 403
+
+        client.force_login(test_staff)
+        results = client.get(url, {'q': 'jones s', 'limit': 5}).json()['results']
+        assert len(results) == 5
+        assert set(results[0]) == {'id', 'text', 'email'}
+
+    def test_staff_form_renders_only_selected_customer(self, test_customer):
+        """Test the staff rental form no longer lists every customer but still accepts any"""
+        others = [make_customer(f'Other{i}', 'Person', f'other{i}@example.com') for i in range(3)]
+        html = str(StaffRentalForm()['customer'])
+        assert 'data-typeahead-url' in html and 'Other0' not in html
+
+        form = StaffRentalForm(data={'customer': others[2].pk, 'start_date': '2030-01-01',
+                                     'end_date': '2030-01-03', 'duration_type': 'daily'})
+        assert form.is_valid(), form.errors
+        assert 'Other2 Person' in str(form['customer'])
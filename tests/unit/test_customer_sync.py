@@ -0,0 +1,84 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rentals.customer_sync import sync_customers
+from rentals.models import Customer
+from users.models import CustomerProfile
+
+
+def writes(queries):
+    return [query['sql'] for query in queries.captured_queries
+            if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+
+@pytest.mark.django_db
+class TestCustomerSync:
+    def test_login_is_a_single_update(self, test_user, test_customer):
+        """Test recording a login no longer cascades into profile and customer saves"""
+        user = get_user_model().objects.get(pk=test_user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            update_last_login(None, user)
+        assert len(queries.captured_queries) == 1
+        assert queries.captured_queries[0]['sql'].startswith('UPDATE "auth_user"')
+
+    def test_only_real_changes_reach_the_customer(self, test_user, test_customer):
+        """Test an unchanged save writes nothing and a rename updates the customer once"""
+        user = get_user_model().objects.get(pk=test_user.pk)
+        user.first_name, user.last_name = 'Test', 'User'
+        user.save()
+        history_rows = test_customer.history.count()
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        assert len(writes(queries)) == 1  # the user row itself
+
+        user.first_name = 'Renamed'
+        user.save()
+        test_customer.refresh_from_db()
+        assert (test_customer.first_name, test_customer.last_name) == ('Renamed', 'User')
+        assert test_customer.history.count() == history_rows + 1
+
+    def test_profile_changes_sync(self, test_user, test_customer):
+        """Test contact details and user type changes made on the profile are applied"""
+        user = get_user_model().objects.get(pk=test_user.pk)
+        user.profile.city = 'Springfield'
+        user.save()
+        test_customer.refresh_from_db()
+        assert test_customer.city == 'Springfield'
+
+        user.profile.user_type = 'employee'
+        user.profile.save()
+        assert not CustomerProfile.objects.filter(user_profile=user.profile).exists()
+
+    def test_becoming_a_customer_creates_the_customer(self, client, test_user):
+        """Test a user switched to the customer type gets a Customer straight away"""
+        admin = get_user_model().objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        admin.profile.user_type = 'admin'
+        admin.profile.save()
+        user = get_user_model().objects.get(pk=test_user.pk)
+        user.profile.user_type = 'employee'
+        user.profile.save()
+        Customer.objects.filter(user=user).delete()
+
+        client.force_login(admin)
+        response = client.post(reverse('users:change_user_type', args=[user.pk]), {'user_type': 'customer'})
+        assert response.status_code == 302
+        customer = Customer.objects.get(user=user)
+        assert (customer.email, customer.id_number) == (user.email, f'USER{user.pk}')
+
+    def test_batch_sync_creates_and_updates(self, test_user, test_customer):
+        """Test sync_customers fixes drifted customers and creates missing ones in bulk"""
+        Customer.objects.filter(pk=test_customer.pk).update(email='old@example.com')
+        get_user_model().objects.create_user('newcustomer', 'new@example.com', 'pass12345',
+                                             first_name='New', last_name='Customer')
+        Customer.objects.filter(user__username='newcustomer').delete()
+
+        created, updated = sync_customers(get_user_model().objects.all())
+        assert (created, updated) == (1, 1)
+        assert Customer.objects.get(pk=test_customer.pk).email == test_user.email
+        new = Customer.objects.get(user__username='newcustomer')
+        assert new.search_text.startswith('new customer') and new.history.count() == 1
+        assert sync_customers(get_user_model().objects.all()) == (0, 0)
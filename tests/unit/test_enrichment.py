@@ -0,0 +1,92 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from inventory import enrichment
+from inventory.models import Equipment
+
+
+def batch_items(count):
+    return [
+        {
+            'name': f'Batch Amp {i}',
+            'description': 'Combo amplifier',
+            'brand': 'Fender',
+            'category': 'Amplifiers',
+            'serial': f'BATCH-{i:04d}',
+            'purchase_price': 500 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def recordings_for(items):
+    return {
+        enrichment.item_key(enrichment.normalize_item(item)): {
+            'daily_price': 20 + i, 'weekly_price': 70, 'monthly_price': 200, 'deposit_amount': 150,
+        }
+        for i, item in enumerate(items)
+    }
+
+
+@pytest.mark.django_db
+class TestBatchEnrichment:
+    def test_batch_prices_in_chunks_and_reuses_cache(self, tmp_path):
+        """Test items are priced several per request and a second run is served from the cache"""
+        items = [enrichment.normalize_item(item) for item in batch_items(25)]
+        client = enrichment.RecordedPricingClient(recordings_for(items))
+        cache = enrichment.PricingCache(tmp_path)
+
+        first = enrichment.BatchEnricher(client, cache, chunk_size=10).enrich(items)
+        assert client.requests == 3
+        assert {e.source for e in first} == {'api'}
+
+        second = enrichment.BatchEnricher(client, cache, chunk_size=10).enrich(items)
+        assert client.requests == 3
+        assert {e.source for e in second} == {'cache'}
+        assert [e.pricing for e in second] == [e.pricing for e in first]
+
+    def test_command_bulk_creates_from_recorded_responses(self, tmp_path):
+        """Test an offline batch run creates equipment with history and skips duplicate serials"""
+        items = batch_items(5)
+        items.append(dict(items[0], name='Duplicate serial'))
+        batch = tmp_path / 'batch.json'
+        batch.write_text(json.dumps(items))
+        responses = tmp_path / 'responses.json'
+        responses.write_text(json.dumps(recordings_for(items)))
+
+        out = StringIO()
+        call_command('create_inventory_with_openai', '--batch', str(batch), '--responses', str(responses),
+                     '--cache-dir', str(tmp_path / 'cache'), stdout=out, stderr=StringIO())
+
+        assert 'Successfully processed 5 items' in out.getvalue()
+        assert Equipment.objects.count() == 5
+        assert Equipment.history.filter(history_type='+').count() == 5
+        amp = Equipment.objects.get(serial_number='BATCH-0001')
+        assert str(amp.rental_price_daily) == '21.00'
+        assert amp.qr_code
+
+    def test_dry_run_replays_cache_without_saving(self, tmp_path):
+        """Test --dry-run needs no API key, makes no requests and saves nothing"""
+        items = batch_items(3)
+        batch = tmp_path / 'batch.json'
+        batch.write_text(json.dumps(items))
+        cache = enrichment.PricingCache(tmp_path / 'cache')
+        for key, pricing in recordings_for(items[:2]).items():
+            cache.set(key, pricing)
+
+        out = StringIO()
+        call_command('create_inventory_with_openai', '--batch', str(batch), '--dry-run',
+                     '--cache-dir', str(tmp_path / 'cache'), stdout=out)
+
+        assert '2 from cache, 0 from OpenAI, 1 with default pricing' in out.getvalue()
+        assert not Equipment.objects.exists()
+
+    def test_parse_multi_item_response(self):
+        """Test a multi-item completion maps answers back by index and drops malformed entries"""
+        content = 'Here you go: {"items": [{"index": 1, "daily_price": "30", "weekly_price": 100, ' \
+                  '"monthly_price": 300, "deposit_amount": 200}, {"index": 0, "daily_price": "n/a"}]}'
+        assert enrichment.parse_response(content, 2) == [
+            None, {'daily_price': 30.0, 'weekly_price': 100.0, 'monthly_price': 300.0, 'deposit_amount': 200.0},
+        ]
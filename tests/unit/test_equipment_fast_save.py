@@ -0,0 +1,76 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from inventory.models import Equipment
+from rentals.models import RentalItem
+
+
+def equipment_writes(queries):
+    return [query['sql'].split()[0] for query in queries.captured_queries
+            if '"inventory_equipment"' in query['sql'] and not query['sql'].startswith('SELECT')]
+
+
+def no_side_effects(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('side effect ran on a status-only save')
+    monkeypatch.setattr(Equipment, 'generate_qr_code', fail)
+    monkeypatch.setattr('inventory.utils.download_and_store_manual', fail)
+
+
+@pytest.mark.django_db
+class TestEquipmentFastSave:
+    def test_dirty_fields(self, test_equipment):
+        """Test changes are tracked from load until the next save"""
+        equipment = Equipment.objects.get(pk=test_equipment.pk)
+        assert not equipment.is_dirty()
+
+        equipment.status = 'maintenance'
+        equipment.notes = 'Needs strings'
+        assert equipment.get_dirty_fields() == {'status': 'available', 'notes': ''}
+
+        equipment.save(update_fields=['status'])
+        assert equipment.get_dirty_fields() == {'notes': ''}
+        equipment.save()
+        assert not equipment.is_dirty()
+
+    def test_status_change_is_one_update(self, test_equipment, monkeypatch):
+        """Test a status-only save skips the QR and manual hooks and writes one history row"""
+        Equipment.objects.filter(pk=test_equipment.pk).update(qr_code='', manual_file='')
+        equipment = Equipment.objects.get(pk=test_equipment.pk)
+        history_rows = equipment.history.count()
+        no_side_effects(monkeypatch)
+
+        equipment.status = 'maintenance'
+        with CaptureQueriesContext(connection) as queries:
+            equipment.save()
+
+        assert equipment_writes(queries) == ['UPDATE']
+        assert equipment.history.count() == history_rows + 1
+        assert Equipment.objects.get(pk=equipment.pk).status == 'maintenance'
+
+    def test_other_changes_take_the_full_path(self, test_equipment):
+        """Test saving a non-status change still runs the usual hooks"""
+        Equipment.objects.filter(pk=test_equipment.pk).update(qr_code='')
+        equipment = Equipment.objects.get(pk=test_equipment.pk)
+        equipment.status = 'maintenance'
+        equipment.name = 'Renamed'
+        equipment.save()
+        assert equipment.qr_code
+
+    def test_renting_and_quick_status_make_no_external_calls(self, client, test_staff, test_rental,
+                                                            test_equipment, monkeypatch):
+        """Test adding an item to a rental and the mobile status toggle only update the status"""
+        no_side_effects(monkeypatch)
+        Equipment.objects.filter(pk=test_equipment.pk).update(status='available', manual_file='')
+        equipment = Equipment.objects.get(pk=test_equipment.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            RentalItem.objects.create(rental=test_rental, equipment=equipment, quantity=1, price=50)
+        assert equipment_writes(queries) == ['UPDATE']
+
+        client.force_login(test_staff)
+        response = client.post(reverse('inventory:quick_status_update', args=[equipment.pk]),
+                               {'status': 'damaged'})
+        assert response.status_code == 200
+        assert Equipment.objects.get(pk=equipment.pk).status == 'damaged'
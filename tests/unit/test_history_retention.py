@@ -0,0 +1,90 @@
+import gzip
+import json
+import pytest
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+from inventory.models import Equipment
+from music_rental.history_retention import apply_retention, retention_policy
+from payments.models import Payment
+from rentals.models import Customer, Rental
+
+
+def age_history(equipment, days):
+    """Spread equipment's history rows a minute apart, starting at noon `days` ago."""
+    start = (timezone.now() - timedelta(days=days)).replace(hour=12, minute=0)
+    for offset, row in enumerate(equipment.history.order_by('history_id')):
+        equipment.history.filter(history_id=row.history_id).update(history_date=start + timedelta(minutes=offset))
+
+
+def edit(equipment, times):
+    for i in range(times):
+        equipment.notes = f'Edit {i}'
+        equipment.save(skip_manual=True)
+
+
+@pytest.mark.django_db
+class TestHistoryRetention:
+    def test_compaction_keeps_first_and_last_per_day(self, local_media, settings, test_equipment):
+        """Test old history keeps creation plus the last version of the day"""
+        settings.HISTORY_RETENTION = {'default': {'compact_after_days': 30, 'archive_after_days': None}}
+        edit(test_equipment, 5)
+        age_history(test_equipment, 60)
+        total = test_equipment.history.count()
+        first, last = test_equipment.history.order_by('history_id')[::total - 1]
+
+        result = apply_retention(Equipment)
+
+        remaining = list(test_equipment.history.order_by('history_id').values_list('history_id', flat=True))
+        assert remaining == [first.history_id, last.history_id]
+        assert result.compacted == total - 2
+        with default_storage.open(result.archive_name) as archive:
+            rows = [json.loads(line) for line in gzip.decompress(archive.read()).splitlines()]
+        assert len(rows) == total - 2
+        assert all(row['id'] == test_equipment.pk for row in rows)
+
+    def test_archival_keeps_latest_version(self, local_media, settings, test_equipment):
+        """Test archived objects keep one baseline row and recent rows are untouched"""
+        settings.HISTORY_RETENTION = {'default': {'archive_after_days': 365}}
+        edit(test_equipment, 3)
+        age_history(test_equipment, 400)
+        old_count = test_equipment.history.count()
+        edit(test_equipment, 1)
+        latest_old = test_equipment.history.order_by('-history_id')[1]
+
+        result = apply_retention(Equipment)
+
+        assert result.archived == old_count - 1
+        assert test_equipment.history.count() == 2
+        assert test_equipment.history.filter(history_id=latest_old.history_id).exists()
+
+    def test_dry_run_and_disabled_models(self, local_media, settings, test_equipment):
+        """Test --dry-run reports without deleting and None disables a model"""
+        edit(test_equipment, 3)
+        age_history(test_equipment, 60)
+        total = test_equipment.history.count()
+
+        settings.HISTORY_RETENTION = {'default': {'compact_after_days': 30}}
+        call_command('prune_history', '--dry-run', '--model', 'inventory.Equipment')
+        assert test_equipment.history.count() == total
+
+        settings.HISTORY_RETENTION = {'default': {'compact_after_days': 30}, 'inventory.Equipment': None}
+        call_command('prune_history', '--model', 'inventory.Equipment')
+        assert test_equipment.history.count() == total
+
+    def test_rentals_and_payments_need_their_own_policy(self, settings):
+        """Test only listed models are pruned and 'default' never reaches rentals or payments"""
+        assert retention_policy(Equipment) is not None
+        assert retention_policy(Customer) is not None
+        assert retention_policy(Rental) is None
+        assert retention_policy(Payment) is None
+
+        policy = {'compact_after_days': 30}
+        settings.HISTORY_RETENTION = {'default': policy}
+        assert retention_policy(Equipment) == policy
+        assert retention_policy(Rental) is None
+        assert retention_policy(Payment) is None
+
+        settings.HISTORY_RETENTION = {'default': policy, 'payments.Payment': {'archive_after_days': 2555}}
+        assert retention_policy(Payment) == {'archive_after_days': 2555}
@@ -0,0 +1,83 @@
+import pytest
+from io import BytesIO
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from inventory.images import DERIVATIVE_SIZES, derivative_url, generate_image_derivatives
+from inventory.models import Equipment
+
+
+def make_image(width=2000, height=1000, mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, (width, height), 'red').save(buffer, format='PNG')
+    return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+
+@pytest.mark.django_db
+class TestImageDerivatives:
+    def test_derivatives_built_for_each_size_and_format(self, local_media, test_equipment):
+        """Test every size is rendered in WebP and JPEG next to the original"""
+        test_equipment.main_image = make_image()
+        test_equipment.save(skip_manual=True)
+
+        data = generate_image_derivatives(test_equipment)
+
+        assert data['source'] == test_equipment.main_image.name
+        assert set(data['sizes']) == set(DERIVATIVE_SIZES)
+        for size, width in DERIVATIVE_SIZES.items():
+            entry = data['sizes'][size]
+            assert entry['width'] == width
+            assert entry['height'] == width // 2
+            for ext in ('webp', 'jpg'):
+                assert entry[ext].startswith('equipment_images/derivatives/')
+                assert default_storage.exists(entry[ext])
+
+        test_equipment.refresh_from_db()
+        assert test_equipment.image_derivatives == data
+
+    def test_small_images_are_not_upscaled(self, local_media, test_equipment):
+        """Test derivatives never exceed the original width"""
+        test_equipment.main_image = make_image(width=300, height=300, mode='RGBA')
+        test_equipment.save(skip_manual=True)
+
+        data = generate_image_derivatives(test_equipment)
+
+        assert data['sizes']['thumbnail']['width'] == 100
+        assert data['sizes']['card']['width'] == 300
+        assert data['sizes']['detail']['width'] == 300
+
+    def test_save_schedules_generation_after_commit(self, local_media, settings, test_equipment,
+                                                    django_capture_on_commit_callbacks):
+        """Test uploading a new image queues the derivative build"""
+        settings.BACKGROUND_TASKS_INLINE = True
+        with django_capture_on_commit_callbacks(execute=True):
+            test_equipment.main_image = make_image()
+            test_equipment.save(skip_manual=True)
+
+        test_equipment.refresh_from_db()
+        assert test_equipment.image_derivatives['source'] == test_equipment.main_image.name
+
+    def test_url_falls_back_to_original(self, local_media, test_equipment):
+        """Test stale or missing derivatives fall back to the original image"""
+        test_equipment.main_image = make_image()
+        test_equipment.save(skip_manual=True)
+        Equipment.objects.filter(pk=test_equipment.pk).update(image_derivatives={})
+        test_equipment.refresh_from_db()
+
+        assert derivative_url(test_equipment, 'thumbnail') == test_equipment.main_image.url
+
+    def test_picture_tag_renders_srcset(self, local_media, test_equipment):
+        """Test the template tag offers every derivative via srcset"""
+        test_equipment.main_image = make_image()
+        test_equipment.save(skip_manual=True)
+        generate_image_derivatives(test_equipment)
+
+        html = Template(
+            "{% load equipment_images %}{% equipment_picture item 'card' css_class='card-img-top' %}"
+        ).render(Context({'item': test_equipment}))
+
+        assert '<picture>' in html
+        assert 'type="image/webp"' in html
+        assert '100w' in html and '480w' in html and '1200w' in html
+        assert 'class="card-img-top"' in html
@@ -0,0 +1,100 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from inventory import invoices
+from inventory.models import Equipment
+
+INVOICE_LINES = [
+    'Order Number 41170214',
+    'Order Date 05/25/2024',
+    'Qty Item Description Total',
+    '1 SM58 Shure SM58 Cardioid Dynamic Vocal Microphone $99.00',
+    'Serial Number: SHURE58-001',
+    '2 XLR25 Pro Co 25ft XLR Cable $59.90',
+    '1 AconRemix Acon Digital Remix DL $49.00',
+    'Activation: REMIX-F6FY-FB84',
+]
+
+
+def text_pdf(path, lines):
+    """A one-page PDF with a text layer, one line per Tj."""
+    stream = 'BT /F1 10 Tf 14 TL 50 750 Td ' + ' '.join(
+        '({}) Tj T*'.format(line.replace('(', r'\(').replace(')', r'\)')) for line in lines) + ' ET'
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        '/Resources << /Font << /F1 5 0 R >> >> >>',
+        f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    out = '%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    path.write_bytes(out.encode('latin-1'))
+    return path
+
+
+def test_parse_invoice_text_layer(tmp_path):
+    """Test line items, serials and software licenses are read from the text layer"""
+    parsed = invoices.parse_invoice(str(text_pdf(tmp_path / 'invoice.pdf', INVOICE_LINES)))
+
+    assert parsed['method'] == 'text'
+    assert parsed['order_number'] == '41170214'
+    assert parsed['order_date'] == '2024-05-25'
+    assert [(item['sku'], item['serial'], item['software'], item['price']) for item in parsed['items']] == [
+        ('SM58', 'SHURE58-001', False, 99.0),
+        ('XLR25', None, False, 59.9),
+        ('AconRemix', None, True, 49.0),
+    ]
+
+
+@pytest.mark.django_db
+class TestInvoiceIngestion:
+    def test_updates_matches_and_creates_the_rest(self, tmp_path, test_category):
+        """Test matching by serial, creating unmatched items and skipping software"""
+        existing = Equipment.objects.create(
+            name='Vocal mic', description='SM58', category=test_category, brand='Shure',
+            model_number='SM58', serial_number='SHURE58-001', rental_price_daily=10,
+            rental_price_weekly=40, rental_price_monthly=120, deposit_amount=50,
+        )
+        text_pdf(tmp_path / 'invoice.pdf', INVOICE_LINES)
+
+        out = StringIO()
+        call_command('ingest_invoices', '--path', str(tmp_path), '--workers', '1', '--no-cache', stdout=out)
+
+        existing.refresh_from_db()
+        assert existing.purchase_price == Decimal('99.00')
+        assert existing.purchase_date == datetime.date(2024, 5, 25)
+        cable = Equipment.objects.get(serial_number='INV-41170214-2')
+        assert (cable.quantity, cable.purchase_price, cable.brand) == (2, Decimal('29.95'), 'Pro')
+        assert not Equipment.objects.filter(model_number='AconRemix').exists()
+        assert '1 created, 1 updated, 1 skipped' in out.getvalue()
+
+        # A second run finds everything already recorded
+        out = StringIO()
+        call_command('ingest_invoices', '--path', str(tmp_path), '--workers', '1', '--no-cache', stdout=out)
+        assert '0 created, 0 updated, 3 skipped' in out.getvalue()
+
+    def test_parse_cache_skips_known_files(self, tmp_path, monkeypatch):
+        """Test files already in the parse cache are not parsed again"""
+        pdf = str(text_pdf(tmp_path / 'invoice.pdf', INVOICE_LINES))
+        cache = invoices.ParseCache(tmp_path / 'cache')
+        first = invoices.parse_invoices([pdf], cache, workers=1)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('cached invoice parsed again')
+        monkeypatch.setattr(invoices, 'parse_invoice', fail)
+        second = invoices.parse_invoices([pdf], cache, workers=1)
+
+        assert second[0]['cached'] and not first[0]['cached']
+        assert second[0]['items'] == first[0]['items']
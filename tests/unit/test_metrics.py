@@ -0,0 +1,70 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from inventory.models import Equipment
+from music_rental import metrics
+from music_rental.middleware import MetricsMiddleware
+
+
+@pytest.fixture
+def registry():
+    metrics.registry.reset()
+    yield metrics.registry
+    metrics.registry.reset()
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    def test_middleware_records_queries_and_duplicates(self, registry, test_equipment):
+        """Test each request is timed and repeated SQL is flagged"""
+        def n_plus_one(request):
+            for _ in range(3):
+                Equipment.objects.filter(pk=test_equipment.pk).first()
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/fake/')
+        MetricsMiddleware(n_plus_one)(request)
+
+        entry = registry.snapshot()['recent'][0]
+        assert entry['path'] == '/fake/'
+        assert entry['queries'] == 3
+        assert entry['duplicates'] == 2
+        assert entry['top_duplicate_count'] == 3
+        assert entry['wall_ms'] >= entry['db_ms']
+
+    def test_cache_lookups_attributed_to_request(self, registry):
+        """Test cache hits and misses are counted per request and in totals"""
+        current, token = metrics.start_request()
+        metrics.record_cache_lookup('storage', True)
+        metrics.record_cache_lookup('storage', False)
+        metrics.finish_request(current, token, 'view', 'GET', '/', 200, 0.01)
+
+        snapshot = registry.snapshot()
+        assert snapshot['recent'][0]['cache_hits'] == 1
+        assert snapshot['recent'][0]['cache_misses'] == 1
+        assert snapshot['cache'] == {('storage', 'hit'): 1, ('storage', 'miss'): 1}
+
+    def test_prometheus_endpoint_access(self, client, settings, registry):
+        """Test the endpoint hides from strangers and exports view metrics"""
+        settings.METRICS_ALLOWED_IPS = []
+        settings.METRICS_TOKEN = 'secret'
+        assert client.get(reverse('metrics')).status_code == 404
+
+        response = client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200
+        body = response.content.decode()
+        assert '# TYPE django_view_duration_seconds histogram' in body
+        assert 'django_view_requests_total{view="metrics"}' in body
+
+    def test_admin_performance_page(self, client, registry):
+        """Test staff can see recent requests on the admin page"""
+        admin = get_user_model().objects.create_superuser('perfadmin', 'perf@example.com', 'pass12345')
+        client.force_login(admin)
+        client.get(reverse('metrics'))
+
+        response = client.get(reverse('admin:performance'))
+
+        assert response.status_code == 200
+        assert b'/internal/metrics/' in response.content
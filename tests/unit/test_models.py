@@ -49,6 +49,7 @@ class TestEquipmentModel:
         assert test_equipment.history.count() >= 2  # Creation + status change
         assert test_equipment.history.latest().status == 'maintenance'
 
+    @pytest.mark.real_side_effects
     def test_qr_code_generation(self, test_equipment):
         """Test QR code generation"""
         test_equipment.generate_qr_code()
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from payments import checkout, gateways
+from payments.models import Payment
+
+
+@pytest.fixture
+def fake_gateways(settings):
+    settings.PAYMENT_GATEWAY_FAKE = True
+    settings.BACKGROUND_TASKS_INLINE = True
+
+
+@pytest.mark.django_db
+class TestPaymentGateways:
+    def test_stripe_checkout_is_idempotent_and_captures(self, client, fake_gateways, test_rental,
+                                                        django_capture_on_commit_callbacks):
+        """Test a repeated checkout reuses the payment intent and capture completes the payment"""
+        client.force_login(test_rental.customer.user)
+        url = reverse('payments:stripe_create', args=[test_rental.pk])
+
+        first = client.post(url).json()
+        second = client.post(url).json()
+        assert first == second
+        payment = Payment.objects.get()
+        assert (payment.status, payment.amount, payment.payment_method) == ('pending', Decimal('350.00'), 'stripe')
+        assert payment.stripe_transaction.payment_intent_id.startswith('pi_fake_')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post(first['capture_url'])
+        assert response.json()['redirect_url'] == reverse('payments:success')
+        payment.refresh_from_db()
+        assert payment.status == 'completed' and payment.transaction_id.startswith('ch_fake_')
+        assert payment.stripe_transaction.stripe_charge_id == payment.transaction_id
+
+    def test_paypal_checkout_round_trip(self, client, fake_gateways, test_rental,
+                                        django_capture_on_commit_callbacks):
+        """Test the customer is sent to PayPal and the order is captured on return"""
+        client.force_login(test_rental.customer.user)
+
+        response = client.post(reverse('payments:paypal_create', args=[test_rental.pk]))
+        assert response.status_code == 302 and 'paypal.com/checkoutnow?token=' in response.url
+        token = response.url.split('token=')[1]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.get(reverse('payments:paypal_return'), {'token': token})
+        assert response.url == reverse('payments:success')
+        payment = Payment.objects.get()
+        assert payment.status == 'completed' and payment.transaction_id
+        assert payment.paypal_transaction.payment_completed_at is not None
+
+    def test_declined_payment_gets_a_new_key_next_time(self, fake_gateways, test_rental):
+        """Test a declined checkout is marked failed and a retry doesn't reuse its key"""
+        with pytest.raises(gateways.GatewayError):
+            checkout.start_checkout(test_rental, 'stripe', amount='6.66')
+        failed = Payment.objects.get()
+        assert failed.status == 'failed'
+
+        assert checkout.checkout_key(test_rental, 'rental', '6.66') == f"{failed.idempotency_key}-2"
+        assert checkout.checkout_key(test_rental, 'rental', '10') == f"rental-{test_rental.pk}-rental-10.00"
+
+    def test_clients_are_shared(self, fake_gateways, client, test_rental):
+        """Test gateways reuse one pooled client per API host and other customers can't pay"""
+        stripe = gateways.get_gateway('stripe')
+        assert gateways.http_client(stripe.base_url) is gateways.http_client(gateways.get_gateway('stripe').base_url)
+        assert gateways.http_client(stripe.base_url) is not gateways.http_client(gateways.get_gateway('paypal').base_url)
+
+        stranger = get_user_model().objects.create_user(username='stranger', password='x')
+        client.force_login(stranger)
+        assert client.post(reverse('payments:stripe_create', args=[test_rental.pk])).status_code == 404
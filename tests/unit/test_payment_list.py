@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from payments.listing import keyset_page
+from payments.models import Payment
+
+
+def make_payments(rental, count, **kwargs):
+    """count payments one minute apart, the last one newest."""
+    now = timezone.now()
+    payments = [Payment.objects.create(rental=rental, amount=10, payment_type='rental',
+                                       payment_method=kwargs.get('method', 'cash'),
+                                       status=kwargs.get('status', 'completed'))
+                for _ in range(count)]
+    for i, payment in enumerate(payments):
+        Payment.objects.filter(pk=payment.pk).update(payment_date=now - timezone.timedelta(minutes=count - i))
+    return payments
+
+
+@pytest.mark.django_db
+class TestPaymentList:
+    def test_keyset_pages_walk_forward_and_back(self, test_rental):
+        """Test after/before cursors cover every payment once, in order"""
+        make_payments(test_rental, 7)
+        expected = list(Payment.objects.order_by('-payment_date', '-pk').values_list('pk', flat=True))
+
+        seen, page = [], keyset_page(Payment.objects.all(), size=3)
+        pages = [page]
+        while True:
+            seen += [payment.pk for payment in page.payments]
+            if not page.next_cursor:
+                break
+            page = keyset_page(Payment.objects.all(), after=page.next_cursor, size=3)
+            pages.append(page)
+        assert seen == expected
+        assert pages[0].previous_cursor is None
+
+        back = keyset_page(Payment.objects.all(), before=pages[-1].previous_cursor, size=3)
+        assert [payment.pk for payment in back.payments] == [payment.pk for payment in pages[-2].payments]
+
+    def test_filters_and_totals(self, client, test_staff, test_rental):
+        """Test the filters narrow both the rows and the totals"""
+        make_payments(test_rental, 3)
+        make_payments(test_rental, 2, method='stripe', status='pending')
+        client.force_login(test_staff)
+
+        response = client.get(reverse('payments:list'), {'status': 'pending', 'method': 'stripe'})
+
+        assert response.status_code == 200
+        assert len(response.context['payments']) == 2
+        totals = response.context['totals']
+        assert totals['count'] == 2 and totals['total'] == Decimal('20') and totals['completed'] is None
+
+        response = client.get(reverse('payments:list'), {'customer': 'Test'})
+        assert response.context['totals']['count'] == 5
+
+    def test_query_count_does_not_grow_with_page(self, client, test_staff, test_rental,
+                                                 django_assert_max_num_queries):
+        """Test a page costs the same number of queries however many payments it shows"""
+        make_payments(test_rental, 60)
+        client.force_login(test_staff)
+
+        with django_assert_max_num_queries(6):
+            response = client.get(reverse('payments:list'))
+        assert len(response.context['payments']) == 50
+        assert response.context['next_url']
+
+        response = client.get(reverse('payments:list') + response.context['next_url'])
+        assert len(response.context['payments']) == 10
+        assert response.context['next_url'] is None and response.context['previous_url']
@@ -0,0 +1,91 @@
+import functools
+import json
+import threading
+from decimal import Decimal
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from payments.models import Payment, PayPalTransaction, StripeTransaction
+
+STRIPE_EXPORT = """id,PaymentIntent ID,Created (UTC),Amount,Amount Refunded,Status,Customer ID
+ch_paid,pi_paid,{today} 10:00,350.00,0.00,Paid,cus_1
+ch_refund,pi_refund,{today} 11:00,100.00,40.00,Paid,cus_1
+ch_wrong_amount,,{today} 12:00,99.00,0.00,Paid,cus_1
+ch_unknown,,{today} 13:00,10.00,0.00,Paid,cus_2
+"""
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def stripe_payment(rental, charge_id, amount, status='pending'):
+    payment = Payment.objects.create(rental=rental, amount=amount, payment_type='rental',
+                                     payment_method='stripe', status=status)
+    StripeTransaction.objects.create(payment=payment, stripe_charge_id=charge_id)
+    return payment
+
+
+@pytest.mark.django_db
+class TestPaymentReconciliation:
+    def test_stripe_csv_export(self, tmp_path, test_rental):
+        """Test statuses and refunds are corrected and the rest is reported"""
+        paid = stripe_payment(test_rental, 'ch_paid', 350)
+        refunded = stripe_payment(test_rental, 'ch_refund', 100, status='completed')
+        wrong_amount = stripe_payment(test_rental, 'ch_wrong_amount', 98, status='completed')
+        missing = stripe_payment(test_rental, 'ch_missing', 20, status='completed')
+        export = tmp_path / 'stripe.csv'
+        export.write_text(STRIPE_EXPORT.format(today=timezone.localdate().isoformat()))
+        report = tmp_path / 'report.csv'
+
+        out = StringIO()
+        call_command('reconcile_payments', 'stripe', str(export), '--dry-run', stdout=out)
+        assert 'Dry run: 4 records, 3 matched' in out.getvalue()
+        paid.refresh_from_db()
+        assert paid.status == 'pending'
+
+        out = StringIO()
+        call_command('reconcile_payments', 'stripe', str(export), '--report', str(report), stdout=out)
+        assert ('Reconciled 4 records, 3 matched, 2 status and 1 refund differences, 1 amount differences, '
+                '1 unknown, 1 missing from export, 2 payments updated') in out.getvalue()
+
+        paid.refresh_from_db()
+        refunded.refresh_from_db()
+        wrong_amount.refresh_from_db()
+        assert paid.status == 'completed'
+        assert (refunded.status, refunded.refund_amount) == ('refunded', Decimal('40.00'))
+        assert refunded.refund_date is not None and refunded.history.count() == 2
+        assert wrong_amount.amount == Decimal('98.00')
+        assert f'missing,,{missing.pk},completed,' in report.read_text()
+
+    def test_export_from_local_server(self, tmp_path, test_rental):
+        """Test a JSON export served over HTTP matches PayPal orders and captures"""
+        payment = Payment.objects.create(rental=test_rental, amount=350, payment_type='rental',
+                                         payment_method='paypal', transaction_id='CAPTURE-1')
+        order_payment = Payment.objects.create(rental=test_rental, amount=120, payment_type='deposit',
+                                               payment_method='paypal')
+        PayPalTransaction.objects.create(payment=order_payment, paypal_order_id='ORDER-2')
+        (tmp_path / 'paypal.json').write_text(json.dumps({'data': [
+            {'transaction_id': 'CAPTURE-1', 'gross': '350.00', 'status': 'Completed'},
+            {'transaction_id': 'CAPTURE-2', 'order_id': 'ORDER-2', 'gross': '120.00', 'status': 'Denied'},
+        ]}))
+
+        handler = functools.partial(QuietHandler, directory=str(tmp_path))
+        server = HTTPServer(('127.0.0.1', 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            out = StringIO()
+            call_command('reconcile_payments', 'paypal', f'http://127.0.0.1:{server.server_port}/paypal.json',
+                         stdout=out)
+        finally:
+            server.shutdown()
+
+        assert '2 records, 2 matched, 2 status' in out.getvalue()
+        payment.refresh_from_db()
+        order_payment.refresh_from_db()
+        assert (payment.status, order_payment.status) == ('completed', 'failed')
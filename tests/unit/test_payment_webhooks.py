@@ -0,0 +1,150 @@
+import json
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.db.models import QuerySet
+from django.urls import reverse
+from payments import events, webhooks
+from payments.models import Payment, PaymentEvent, PayPalTransaction, StripeTransaction, VenmoTransaction
+
+SECRETS = {'stripe': 'whsec_test', 'paypal': 'paypal_test', 'venmo': 'venmo_test'}
+
+
+@pytest.fixture
+def webhook_secrets(settings):
+    settings.PAYMENT_WEBHOOK_SECRETS = SECRETS
+    settings.PAYMENT_GATEWAY_FAKE = True
+    settings.PAYMENT_GATEWAYS = dict(settings.PAYMENT_GATEWAYS, paypal={'WEBHOOK_ID': 'WH-TEST'})
+
+
+def make_payment(rental, method):
+    return Payment.objects.create(rental=rental, amount=350, payment_type='rental', payment_method=method)
+
+
+@pytest.mark.django_db
+class TestPaymentWebhooks:
+    def test_endpoint_stores_once_and_rejects_bad_signatures(self, client, webhook_secrets):
+        """Test a signed delivery is stored, a retry is dropped and a forged one refused"""
+        body = json.dumps({'id': 'evt_1', 'type': 'charge.succeeded', 'data': {'object': {}}}).encode()
+        url = reverse('payments:webhook', args=['stripe'])
+        post = lambda headers: client.post(url, body, content_type='application/json', headers=headers)
+
+        assert post(webhooks.sign('stripe', body)).json() == {'received': 'evt_1', 'duplicate': False}
+        assert post(webhooks.sign('stripe', body)).json()['duplicate'] is True
+        assert post(webhooks.sign('stripe', body, timestamp=1)).status_code == 400
+        assert post({'Stripe-Signature': 't=1,v1=forged'}).status_code == 400
+        assert PaymentEvent.objects.count() == 1
+        assert PaymentEvent.objects.get().processed_at is None
+
+    def test_paypal_deliveries_are_verified_by_paypal(self, client, webhook_secrets):
+        """Test PayPal deliveries are checked through the verify API and unverifiable providers are refused"""
+        body = json.dumps({'id': 'WH-1', 'event_type': 'PAYMENT.CAPTURE.COMPLETED', 'resource': {}}).encode()
+        url = reverse('payments:webhook', args=['paypal'])
+        headers = webhooks.sign('paypal', body)
+
+        response = client.post(url, body, content_type='application/json', headers=headers)
+        assert response.json() == {'received': 'WH-1', 'duplicate': False}
+        tampered = body.replace(b'WH-1', b'WH-2')
+        assert client.post(url, tampered, content_type='application/json', headers=headers).status_code == 400
+        assert client.post(url, body, content_type='application/json').status_code == 400
+
+        venmo = json.dumps({'id': 'v-1', 'type': 'payment.completed', 'data': {}}).encode()
+        assert client.post(reverse('payments:webhook', args=['venmo']), venmo,
+                           content_type='application/json').status_code == 400
+        assert list(PaymentEvent.objects.values_list('event_id', flat=True)) == ['WH-1']
+
+    def test_replayed_fixtures_update_payments(self, test_rental, webhook_secrets):
+        """Test the saved payloads update each provider's payment and transaction"""
+        stripe = make_payment(test_rental, 'stripe')
+        StripeTransaction.objects.create(payment=stripe, stripe_charge_id='', payment_intent_id='pi_3Pfixture')
+        paypal = make_payment(test_rental, 'paypal')
+        PayPalTransaction.objects.create(payment=paypal, paypal_order_id='5O190127TN364715T')
+        venmo = make_payment(test_rental, 'venmo')
+        VenmoTransaction.objects.create(payment=venmo, venmo_transaction_id='4081923310592101234')
+
+        out = StringIO()
+        call_command('replay_webhooks', '--process', stdout=out)
+        assert 'Replayed 5 webhooks: 5 stored, 0 duplicates' in out.getvalue()
+        assert 'Processed 4 events, 1 ignored, 0 failed' in out.getvalue()
+
+        # The refund was replayed before the success event and wins
+        stripe.refresh_from_db()
+        assert (stripe.status, stripe.refund_amount, stripe.refund_transaction_id) == \
+            ('refunded', Decimal('50.00'), 're_3Pfixture')
+        assert (stripe.stripe_transaction.stripe_charge_id, stripe.stripe_transaction.card_last4) == \
+            ('ch_3Pfixture', '4242')
+        paypal.refresh_from_db()
+        assert (paypal.status, paypal.transaction_id) == ('completed', '2GG279541U471931P')
+        assert paypal.paypal_transaction.payment_completed_at is not None
+        venmo.refresh_from_db()
+        assert venmo.status == 'completed' and venmo.venmo_transaction.venmo_username == 'test-user'
+        assert stripe.history.count() == 2
+
+        out = StringIO()
+        call_command('replay_webhooks', stdout=out)
+        assert '0 stored, 5 duplicates' in out.getvalue()
+
+    def test_unmatched_events_stay_pending(self, test_rental, webhook_secrets, django_assert_max_num_queries):
+        """Test events for unknown payments are retried, and a batch costs a fixed number of queries"""
+        for i in range(20):
+            body = json.dumps({'id': f'venmo-{i}', 'type': 'payment.completed',
+                               'data': {'id': f'tx-{i}', 'metadata': {'payment_id': 0}}}).encode()
+            webhooks.store('venmo', body)
+
+        with django_assert_max_num_queries(8):
+            result = events.process_events()
+        assert (result.processed, result.failed) == (0, 20)
+        assert events.pending_events().count() == 20
+
+        payment = make_payment(test_rental, 'venmo')
+        PaymentEvent.objects.filter(event_id='venmo-3').update(
+            payload={'id': 'venmo-3', 'type': 'payment.completed',
+                     'data': {'id': 'tx-3', 'metadata': {'payment_id': payment.pk}}})
+        result = events.process_events(max_attempts=2)
+        assert (result.processed, result.failed) == (1, 19)
+        payment.refresh_from_db()
+        assert payment.status == 'completed' and payment.venmo_transaction.venmo_transaction_id == 'tx-3'
+        assert events.pending_events(max_attempts=2).count() == 0
+
+    def test_failed_batch_uses_up_attempts(self, test_rental, monkeypatch):
+        """Test a batch failing in the database is rolled back but still charged an attempt"""
+        payment = make_payment(test_rental, 'venmo')
+        body = json.dumps({'id': 'venmo-1', 'type': 'payment.completed',
+                           'data': {'id': 'tx-1', 'metadata': {'payment_id': payment.pk}}}).encode()
+        webhooks.store('venmo', body)
+
+        def broken(*args, **kwargs):
+            raise DatabaseError("deadlock detected")
+        monkeypatch.setattr(events, 'bulk_update_with_history', broken)
+
+        assert events.process_events().failed == 1
+        event = PaymentEvent.objects.get()
+        assert (event.attempts, event.processed_at) == (1, None)
+        assert 'deadlock detected' in event.error
+        payment.refresh_from_db()
+        assert payment.status == 'pending' and not VenmoTransaction.objects.exists()
+        assert events.pending_events(max_attempts=1).count() == 0
+
+    def test_batches_for_one_payment_never_step_back(self, test_rental, monkeypatch):
+        """Test a success applied after a refund in another batch leaves the payment refunded"""
+        payment = make_payment(test_rental, 'venmo')
+        for event_id, kind in (('venmo-refund', 'payment.refunded'), ('venmo-paid', 'payment.completed')):
+            webhooks.store('venmo', json.dumps({'id': event_id, 'type': kind, 'data': {
+                'id': 'tx-1', 'amount': 350, 'refund_id': 'rf-1', 'metadata': {'payment_id': payment.pk}}}).encode())
+        locked = []
+        select_for_update = QuerySet.select_for_update
+        monkeypatch.setattr(QuerySet, 'select_for_update',
+                            lambda qs, *args, **kwargs: locked.append(qs.model) or select_for_update(qs, *args, **kwargs))
+
+        # The refund's batch commits first, then the success's batch reads the payment again
+        for event_id in ('venmo-refund', 'venmo-paid'):
+            with transaction.atomic():
+                events.apply_events(list(PaymentEvent.objects.filter(event_id=event_id)))
+
+        payment.refresh_from_db()
+        assert (payment.status, payment.refund_transaction_id) == ('refunded', 'rf-1')
+        assert locked == [Payment, Payment]
+        assert not events.pending_events().exists()
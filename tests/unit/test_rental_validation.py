@@ -0,0 +1,89 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.forms import modelform_factory
+from django.test.utils import CaptureQueriesContext
+from inventory.models import Equipment
+from music_rental import benchmarks
+from rentals.models import Rental
+
+
+def customer_lookups(queries):
+    return [query for query in queries.captured_queries if '"rentals_customer"' in query['sql']]
+
+
+@pytest.mark.django_db
+class TestRentalValidation:
+    def test_internal_save_skips_full_clean_queries(self, test_rental):
+        """Test a totals update checks nothing in the database, while validate=True still does"""
+        rental = Rental.objects.get(pk=test_rental.pk)
+        rental.total_price = 400
+
+        with CaptureQueriesContext(connection) as queries:
+            rental.save()
+        assert not customer_lookups(queries)
+
+        rental.notes = 'From the form'
+        with CaptureQueriesContext(connection) as queries:
+            rental.save(validate=True)
+        assert customer_lookups(queries)
+
+    def test_changed_fields_are_still_checked(self, test_rental):
+        """Test moved dates and status changes are validated"""
+        rental = Rental.objects.get(pk=test_rental.pk)
+        rental.end_date = rental.start_date - rental.start_date.resolution
+        with pytest.raises(ValidationError):
+            rental.save()
+
+        rental = Rental.objects.get(pk=test_rental.pk)
+        rental.status = 'completed'
+        rental.save()
+        rental.status = 'active'
+        with pytest.raises(ValidationError) as excinfo:
+            rental.save()
+        assert 'status' in excinfo.value.message_dict
+        assert Rental.objects.get(pk=test_rental.pk).status == 'completed'
+
+    def test_forms_report_forbidden_transitions(self, test_rental):
+        """Test a forbidden status change is a form error (as in the admin) and validate=True refuses it"""
+        Rental.objects.filter(pk=test_rental.pk).update(status='completed')
+        rental = Rental.objects.get(pk=test_rental.pk)
+        form = modelform_factory(Rental, fields=['status'])({'status': 'active'}, instance=rental)
+        assert not form.is_valid()
+        assert 'status' in form.errors
+
+        rental = Rental.objects.get(pk=test_rental.pk)
+        rental.status = 'pending'
+        with pytest.raises(ValidationError) as excinfo:
+            rental.save(validate=True)
+        assert 'status' in excinfo.value.message_dict
+
+    def test_mark_as_returned_checks_status_first(self, test_rental):
+        """Test returning a pending rental is refused before any equipment is released"""
+        Rental.objects.filter(pk=test_rental.pk).update(status='pending')
+        rental = Rental.objects.get(pk=test_rental.pk)
+        with pytest.raises(ValidationError):
+            rental.mark_as_returned()
+        assert Equipment.objects.get(pk=rental.items.get().equipment_id).status == 'rented'
+
+    def test_cancel_refuses_completed_rentals(self, client, test_staff, test_rental):
+        """Test the cancel view follows STATUS_TRANSITIONS instead of failing on save"""
+        Rental.objects.filter(pk=test_rental.pk).update(status='completed')
+        client.force_login(test_staff)
+        response = client.post(f'/rentals/{test_rental.pk}/cancel/')
+        assert response.status_code == 302
+        assert Rental.objects.get(pk=test_rental.pk).status == 'completed'
+
+    def test_rental_mutation_benchmarks(self, test_rental, test_category, settings):
+        """Test the rental mutation benchmarks run and stay within their query budget"""
+        settings.BACKGROUND_TASKS_INLINE = True
+        Equipment.objects.create(name='Spare', brand='Test', category=test_category, serial_number='SPARE',
+                                 rental_price_daily=10, rental_price_weekly=40, rental_price_monthly=120,
+                                 deposit_amount=50)
+        client = benchmarks.benchmark_client()
+
+        results = {}
+        for benchmark in benchmarks.get_benchmarks(['remove_rental_item', 'rental_cancel']):
+            results[benchmark.name] = benchmarks.run_benchmark(benchmark, client, iterations=1, warmup=0)
+        assert all(result['status'] == 302 for result in results.values())
+        assert results['rental_cancel']['queries'] <= 12
@@ -0,0 +1,93 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from reports import facts, utilization
+from inventory.models import Category
+from reports.models import EquipmentDailyFact
+from rentals.models import Rental
+
+
+@pytest.mark.django_db
+class TestReports:
+    def test_full_refresh_builds_daily_facts(self, test_rental, test_equipment):
+        """Test each rental day gets a fact and the report sums them back up"""
+        result = facts.refresh_equipment_facts()
+
+        assert result.facts == 8
+        totals = EquipmentDailyFact.objects.aggregate(revenue=Sum('revenue'), units=Sum('units_rented'))
+        assert totals == {'revenue': Decimal('350.00'), 'units': 8}
+
+        [row] = utilization.equipment_report(test_rental.start_date, test_rental.end_date)
+        assert row['id'] == test_equipment.id
+        assert (row['utilization'], row['revenue'], row['rentals'], row['average_days']) == (
+            1.0, Decimal('350.00'), 1, 8.0)
+
+    def test_incremental_refresh_follows_changes(self, test_rental):
+        """Test only changed rentals are rebuilt, including moved dates and deletions"""
+        facts.refresh_equipment_facts()
+        # Age every change past the refresh overlap
+        yesterday = timezone.now() - timedelta(days=1)
+        Rental.objects.update(updated_at=yesterday)
+        Rental.history.update(history_date=yesterday)
+        assert facts.refresh_equipment_facts().start is None
+
+        old_end = test_rental.end_date
+        test_rental.end_date = test_rental.start_date + timedelta(days=1)
+        test_rental.save()
+        EquipmentDailyFact.objects.update(units_rented=0)  # the rebuild replaces these
+        result = facts.refresh_equipment_facts()
+        assert (result.start, result.end) == (test_rental.start_date, old_end)
+        assert list(EquipmentDailyFact.objects.values_list('units_rented', flat=True)) == [1, 1]
+
+        test_rental.delete()
+        facts.refresh_equipment_facts()
+        assert not EquipmentDailyFact.objects.exists()
+
+    def test_category_report_uses_owned_quantity(self, test_rental, test_category, test_equipment):
+        """Test category utilization divides by every unit the category owns"""
+        test_equipment.quantity = 2
+        test_equipment.save()
+        facts.refresh_equipment_facts()
+
+        [row] = utilization.category_report(test_rental.start_date, test_rental.end_date)
+        assert (row['name'], row['quantity'], row['utilization']) == (test_category.name, 2, 0.5)
+
+    def test_incremental_refresh_follows_category_moves(self, test_rental, test_category, test_equipment):
+        """Test moving equipment to another category moves its existing facts without a full rebuild"""
+        facts.refresh_equipment_facts()
+        yesterday = timezone.now() - timedelta(days=1)
+        Rental.objects.update(updated_at=yesterday)
+        Rental.history.update(history_date=yesterday)
+
+        drums = Category.objects.create(name='Drums')
+        test_equipment.category = drums
+        test_equipment.save()
+        result = facts.refresh_equipment_facts()
+
+        assert (result.start, result.recategorized) == (None, 8)
+        rows = {row['name']: row for row in utilization.category_report(test_rental.start_date, test_rental.end_date)}
+        assert rows['Drums']['revenue'] == Decimal('350.00')
+        assert rows[test_category.name]['revenue'] == 0
+
+    def test_admin_report_exports(self, client, test_staff, test_rental):
+        """Test the admin report page renders and exports CSV and JSON"""
+        out = StringIO()
+        call_command('refresh_report_facts', '--full', stdout=out)
+        assert 'Rebuilt 8 daily facts' in out.getvalue()
+        client.force_login(test_staff)
+        url = reverse('roknsound_admin:utilization_report')
+        params = {'start': test_rental.start_date, 'end': test_rental.end_date, 'group': 'equipment'}
+
+        assert client.get(url, params).status_code == 200
+        csv_response = client.get(url, {**params, 'format': 'csv'})
+        assert csv_response['Content-Type'] == 'text/csv'
+        assert csv_response.content.decode().splitlines()[0] == ','.join(utilization.COLUMNS)
+        data = json.loads(client.get(url, {**params, 'format': 'json'}).content)
+        assert data['rows'][0]['revenue'] == '350.00'
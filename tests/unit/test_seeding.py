@@ -0,0 +1,42 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from inventory.models import Equipment, MaintenanceRecord
+from payments.models import Payment
+from rentals.models import Customer, Rental, RentalItem
+from music_rental.seeding import seed_dataset
+
+
+@pytest.mark.django_db
+class TestSeeding:
+    def test_seed_dataset_creates_linked_rows(self):
+        """Test every customer gets a user and profile and rentals carry items"""
+        counts = seed_dataset(equipment=30, customers=10, rentals=40, payments=60, seed=1)
+
+        assert counts['equipment'] == Equipment.objects.count() == 30
+        assert counts['rentals'] == Rental.objects.count() == 40
+        assert counts['payments'] == Payment.objects.count() == 60
+        assert counts['maintenance_records'] == MaintenanceRecord.objects.count() == 15
+        assert counts['rental_items'] == RentalItem.objects.count() >= 40
+        assert not Customer.objects.filter(user__isnull=True).exists()
+        assert not Customer.objects.filter(user__profile__customer_info__isnull=True).exists()
+        # Seeding bypasses the per-save hooks
+        assert not Equipment.objects.exclude(qr_code='').exclude(qr_code__isnull=True).exists()
+        assert Equipment.history.count() == 0
+
+    def test_same_seed_same_data(self):
+        """Test a seed reproduces the same catalog"""
+        seed_dataset(equipment=20, customers=5, rentals=10, payments=10, seed=7)
+        first = list(Equipment.objects.order_by('serial_number').values_list('name', 'rental_price_daily'))
+        Equipment.objects.all().delete()
+
+        seed_dataset(equipment=20, customers=0, rentals=0, payments=0, seed=7)
+        second = list(Equipment.objects.order_by('serial_number').values_list('name', 'rental_price_daily'))
+
+        assert first == second
+
+    def test_command_refuses_without_debug(self, settings):
+        """Test seed_scale won't run against a production configuration by accident"""
+        settings.DEBUG = False
+        with pytest.raises(CommandError):
+            call_command('seed_scale', '--scale', 'tiny')
@@ -0,0 +1,83 @@
+import pytest
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models.fields.files import FieldFile
+from music_rental.storage_backends import CachedFileSystemStorage, file_metadata
+
+
+@pytest.fixture
+def storage(tmp_path):
+    cache.clear()
+    CachedFileSystemStorage._local_cache.clear()
+    return CachedFileSystemStorage(location=str(tmp_path), base_url='/media/')
+
+
+class TestCachedStorage:
+    def test_url_is_generated_once(self, storage):
+        """Test repeated .url calls are served from the cache"""
+        with mock.patch.object(FileSystemStorage, 'url', return_value='/media/a.png') as url:
+            assert storage.url('a.png') == '/media/a.png'
+            assert storage.url('a.png') == '/media/a.png'
+        assert url.call_count == 1
+
+    def test_metadata_is_cached_and_invalidated_on_write(self, storage):
+        """Test exists/size come from one lookup and writes drop the cached entry"""
+        name = storage.save('manuals/m.pdf', ContentFile(b'12345'))
+        with mock.patch.object(CachedFileSystemStorage, '_fetch_metadata',
+                               wraps=storage._fetch_metadata) as fetch:
+            assert storage.exists(name)
+            assert storage.size(name) == 5
+            assert storage.etag(name)
+            assert fetch.call_count == 1
+
+            storage.delete(name)
+            assert not storage.exists(name)
+            assert fetch.call_count == 2
+
+    def test_exists_many_batches_misses(self, storage):
+        """Test a batch lookup fetches only names not already cached"""
+        storage.save('a.txt', ContentFile(b'a'))
+        storage.exists('a.txt')
+        with mock.patch.object(CachedFileSystemStorage, '_fetch_metadata_batch',
+                               wraps=storage._fetch_metadata_batch) as batch:
+            result = storage.exists_many(['a.txt', 'b.txt', 'c.txt'])
+        assert result == {'a.txt': True, 'b.txt': False, 'c.txt': False}
+        batch.assert_called_once_with(['b.txt', 'c.txt'])
+
+    def test_available_name_ignores_cached_misses(self, storage, tmp_path):
+        """Test a file created behind the cache's back is never overwritten"""
+        assert not storage.exists('dup.txt')
+        (tmp_path / 'dup.txt').write_bytes(b'original')
+
+        name = storage.save('dup.txt', ContentFile(b'new'))
+
+        assert name != 'dup.txt'
+        assert (tmp_path / 'dup.txt').read_bytes() == b'original'
+
+    def test_other_process_deletes_are_seen_after_local_timeout(self, storage, settings):
+        """Test the in-memory copy is rechecked against the shared cache once it expires"""
+        settings.STORAGE_CACHE_LOCAL_TIMEOUT = 5
+        name = storage.save('gone.txt', ContentFile(b'x'))
+        with mock.patch('music_rental.storage_backends.time.monotonic', return_value=1000):
+            assert storage.exists(name)
+        # Another process deletes the file and clears the shared cache only
+        FileSystemStorage.delete(storage, name)
+        cache.delete(storage._cache_key('meta', name))
+        with mock.patch('music_rental.storage_backends.time.monotonic', return_value=1004):
+            assert storage.exists(name)
+        with mock.patch('music_rental.storage_backends.time.monotonic', return_value=1006):
+            assert not storage.exists(name)
+
+    def test_file_metadata_batches_per_storage(self, storage):
+        """Test file_metadata looks a list of files up in one batch"""
+        storage.save('a.txt', ContentFile(b'abc'))
+        files = [FieldFile(None, mock.Mock(storage=storage), name) for name in ('a.txt', 'b.txt')]
+        files.append(FieldFile(None, mock.Mock(storage=storage), ''))
+        with mock.patch.object(CachedFileSystemStorage, '_fetch_metadata_batch',
+                               wraps=storage._fetch_metadata_batch) as batch:
+            result = file_metadata(files)
+        batch.assert_called_once_with(['a.txt', 'b.txt'])
+        assert result['a.txt']['size'] == 3
+        assert not result['b.txt']['exists']
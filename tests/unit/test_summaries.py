@@ -0,0 +1,73 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from payments.models import Payment
+from rentals.models import Rental
+from reports import summaries
+from reports.models import CustomerBalanceSummary, DailyRevenueSummary, RentalStatusSummary
+
+
+def age_changes():
+    """Move every change past the refresh overlap, as if made before the last run."""
+    yesterday = timezone.now() - timedelta(days=1)
+    Rental.objects.update(updated_at=yesterday)
+    Rental.history.update(history_date=yesterday)
+    Payment.objects.update(updated_at=yesterday)
+    Payment.history.update(history_date=yesterday)
+
+
+@pytest.mark.django_db
+class TestSummaries:
+    def test_full_refresh(self, test_payment, test_customer):
+        """Test each summary table is built from rentals and payments"""
+        summaries.refresh_summaries()
+
+        today = DailyRevenueSummary.objects.get()
+        assert (today.payments, today.collected, today.net) == (1, Decimal('350.00'), Decimal('350.00'))
+        assert list(RentalStatusSummary.objects.values_list('status', 'rentals')) == [('active', 1)]
+        balance = CustomerBalanceSummary.objects.get(customer=test_customer)
+        assert (balance.billed, balance.paid, balance.balance, balance.open_rentals) == (
+            Decimal('350.00'), Decimal('350.00'), Decimal('0.00'), 1)
+
+    def test_incremental_refresh_only_touches_changes(self, test_payment, test_customer):
+        """Test unchanged data is skipped and changed payments and rentals are picked up"""
+        summaries.refresh_summaries()
+        age_changes()
+        assert all(result.skipped for result in summaries.refresh_summaries())
+
+        test_payment.status = 'refunded'
+        test_payment.refund_amount = Decimal('100.00')
+        test_payment.refund_date = timezone.now()
+        test_payment.save()
+        results = {result.name: result for result in summaries.refresh_summaries()}
+        assert not results['daily revenue'].skipped and not results['customer balances'].skipped
+        assert results['rentals by status'].skipped
+        assert DailyRevenueSummary.objects.get().net == Decimal('250.00')
+        assert CustomerBalanceSummary.objects.get(customer=test_customer).balance == Decimal('350.00')
+
+        test_payment.rental.delete()
+        summaries.refresh_summaries()
+        assert not DailyRevenueSummary.objects.exists()
+        assert not RentalStatusSummary.objects.exists()
+        assert not CustomerBalanceSummary.objects.exists()
+
+    def test_summary_page_reads_summary_tables(self, client, test_staff, test_payment):
+        """Test the admin summary page shows refreshed figures without touching rentals or payments"""
+        out = StringIO()
+        call_command('refresh_reports', stdout=out)
+        assert 'daily revenue: 1 rows rebuilt' in out.getvalue()
+        client.force_login(test_staff)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('roknsound_admin:summary_report'))
+        assert response.status_code == 200
+        assert response.context['revenue_totals']['collected'] == Decimal('350.00')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        assert '"rentals_rental"' not in sql and '"payments_payment"' not in sql
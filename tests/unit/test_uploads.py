@@ -0,0 +1,145 @@
+import pytest
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from inventory import uploads
+from inventory.models import EquipmentAttachment, UploadSession
+
+CHUNK = 1024
+
+
+@pytest.fixture
+def small_chunks(settings, local_media):
+    settings.UPLOAD_CHUNK_SIZE = CHUNK
+    return local_media
+
+
+def payload(size):
+    return bytes(i % 251 for i in range(size))
+
+
+def start_upload(client, equipment, size, content_type='application/pdf'):
+    response = client.post(
+        reverse('inventory:upload_session_create', kwargs={'pk': equipment.pk}),
+        {'filename': 'manual.pdf', 'size': size, 'content_type': content_type, 'description': 'Manual'},
+    )
+    return response
+
+
+@pytest.mark.django_db
+class TestChunkedUploads:
+    def test_out_of_order_chunks_assemble_into_attachment(self, small_chunks, test_user, test_equipment):
+        """Test chunks sent in any order become one attachment with the original bytes"""
+        client = Client()
+        client.force_login(test_user)
+        data = payload(CHUNK * 2 + 100)
+
+        session = start_upload(client, test_equipment, len(data)).json()
+        assert session['total_chunks'] == 3
+        headers = {'HTTP_X_UPLOAD_TOKEN': session['token']}
+
+        for index in (2, 0, 1):
+            url = session['chunk_url_template'].replace('{index}', str(index))
+            chunk = data[index * CHUNK:(index + 1) * CHUNK]
+            response = client.put(url, chunk, content_type='application/octet-stream', **headers)
+            assert response.status_code == 200
+
+        response = client.post(session['complete_url'], **headers)
+        assert response.status_code == 200
+
+        attachment = EquipmentAttachment.objects.get(pk=response.json()['attachment_id'])
+        assert attachment.equipment == test_equipment
+        assert attachment.description == 'Manual'
+        with attachment.file.open('rb') as f:
+            assert f.read() == data
+
+        upload = UploadSession.objects.get(pk=session['session_id'])
+        assert upload.status == 'complete'
+        assert not default_storage.exists(upload.chunk_name(0))
+
+    def test_status_reports_missing_chunks_for_resume(self, small_chunks, test_user, test_equipment):
+        """Test an interrupted upload can find out which chunks to resend"""
+        client = Client()
+        client.force_login(test_user)
+        data = payload(CHUNK * 3)
+        session = start_upload(client, test_equipment, len(data)).json()
+        headers = {'HTTP_X_UPLOAD_TOKEN': session['token']}
+        client.put(session['chunk_url_template'].replace('{index}', '1'), data[CHUNK:2 * CHUNK],
+                   content_type='application/octet-stream', **headers)
+
+        status = client.get(session['status_url'], **headers).json()
+        assert status['received_chunks'] == [1]
+        assert status['missing_chunks'] == [0, 2]
+
+        response = client.post(session['complete_url'], **headers)
+        assert response.status_code == 400
+
+    def test_completion_is_claimed_once(self, small_chunks, test_user, test_equipment):
+        """Test a completion racing another one is refused and a retry after success creates nothing new"""
+        client = Client()
+        client.force_login(test_user)
+        data = payload(CHUNK + 10)
+        session = start_upload(client, test_equipment, len(data)).json()
+        headers = {'HTTP_X_UPLOAD_TOKEN': session['token']}
+        for index in (0, 1):
+            client.put(session['chunk_url_template'].replace('{index}', str(index)),
+                       data[index * CHUNK:(index + 1) * CHUNK], content_type='application/octet-stream', **headers)
+
+        # Another request is assembling the file
+        UploadSession.objects.filter(pk=session['session_id']).update(status='assembling')
+        assert client.post(session['complete_url'], **headers).status_code == 400
+        assert not EquipmentAttachment.objects.exists()
+
+        UploadSession.objects.filter(pk=session['session_id']).update(status='pending')
+        first = client.post(session['complete_url'], **headers).json()
+        second = client.post(session['complete_url'], **headers).json()
+        assert first['attachment_id'] == second['attachment_id']
+        assert EquipmentAttachment.objects.count() == 1
+
+    def test_resent_chunk_cannot_replace_one_being_assembled(self, small_chunks, test_equipment):
+        """Test a chunk arriving with a stale session copy is refused once assembly has started"""
+        session, _ = uploads.create_session(test_equipment, 'a.pdf', CHUNK + 10, 'application/pdf')
+        data = payload(CHUNK)
+        uploads.store_chunk(session, 0, data)
+        UploadSession.objects.filter(pk=session.pk).update(status='assembling')
+
+        with pytest.raises(uploads.UploadError):
+            uploads.store_chunk(session, 0, bytes(CHUNK))
+        with default_storage.open(session.chunk_name(0)) as chunk:
+            assert chunk.read() == data
+
+    def test_chunk_requires_valid_token(self, small_chunks, test_user, test_equipment):
+        """Test chunk uploads are rejected without the session's signed token"""
+        client = Client()
+        client.force_login(test_user)
+        session = start_upload(client, test_equipment, 10).json()
+        url = session['chunk_url_template'].replace('{index}', '0')
+
+        response = client.put(url, b'0123456789', content_type='application/octet-stream',
+                              HTTP_X_UPLOAD_TOKEN='forged')
+        assert response.status_code == 403
+
+    def test_wrong_chunk_length_is_rejected(self, small_chunks, test_equipment):
+        """Test a truncated chunk is refused rather than silently stored"""
+        session, _ = uploads.create_session(test_equipment, 'a.pdf', CHUNK + 10, 'application/pdf')
+        with pytest.raises(uploads.UploadError):
+            uploads.store_chunk(session, 0, b'short')
+
+    def test_disallowed_content_type(self, small_chunks, test_user, test_equipment):
+        """Test only attachment file types can be uploaded"""
+        client = Client()
+        client.force_login(test_user)
+        response = start_upload(client, test_equipment, 10, content_type='application/x-msdownload')
+        assert response.status_code == 400
+
+    def test_cleanup_expired_sessions(self, small_chunks, test_equipment):
+        """Test expired sessions and their chunks are removed"""
+        session, _ = uploads.create_session(test_equipment, 'a.pdf', 10, 'application/pdf')
+        uploads.store_chunk(session, 0, payload(10))
+        UploadSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        assert uploads.cleanup_expired_sessions() == 1
+        assert not UploadSession.objects.filter(pk=session.pk).exists()
+        assert not default_storage.exists(session.chunk_name(0))
@@ -0,0 +1,51 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def user_queries(queries):
+    return [q['sql'] for q in queries if 'FROM "auth_user"' in q['sql'] and '"auth_user"."id" =' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestUserContext:
+    def test_one_query_loads_user_profile_and_customer(self, client, test_customer, test_rental):
+        """Test an authenticated request loads the user, profile and customer together"""
+        client.force_login(test_customer.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('rentals:rental_list'))
+
+        assert response.status_code == 200
+        assert test_rental in response.context['rentals']
+        assert len(user_queries(queries.captured_queries)) == 1
+        sql = ' '.join(q['sql'] for q in queries.captured_queries)
+        assert 'FROM "users_userprofile"' not in sql
+        assert '"rentals_customer"."user_id" =' not in sql
+
+    def test_context_flags(self, client, test_customer, test_staff):
+        """Test request.user_context carries the role flags"""
+        client.force_login(test_customer.user)
+        response = client.get(reverse('users:dashboard'))
+        context = response.wsgi_request.user_context
+        assert context.is_customer and not context.is_staff_member
+        assert context.customer_id == test_customer.pk
+
+        client.force_login(test_staff)
+        response = client.get(reverse('users:dashboard'))
+        assert response.url == reverse('users:staff_dashboard')
+
+    def test_profile_change_takes_effect_next_request(self, client, test_user):
+        """Test the flags follow a change to the user's profile on the next request"""
+        client.force_login(test_user)
+        response = client.get(reverse('users:dashboard'))
+        assert response.wsgi_request.user_context.user_type == 'customer'
+
+        test_user.profile.user_type = 'employee'
+        test_user.profile.save()
+        response = client.get(reverse('users:dashboard'))
+
+        assert response.url == reverse('users:staff_dashboard')
+        assert response.wsgi_request.user_context.user_type == 'employee'
+        assert '_user_context' not in client.session
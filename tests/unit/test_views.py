@@ -2,9 +2,10 @@ import pytest
 from django.urls import reverse
 from django.test import Client
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
-from inventory.models import Equipment, Category, MaintenanceRecord
+from inventory.models import Equipment, Category, EquipmentAttachment, MaintenanceRecord
 from rentals.models import Customer, Rental, RentalItem
 from users.models import UserProfile
 
@@ -31,6 +32,19 @@ class TestInventoryViews:
         assert response.status_code == 200
         assert response.context['equipment'] == test_equipment
 
+    def test_equipment_detail_shows_attachment_files(self, test_equipment, test_staff):
+        """Test attachments are listed with their size, and missing files are flagged"""
+        present = EquipmentAttachment(equipment=test_equipment, description='Manual')
+        present.file.save('manual.pdf', ContentFile(b'12345'))
+        missing = EquipmentAttachment.objects.create(equipment=test_equipment, file='equipment_attachments/gone.pdf')
+        client = Client()
+        client.force_login(test_staff)
+        response = client.get(reverse('inventory:equipment_detail', kwargs={'pk': test_equipment.pk}))
+        files = {attachment.pk: attachment.file_meta for attachment in response.context['attachments']}
+        assert files[present.pk]['size'] == 5
+        assert not files[missing.pk]['exists']
+        assert b'File missing' in response.content
+
     def test_equipment_create_view(self, test_category, test_user):
         """Test equipment create view"""
         client = Client()
@@ -3,8 +3,9 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from phonenumber_field.modelfields import PhoneNumberField
+from music_rental.model_mixins import DirtyFieldsMixin
 
-class UserProfile(models.Model):
+class UserProfile(DirtyFieldsMixin, models.Model):
     """Base user profile model that extends Django's built-in User model"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone_number = PhoneNumberField(blank=True)
@@ -57,8 +58,13 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    """Save changes made through user.profile; a user saved without any (e.g. on login) writes nothing."""
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None and not created:
+        dirty = profile.get_dirty_fields()
+        if dirty:
+            profile.save(update_fields=list(dirty))
 
 # Signal to create customer profile when a user profile is created with type 'customer'
 @receiver(post_save, sender=UserProfile)
@@ -67,7 +73,7 @@ def create_customer_profile(sender, instance, created, **kwargs):
         CustomerProfile.objects.create(user_profile=instance)
     
     # Handle profile type changes
-    elif not created:
+    elif not created and 'user_type' in instance.get_dirty_fields():
         if instance.user_type == 'customer':
             CustomerProfile.objects.get_or_create(user_profile=instance)
         else:
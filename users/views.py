@@ -13,6 +13,7 @@ from .forms import (
 from .models import UserProfile, StaffProfile, CustomerProfile
 from django.http import HttpResponseRedirect
 from django.db import transaction
+from music_rental.user_context import get_user_context
 
 # Helper functions for permission checks
 def is_staff_member(user):
@@ -99,7 +100,7 @@ def staff_list(request):
 @login_required
 def dashboard(request):
     """Redirect to appropriate dashboard based on user type"""
-    if request.user.profile.is_staff_member:
+    if get_user_context(request).is_staff_member:
         return redirect('users:staff_dashboard')
     else:
         return redirect('users:customer_dashboard')
@@ -107,7 +108,7 @@ def dashboard(request):
 @login_required
 def customer_dashboard(request):
     # Only allow customers to access
-    if not request.user.profile.is_customer:
+    if not get_user_context(request).is_customer:
         messages.warning(request, "You don't have permission to access the customer dashboard.")
         return redirect('users:staff_dashboard')
     
@@ -123,7 +124,7 @@ def staff_dashboard(request):
     """Dashboard for employees and admins"""
     context = {
         'user': request.user,
-        'is_admin': request.user.profile.user_type == 'admin',
+        'is_admin': get_user_context(request).is_admin,
     }
     return render(request, 'users/staff_dashboard.html', context)
 
@@ -134,10 +135,8 @@ def update_profile(request):
     if request.method == 'POST':
         user_form = UserUpdateForm(request.POST, instance=request.user)
         profile_form = UserProfileUpdateForm(request.POST, instance=request.user.profile)
-        print(f"Form data: {request.POST}")  # Debug
         
         if user_form.is_valid() and profile_form.is_valid():
-            print("Forms are valid")  # Debug
             user = user_form.save()
             profile = profile_form.save(commit=False)
             profile.user = user
@@ -146,8 +145,6 @@ def update_profile(request):
             messages.success(request, 'Your profile was successfully updated!')
             return HttpResponseRedirect(reverse('users:view_profile'))
         else:
-            print(f"User form errors: {user_form.errors}")  # Debug
-            print(f"Profile form errors: {profile_form.errors}")  # Debug
             messages.error(request, 'Please correct the errors below.')
     else:
         user_form = UserUpdateForm(instance=request.user)